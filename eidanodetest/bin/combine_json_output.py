@@ -1,38 +1,157 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """
-Combines JSON result files for web service tests for different result sizes.
+Combines JSON result files for web service tests into one result file.
+
+Input files are given as file names, glob patterns or directories (all
+result files with time stamp in the directory), and merged on node, response
+size, protocol, service and method, in ascending order of the time stamp in
+the file name (file modification time if the name has none). Files are read
+one at a time, only the merged result is kept in memory.
 
 This file is part of the EIDA webservice performance tests.
 
 """
 
-import json
-
-SIZE_KEYS = ('small', 'medium', 'large', 'verylarge', 'huge')
-
-INFILE_BASE = 'statistics_dataselect_'
-OUTFILE = 'statistics_dataselect_small-huge.json'
-
-outdict = {}
-
-for size_key in SIZE_KEYS:
-    
-    infile = "%s%s.json" % (INFILE_BASE, size_key)
-    
-    with open(infile, 'r') as fh:   
-        d = json.load(fh)
-    
-    if size_key == 'small':
-        
-        # copy first dict
-        outdict.update(d)
-    
-    else:
-        for node in d:
-            outdict[node]['result'][size_key] = d[node]['result'][size_key]
-     
-    
-with open(OUTFILE, 'w') as fout:
-    json.dump(outdict, fout, sort_keys=True, indent=4)
+import datetime
+import glob
+import os
+import sys
+
+from gflags import DEFINE_boolean
+from gflags import DEFINE_integer
+from gflags import DEFINE_string
+from gflags import FLAGS
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eidanodetest import merging
+from eidanodetest import profiling
+from eidanodetest import serialization
+from eidanodetest import utils
+
+
+OUTFILE = 'result_eida_nodetest_merged.json.gz'
+
+
+DEFINE_string('od', '', 'Output directory')
+DEFINE_string('of', OUTFILE, 'Output file')
+DEFINE_string(
+    'codec', '',
+    'Compression of output file: gzip, lzma, none (default: by extension of\
+    output file)')
+DEFINE_integer(
+    'level', serialization.DEFAULT_LEVEL,
+    'Compression level: gzip 1 (fast) to 9 (best), lzma 0 to 9')
+DEFINE_boolean(
+    'split', False,
+    'Write raw samples and attempts to a separate file in subdirectory raw\
+    of the output directory')
+DEFINE_string(
+    'policy', 'newest',
+    'Policy for results present in several files ({})'.format(
+        ', '.join(merging.MERGE_POLICIES)))
+DEFINE_string('profile', '', 'Write cProfile statistics (pstats) to file')
+DEFINE_boolean(
+    'phases', False,
+    'Print wall clock and CPU time of loading, merging, statistics and\
+    serialization phases (implied by --profile)')
+
+
+def main():
+
+    argv = FLAGS(sys.argv)
+
+    if FLAGS.policy not in merging.MERGE_POLICIES:
+        error_msg = "illegal merge policy: {}".format(FLAGS.policy)
+        raise RuntimeError, error_msg
+
+    codec = FLAGS.codec or serialization.get_codec_from_filename(FLAGS.of)
+    serialization.check_codec(codec, FLAGS.level)
+
+    if len(argv) < 2:
+        error_msg = "usage: {} [options] file|glob|directory ...".format(
+            os.path.basename(argv[0]))
+        raise RuntimeError, error_msg
+
+    try:
+        with profiling.profile(FLAGS.profile):
+            combine(argv[1:], codec)
+
+    finally:
+        if FLAGS.profile or FLAGS.phases:
+            print "\n".join(profiling.TIMER.format_summary())
+
+
+def combine(sources, codec):
+
+    source_paths = get_source_paths(sources)
+
+    if not source_paths:
+        error_msg = "no input files found"
+        raise RuntimeError, error_msg
+
+    merged = dict()
+    file_count = 0
+
+    for source_path in source_paths:
+
+        try:
+            with profiling.phase('loading'):
+                d = utils.load_json(source_path, raw=True)
+        except Exception:
+            print "WARNING: {} is not a valid (gzipped) JSON file".format(
+                os.path.basename(source_path))
+            continue
+
+        with profiling.phase('merging'):
+            merging.merge_result(merged, d, FLAGS.policy)
+
+        file_count += 1
+
+    with profiling.phase('statistics'):
+        merging.finalize_result(merged, FLAGS.policy)
+
+    outpath = utils.get_outpath(FLAGS.of, FLAGS.od)
+
+    with profiling.phase('serialization'):
+        serialization.write_result(
+            merged, outpath, codec, FLAGS.level, FLAGS.split)
+
+    print "merged {} result files into {} (policy {})".format(
+        file_count, outpath, FLAGS.policy)
+
+
+def get_source_paths(sources):
+    """
+    Return list of unique input files for file names, glob patterns and
+    directories, sorted by time stamp (earliest first).
+
+    """
+
+    paths = set()
+
+    for source in sources:
+
+        if os.path.isdir(source):
+            paths.update(glob.glob(
+                os.path.join(source, utils.FILENAME_DATETIME_PATTERN_GLOB)))
+        else:
+            paths.update(glob.glob(source))
+
+    return sorted(
+        (path for path in paths if os.path.isfile(path)), key=get_sort_key)
+
+
+def get_sort_key(path):
+
+    timestamp = utils.get_timestamp_from_filename(path)
+
+    if timestamp is None:
+        timestamp = datetime.datetime.utcfromtimestamp(os.path.getmtime(path))
+
+    return (timestamp, path)
+
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Detects performance regressions of nodes in the history of JSON result files.
+
+For every node, response size, protocol, service and method, the per-run
+medians of throughput and latency form a time series. Rolling baselines
+(median and MAD of preceding runs, EWMA) are computed for each series, and
+significant degradations and level shifts are written to a JSON alert report.
+
+The script runs incrementally: a state file keeps the tail of every series
+and the time stamp of the last processed result file, so that only newer
+files are read on the next run.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+from __future__ import unicode_literals
+
+import collections
+import datetime
+import glob
+import json
+import os
+import sys
+
+from gflags import DEFINE_boolean
+from gflags import DEFINE_float
+from gflags import DEFINE_integer
+from gflags import DEFINE_string
+from gflags import FLAGS
+
+import numpy
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eidanodetest import regression
+from eidanodetest import utils
+
+
+STATE_FILE = 'node_regression_state.json'
+STATE_VERSION = 1
+
+REPORT_FILE_BASE = 'node_regressions'
+
+DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# metric, higher value is worse
+METRICS = {
+    'throughput': False,
+    'latency': True
+}
+
+
+DEFINE_string('id', '', 'Input directory')
+DEFINE_string('od', '', 'Output directory')
+DEFINE_string('of', '', 'Output file (alert report)')
+DEFINE_string('statefile', '', 'State file (default: in output directory)')
+DEFINE_string(
+    'requestsize', '',
+    'Comma-separated list of response sizes (small, medium, large, '\
+    'verylarge, huge; default: all)')
+DEFINE_string(
+    'connections', 'new',
+    'History of runs with a new HTTP connection per request (new: suite '\
+    'mode; resumed: with --tlsresume) or with reused connections (reused: '\
+    'daemon mode)')
+
+DEFINE_integer(
+    'window', regression.DEFAULT_PARAMS['window'],
+    'Number of preceding runs for baseline median/MAD')
+DEFINE_integer(
+    'minperiods', regression.DEFAULT_PARAMS['min_periods'],
+    'Minimum number of preceding runs for baseline')
+DEFINE_float(
+    'threshold', regression.DEFAULT_PARAMS['threshold'],
+    'Robust z-score threshold')
+DEFINE_integer(
+    'persist', regression.DEFAULT_PARAMS['persist'],
+    'Number of consecutive degraded runs for degradation alert')
+DEFINE_float(
+    'alpha', regression.DEFAULT_PARAMS['alpha'], 'EWMA smoothing factor')
+DEFINE_float(
+    'shift', regression.DEFAULT_PARAMS['shift'],
+    'Relative change of EWMA against baseline for level shift alert')
+
+DEFINE_boolean(
+    'full', False, 'Ignore state file, process all result files')
+
+
+def main():
+
+    _ = FLAGS(sys.argv)
+
+    if not FLAGS.id:
+        error_msg = "you need to specify an input directory name with the "\
+            "--id option"
+        raise RuntimeError, error_msg
+
+    params = dict(
+        window=FLAGS.window, min_periods=FLAGS.minperiods,
+        threshold=FLAGS.threshold, persist=FLAGS.persist, alpha=FLAGS.alpha,
+        shift=FLAGS.shift)
+
+    if FLAGS.requestsize:
+        size_list = [x.strip() for x in FLAGS.requestsize.split(',')]
+    else:
+        size_list = None
+
+    statepath = utils.get_outpath(FLAGS.statefile or STATE_FILE, FLAGS.od)
+    state = load_state(statepath, params)
+
+    last_timestamp = None
+    if state['last_timestamp']:
+        last_timestamp = datetime.datetime.strptime(
+            state['last_timestamp'], DATETIME_FORMAT)
+
+    # iterates through files with ascending time stamps
+    # (earliest first)
+    source_file_iterator = sorted(
+        glob.iglob(
+            os.path.join(FLAGS.id, utils.FILENAME_DATETIME_PATTERN_GLOB)))
+
+    # series key -> metric -> (time stamps, values) of new runs
+    new_points = collections.defaultdict(
+        lambda: collections.defaultdict(lambda: ([], [])))
+
+    file_count = 0
+
+    for source_path in source_file_iterator:
+
+        timestamp = utils.get_timestamp_from_filename(source_path)
+
+        if timestamp is None or (
+            last_timestamp is not None and timestamp <= last_timestamp):
+            continue
+
+        try:
+            d = utils.load_json(source_path)
+        except Exception:
+            print "WARNING: {} is not a valid (gzipped) JSON file".format(
+                os.path.basename(source_path))
+            continue
+
+        timestamp_str = timestamp.strftime(DATETIME_FORMAT)
+        state['last_timestamp'] = timestamp_str
+
+        if not utils.is_history_result(d, FLAGS.connections):
+            continue
+
+        file_count += 1
+
+        for node, size, protocol, service, method, _, method_res in \
+            utils.iter_result_cells(d):
+
+            if size_list is not None and size not in size_list:
+                continue
+
+            if 'stats' not in method_res:
+                continue
+
+            key = get_series_key(node, size, protocol, service, method)
+
+            for metric in METRICS:
+
+                value = method_res['stats'].get(metric, {}).get('median')
+
+                if value is not None:
+                    new_points[key][metric][0].append(timestamp_str)
+                    new_points[key][metric][1].append(value)
+
+    print "processed {} new result files".format(file_count)
+
+    alerts = []
+    baselines = {}
+
+    for key in sorted(set(state['series']) | set(new_points)):
+
+        series_state = state['series'].setdefault(key, {})
+
+        for metric, higher_is_worse in METRICS.items():
+
+            new_timestamps, new_values = new_points[key][metric]
+            tail = series_state.get(metric)
+
+            if tail is None:
+                if not new_values:
+                    continue
+
+                tail = regression.new_tail()
+
+            # keep tail of series in state
+            series, res, series_state[metric] = regression.analyse_tail(
+                tail, new_timestamps, new_values, params, higher_is_worse)
+
+            timestamps = series['timestamps']
+            values = series['values']
+
+            # only flag runs that have not been processed before
+            for idx in xrange(series['first_new'], len(values)):
+
+                for alert_type in ('degradation', 'levelshift'):
+                    if res[alert_type][idx]:
+                        alerts.append(make_alert(
+                            key, metric, alert_type, timestamps[idx],
+                            values[idx], res, idx))
+
+            baselines.setdefault(key, {})[metric] = dict(
+                timestamp=timestamps[-1], value=values[-1],
+                median=to_json_float(res['median'][-1]),
+                mad=to_json_float(res['mad'][-1]),
+                ewma=to_json_float(res['ewma'][-1]),
+                runs=len(values))
+
+    for alert in alerts:
+        print "ALERT {type}: {series} {metric} at {timestamp}: {value} "\
+            "(baseline {baseline_median}, z={zscore})".format(**alert)
+
+    print "{} alerts".format(len(alerts))
+
+    if FLAGS.of:
+        outfile = FLAGS.of
+    else:
+        outfile = "{}_{}.json".format(
+            REPORT_FILE_BASE, datetime.datetime.utcnow().strftime(
+                '%Y%m%d-%H%M%S'))
+
+    report = dict(
+        created=datetime.datetime.utcnow().strftime(DATETIME_FORMAT),
+        last_timestamp=state['last_timestamp'],
+        processed_files=file_count,
+        params=params,
+        alerts=alerts,
+        baselines=baselines)
+
+    utils.write_atomic(
+        utils.get_outpath(outfile, FLAGS.od),
+        json.dumps(report, sort_keys=True, indent=4))
+
+    utils.write_atomic(statepath, json.dumps(state, sort_keys=True))
+
+
+def load_state(statepath, params):
+
+    state = dict(
+        version=STATE_VERSION, params=params, last_timestamp=None,
+        series={}, connections=FLAGS.connections)
+
+    if FLAGS.full or not os.path.isfile(statepath):
+        return state
+
+    with open(statepath, 'r') as fh:
+        stored = json.load(fh)
+
+    if stored.get('version') != STATE_VERSION:
+        print "WARNING: state file version differs, processing all files"
+        return state
+
+    # baselines of one history do not apply to the other
+    if stored.get('connections', 'new') != FLAGS.connections:
+        print "WARNING: state file is of runs with {} connections, "\
+            "processing all files".format(stored.get('connections', 'new'))
+        return state
+
+    if stored['params'] != params:
+        print "WARNING: parameters changed since state was written, "\
+            "baselines of old runs are not recomputed"
+
+        # EWMA depends on alpha
+        if stored['params']['alpha'] != params['alpha']:
+            for series_state in stored['series'].values():
+                for tail in series_state.values():
+                    tail['ewma_before_tail'] = None
+
+        stored['params'] = params
+
+    return stored
+
+
+def get_series_key(node, size, protocol, service, method):
+
+    # ArcLink has no methods
+    return "/".join((node, size, protocol, service, method or protocol))
+
+
+def make_alert(key, metric, alert_type, timestamp, value, res, idx):
+
+    node, size, protocol, service, method = key.split('/')
+
+    return dict(
+        type=alert_type, series=key, node=node, size=size,
+        protocol=protocol, service=service, method=method, metric=metric,
+        timestamp=timestamp, value=value,
+        baseline_median=to_json_float(res['median'][idx]),
+        baseline_mad=to_json_float(res['mad'][idx]),
+        zscore=to_json_float(res['zscore'][idx]),
+        ewma=to_json_float(res['ewma'][idx]),
+        relative_change=to_json_float(res['relative_change'][idx]))
+
+
+def to_json_float(value):
+    """JSON has no NaN."""
+
+    if numpy.isfinite(value):
+        return float(value)
+    else:
+        return None
+
+
+if __name__ == '__main__':
+    main()
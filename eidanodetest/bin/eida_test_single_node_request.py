@@ -10,28 +10,28 @@ This file is part of the EIDA webservice performance tests.
 
 Uses ObsPy ArcLink client.
 
-Uses:
-    singletony          https://github.com/andrew-azarov/singletony
-
 """
 
 import datetime
-import gzip
-import io
-import json
 import logging
 import os
 import random
 import requests
+import requests.adapters
+import signal
 import sys
 import time
 
+from gflags import DEFINE_boolean
+from gflags import DEFINE_float
 from gflags import DEFINE_integer
 from gflags import DEFINE_string
 from gflags import FLAGS
 
 import numpy
 
+from multiprocessing.pool import ThreadPool
+
 from obspy import UTCDateTime
 from obspy.clients.arclink.client import ArcLinkException
 from obspy.clients.arclink.client import Client as ArclinkClient
@@ -39,8 +39,25 @@ from obspy.clients.arclink.client import Client as ArclinkClient
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from eidanodetest import accesslog
+from eidanodetest import deadlines
+from eidanodetest import memory
+from eidanodetest import merging
+from eidanodetest import nodelock
+from eidanodetest import openloop
+from eidanodetest import preflight
+from eidanodetest import profiling
+from eidanodetest import prometheus
+from eidanodetest import resolver
+from eidanodetest import sampletable
+from eidanodetest import serialization
+from eidanodetest import sockbuf
+from eidanodetest import splitwindow
+from eidanodetest import streaming
+from eidanodetest import tcpinfo
+from eidanodetest import tlssession
 from eidanodetest import utils
-from eidanodetest.thirdparty.singletony import Singlet
+from eidanodetest import windows
 
 from mediator import settings
 
@@ -60,10 +77,71 @@ ALL_SERVERS = (settings.EIDA_NODES, settings.OTHER_SERVERS)
 
 SERVICES_TO_TEST = ('get', 'post', 'federator', 'arclink')
 
+# fdsnws services: query path, additional query parameters, methods, format
+# of response (for counting returned elements while streaming), and element
+# that is counted
+HTTP_SERVICE_QUERIES = {
+    'dataselect': {
+        'path': 'dataselect/1/query',
+        'params': {},
+        'methods': ('get', 'post', 'federator'),
+        'format': None,
+        'count': None
+        },
+    'station-network': {
+        'path': 'station/1/query',
+        'params': {'level': 'network'},
+        'methods': ('get', 'post', 'federator'),
+        'format': 'stationxml',
+        'count': 'Network'
+        },
+    'station-station': {
+        'path': 'station/1/query',
+        'params': {'level': 'station'},
+        'methods': ('get', 'post', 'federator'),
+        'format': 'stationxml',
+        'count': 'Station'
+        },
+    'station-channel': {
+        'path': 'station/1/query',
+        'params': {'level': 'channel'},
+        'methods': ('get', 'post', 'federator'),
+        'format': 'stationxml',
+        'count': 'Channel'
+        },
+    'station-response': {
+        'path': 'station/1/query',
+        'params': {'level': 'response'},
+        'methods': ('get', 'post', 'federator'),
+        'format': 'stationxml',
+        'count': 'Response'
+        },
+    'availability': {
+        'path': 'availability/1/query',
+        'params': {'format': 'text'},
+        'methods': ('get', 'post'),
+        'format': 'text',
+        'count': None
+        }
+}
+
+# names for --httpservices
+HTTP_SERVICE_GROUPS = {
+    'dataselect': ('dataselect',),
+    'station': (
+        'station-network', 'station-station', 'station-channel', 
+        'station-response'),
+    'availability': ('availability',)
+}
+
+SNCL_KEYS = ('network', 'station', 'location', 'channel')
+
 TEST_SERVICES = {
     'http': {
         'methods':  ('get', 'post', 'federator'),
-        'services': ('dataselect',)
+        'services': (
+            'dataselect', 'station-network', 'station-station', 
+            'station-channel', 'station-response', 'availability')
         },
     'arclink': {
         'services': ('waveform',)
@@ -89,6 +167,41 @@ TEST_TIME_INTERVAL_HUGE = 20 * 24 * 60 * 60
 ITERATION_COUNT_SMALL = 10
 ITERATION_COUNT_LARGE = 5
 
+RUN_MODES = (
+    'suite', 'daemon', 'cachestudy', 'rcvbuf', 'tls', 'replay', 'openloop', 
+    'splitwindow')
+
+# request time windows: fixed (TEST_TIME_INTERVALS), or random start time 
+# within archive range for every request
+WINDOW_MODES = ('fixed', 'random')
+
+ARCHIVE_START = '2012-01-01T00:00:00'
+ARCHIVE_END = '2016-10-01T00:00:00'
+
+# replay mode: percentiles of latency and throughput per request class, 
+# requests started more than this number of seconds after their scheduled 
+# time are counted as late
+REPLAY_PERCENTILES = (50, 90, 99)
+REPLAY_LATE_SECONDS = 1.0
+
+# open-loop mode: request rates (per second) of the load steps, seconds per
+# step, response size category
+OPENLOOP_RATES = '0.5,1,2,4,8'
+OPENLOOP_STEP_SECONDS = 60
+OPENLOOP_WORKERS = 32
+OPENLOOP_SIZE = 'small'
+
+# split-window mode: response size categories
+SPLIT_SIZES = ('verylarge', 'huge')
+
+# pre-flight probe: unreachable endpoints are measured after the others if 
+# they have recovered (defer), or not at all (drop)
+PREFLIGHT_MODES = ('defer', 'drop', 'off')
+
+# daemon mode: spread requests over 24 hours, new result file every 3 hours
+DAEMON_CYCLE_HOURS = 24
+DAEMON_ROLL_INTERVAL_MINUTES = 3 * 60
+
 TEST_TIME_INTERVALS = {
     'small': {
         'time_interval_duration': TEST_TIME_INTERVAL_SMALL,
@@ -117,8 +230,20 @@ TEST_TIME_INTERVALS = {
         }
     }
 
+# request deadlines (seconds): connect, read (stall: no bytes received), 
+# total, scaled with --timeoutscale
+REQUEST_DEADLINES = {
+    'small': dict(connect=10, read=30, total=120),
+    'medium': dict(connect=10, read=30, total=300),
+    'large': dict(connect=10, read=60, total=600),
+    'verylarge': dict(connect=10, read=120, total=1800),
+    'huge': dict(connect=10, read=120, total=3600)
+    }
+
+# consecutive failed requests after which a node is skipped
+CIRCUIT_BREAKER_FAILURES = 3
+
 OUTFILE_BASE = 'result_eida_nodetest'
-OUTFILE_INDENT = 4
 ARCLINK_USER_EMAIL = 'john.doe@example.com'
 
 
@@ -126,10 +251,34 @@ ARCLINK_USER_EMAIL = 'john.doe@example.com'
 # --excludenodes (default: none)s
 # --responsesize (small-huge, default: all)
 # --services (get, post, federator, arclink)
+# --httpservices (dataselect, station, availability)
 # --of outfile
+# --promfile Prometheus textfile
 # --email (user e-mail, for ArcLink)
 # --itersmall 10
 # --iterlarge 5
+# --mode suite (default) or daemon
+# --cycle 24 (daemon: hours)
+# --rollinterval 180 (daemon: minutes)
+# --timeoutscale 1.0 (factor for request deadlines)
+# --breaker 3 (skip node after consecutive failures, 0: never)
+# --preflight defer (defer, drop, off)
+# --preflighttimeout 5.0 (seconds)
+# --memory (record memory use of requests and phases)
+# --profile FILE (cProfile statistics), --phases (phase timers)
+# --codec gzip (gzip, lzma, none), --level 6, --split (raw samples separate)
+# --windows fixed (fixed, random), --archivestart, --archiveend
+# --series 0.1 (transfer time series interval, seconds, 0: off)
+# --tcpinfo (Linux TCP_INFO of HTTP connections, default on, sampled while
+#     streaming only with --series)
+# --rcvbuf 0,64,256,1024,4096 (KiB, receive buffer experiment, 0: default)
+# --tlsresume (resume TLS sessions of HTTP requests, needs pyOpenSSL)
+# --dnscache (in-process resolver cache), --dnsttl 300 (seconds)
+# --accesslog FILES, --compression 1.0, --replaylimit 0 (mode replay)
+# --rates 0.5,1,2,4,8, --stepduration 60, --arrivals poisson, --workers 32
+#     (mode openloop)
+# --splits 1,2,4,8 (mode splitwindow)
+# --lockwait 0 (seconds, -1: no limit), --lockdir (default: temp dir)
 
 
 DEFINE_string('nodes', '', 'Comma-separated list of nodes to be tested')
@@ -142,8 +291,14 @@ DEFINE_string(
 
 DEFINE_string('services', '', 'Comma-separated list of services to be tested:\
     get,post,federator,arclink')
+DEFINE_string(
+    'httpservices', 'dataselect', 'Comma-separated list of fdsnws services\
+    to be tested: dataselect,station,availability')
 DEFINE_string('of', '', 'Output file')
 DEFINE_string('od', '', 'Output directory')
+DEFINE_string(
+    'promfile', '', 
+    'Prometheus textfile (for node_exporter textfile collector)')
 DEFINE_string('ld', '', 'Logging directory')
 DEFINE_string(
     'email', ARCLINK_USER_EMAIL, 
@@ -156,10 +311,137 @@ DEFINE_integer(
     'iterlarge', ITERATION_COUNT_LARGE, 
     'Number of iterations for verylarge and huge response sizes')
 
+DEFINE_string(
+    'mode', 'suite', 'Run mode: suite (all requests back to back), daemon\
+    (long-lived, requests spread over cycle), cachestudy (identical and\
+    randomized time windows side by side), rcvbuf (HTTP requests repeated\
+    with several receive buffer sizes), tls (full and resumed TLS handshakes\
+    of https nodes), replay (dataselect requests of access logs), openloop\
+    (dataselect requests at increasing constant arrival rates), splitwindow\
+    (time window fetched in one request and in concurrent sub-windows)')
+DEFINE_integer(
+    'cycle', DAEMON_CYCLE_HOURS, 
+    'Daemon mode: hours over which all iterations are spread')
+DEFINE_integer(
+    'rollinterval', DAEMON_ROLL_INTERVAL_MINUTES, 
+    'Daemon mode: minutes after which a new result file is written')
+
+DEFINE_float(
+    'timeoutscale', 1.0, 
+    'Factor for connect/read/total request deadlines')
+DEFINE_integer(
+    'breaker', CIRCUIT_BREAKER_FAILURES, 
+    'Skip remaining requests of a node after this number of consecutive\
+    failures (0: never)')
+
+DEFINE_boolean(
+    'memory', False, 
+    'Record memory use (RSS, tracemalloc if available) of every request and\
+    of the statistics and output phases')
+DEFINE_string(
+    'preflight', 'defer', 
+    'Pre-flight probe of all endpoints: defer (measure unreachable endpoints\
+    at the end, if recovered), drop (do not measure them), off')
+DEFINE_float(
+    'preflighttimeout', preflight.PROBE_TIMEOUT, 
+    'Timeout of pre-flight probes (seconds)')
+
+DEFINE_string('profile', '', 'Write cProfile statistics (pstats) to file')
+DEFINE_boolean(
+    'phases', False, 
+    'Log wall clock and CPU time of planning, measurement, statistics and\
+    serialization phases (implied by --profile)')
+
+DEFINE_float(
+    'series', streaming.SERIES_INTERVAL, 
+    'Interval (seconds) of transfer time series of HTTP requests (bytes\
+    received per interval), 0: no time series')
+
+DEFINE_boolean(
+    'tcpinfo', True, 
+    'Record Linux TCP_INFO (RTT, retransmits, congestion window, receive\
+    window, out-of-order packets) of HTTP connections at the end of the\
+    transfer (outside the timed interval), with --series also every second\
+    while streaming')
+
+DEFINE_string(
+    'rcvbuf', ','.join(str(x) for x in sockbuf.BUFFER_SIZES_KIB), 
+    'Mode rcvbuf: comma-separated list of receive buffer sizes (SO_RCVBUF,\
+    KiB) of HTTP connections, 0: system default (always measured)')
+
+DEFINE_boolean(
+    'tlsresume', False, 
+    'Resume TLS sessions of HTTP requests to https nodes, as a well-behaved\
+    client does (needs pyOpenSSL)')
+
+DEFINE_boolean(
+    'dnscache', False, 
+    'Cache resolved host names in-process (HTTP and ArcLink), instead of\
+    resolving them for every request')
+DEFINE_float(
+    'dnsttl', resolver.DEFAULT_TTL, 
+    'Seconds after which cached host names are resolved again')
+
+DEFINE_float(
+    'lockwait', 0.0, 
+    'Seconds to wait for nodes locked by another instance (0: fail at once,\
+    -1: no limit)')
+DEFINE_string(
+    'lockdir', '', 'Directory of node lock files (default: temp directory)')
+
+DEFINE_string(
+    'accesslog', '', 
+    'Mode replay: comma-separated list of fdsnws-dataselect access log files\
+    (combined log format or JSON lines)')
+DEFINE_float(
+    'compression', 1.0, 
+    'Mode replay: time compression of the request schedule (e.g., 60: one\
+    hour of log is replayed in one minute)')
+DEFINE_integer(
+    'replaylimit', 0, 'Mode replay: maximum number of requests (0: all)')
+
+DEFINE_string(
+    'rates', OPENLOOP_RATES, 
+    'Mode openloop: comma-separated list of request rates (per second) of\
+    the load steps')
+DEFINE_float(
+    'stepduration', OPENLOOP_STEP_SECONDS, 
+    'Mode openloop: duration of every load step (seconds)')
+DEFINE_string(
+    'arrivals', 'poisson', 
+    'Mode openloop: arrival process, poisson (exponential inter-arrival\
+    times) or fixed (constant intervals)')
+DEFINE_integer(
+    'workers', OPENLOOP_WORKERS, 
+    'Mode openloop: maximum number of concurrent requests')
+
+DEFINE_string(
+    'splits', ','.join(str(x) for x in splitwindow.SPLITS), 
+    'Mode splitwindow: comma-separated list of numbers of sub-windows (1,\
+    the single request, is always included)')
+
+DEFINE_string(
+    'windows', 'fixed', 
+    'Request time windows: fixed (same window for every request), random\
+    (non-overlapping windows of the same duration within archive range)')
+DEFINE_string(
+    'archivestart', ARCHIVE_START, 'Start of archive range for random windows')
+DEFINE_string(
+    'archiveend', ARCHIVE_END, 'End of archive range for random windows')
+
+DEFINE_string(
+    'codec', '', 
+    'Compression of result file: gzip, lzma, none (default: by extension of\
+    --of, gzip if not given)')
+DEFINE_integer(
+    'level', serialization.DEFAULT_LEVEL, 
+    'Compression level: gzip 1 (fast) to 9 (best), lzma 0 to 9')
+DEFINE_boolean(
+    'split', False, 
+    'Write raw samples and attempts to a separate file in subdirectory raw\
+    of the output directory')
+
 
-# allow only one instance to run at the same time
-me = Singlet()
-    
 def main():
     
     _ = FLAGS(sys.argv)
@@ -173,472 +455,2186 @@ def main():
         level=logging.INFO, format=DEFAULT_LOG_FORMAT, filename=logpath, 
         filemode='w')
     
+    if FLAGS.memory:
+        memory.start()
     
-    # init result dict
-    result = init_result_dict()
+    # time host name resolution of every request
+    resolver.install(FLAGS.dnsttl if FLAGS.dnscache else 0.0)
     
-    for time_int_category in COMMANDLINE_PAR['the_responsesize_list']:
-        time_cat_info = TEST_TIME_INTERVALS[time_int_category]
+    # instances may run at the same time on disjoint nodes
+    locks = acquire_node_locks()
+    
+    try:
+        with profiling.profile(FLAGS.profile):
+            
+            if FLAGS.mode == 'daemon':
+                run_daemon()
+            elif FLAGS.mode == 'cachestudy':
+                run_cache_study()
+            elif FLAGS.mode == 'rcvbuf':
+                run_buffer_experiment()
+            elif FLAGS.mode == 'tls':
+                run_tls_study()
+            elif FLAGS.mode == 'replay':
+                run_replay()
+            elif FLAGS.mode == 'openloop':
+                run_open_loop()
+            elif FLAGS.mode == 'splitwindow':
+                run_split_benchmark()
+            else:
+                run_suite()
+    
+    finally:
+        locks.release()
         
-        LOG.info("===== testing {} time intervals =====".format(
-            time_int_category))
+        if FLAGS.profile or FLAGS.phases:
+            log_phase_summary()
+
+
+def acquire_node_locks():
+    """
+    Return node locks (see nodelock.NodeLocks) of the tested nodes, and of 
+    the federator if requested, acquired within --lockwait seconds. Raise 
+    nodelock.LockUnavailable if a node is locked by another instance.
+    
+    """
+    
+    nodes = [
+        node for node in COMMANDLINE_PAR['the_node_list'] \
+            if node not in COMMANDLINE_PAR['the_excludenode_list']]
+    
+    federator = 'federator' in COMMANDLINE_PAR['the_services_list'] and \
+        any(node in settings.EIDA_NODES for node in nodes)
+    
+    locks = nodelock.NodeLocks(
+        nodelock.get_lock_names(nodes, federator), FLAGS.lockdir or None)
+    
+    locked = locks.get_locked()
+    
+    if locked and FLAGS.lockwait:
+        LOG.info("waiting for locks held by other instances: {}".format(
+            locks.format_holders()))
+    
+    t_start = time.time()
+    
+    try:
+        locks.acquire(FLAGS.lockwait if FLAGS.lockwait >= 0 else None)
+    
+    except nodelock.LockUnavailable, e:
+        LOG.error("another instance is testing the same nodes: {}".format(e))
+        raise
+    
+    if locked:
+        LOG.info("locks acquired after %.1f seconds" % (time.time() - t_start))
+    
+    return locks
+
+
+def log_phase_summary():
+    
+    LOG.info("===== phase timing =====")
+    
+    for line in profiling.TIMER.format_summary():
+        LOG.info(line)
+
+
+def run_suite():
+    """Run all requested measurements back to back, write one result file."""
+    
+    breaker = deadlines.CircuitBreaker(FLAGS.breaker)
+    t_run_start = time.time()
+    
+    with profiling.phase('planning'):
         
-        # make iterations outer loop so that there is some time
-        # between requests for the same node
+        # init result dict
+        result = init_result_dict()
         
-        if time_int_category in ('verylarge', 'huge'):
-            iteration_count = FLAGS.iterlarge
-        else:
-            iteration_count = FLAGS.itersmall
-            
-        for it in xrange(iteration_count):
-            
-            LOG.info("========== ITERATION {} of {} ==========".format(
-                it + 1, iteration_count))
- 
-            # iterate over nodes
-            for node, node_par in node_generator():
-                
-                payload = {
-                    'network': node_par['testquerysncls']['network'],
-                    'station': node_par['testquerysncls']['station'],
-                    'location': node_par['testquerysncls']['location'],
-                    'channel': node_par['testquerysncls']['channel'],
-                    'starttime': TEST_TIME_INTERVALS\
-                            [time_int_category]['start'],
-                    'endtime': TEST_TIME_INTERVALS[time_int_category]\
-                        ['end']
-                }
-                    
-                # protocol (arclink, http fdsnws)
-                for protocol, params in TEST_SERVICES.items():
-                    
-                    # skip arclink for huge request, no node
-                    # delivers it
-                    if protocol == 'arclink' and \
-                        'arclink' in COMMANDLINE_PAR['the_services_list'] and \
-                        'arclink' in node_par['services'] and \
-                        'huge' != time_int_category:
-
-                        # waveform, station, etc
-                        for service in params['services']:
-                            
-                            arclink_server, arclink_port = \
-                                get_arclink_connection(node_par)
-                            
-                            LOG.info("querying ARCLINK: %s" % (arclink_server))
-                            
-                            # check empty loc, wildcard *
-                            # no comma-separated list allowed 
-                            # in Arclink client
-                            arclink_payload = convert_payload_to_arclink(
-                                payload, node_par['testquerysncls'])
-
-                            LOG.info(arclink_payload)
-                                
-                            # start timer
-                            t_start = time.time()
-                            
-                            try:
-                                client = ArclinkClient(
-                                    host=arclink_server,port=arclink_port,
-                                    user=FLAGS.email)
-                                
-                                with io.BytesIO() as bf:
-                                    client.save_waveforms(
-                                        bf,
-                                        arclink_payload['network'], 
-                                        arclink_payload['station'], 
-                                        arclink_payload['location'], 
-                                        arclink_payload['channel'], 
-                                        UTCDateTime(
-                                            arclink_payload['starttime']), 
-                                        UTCDateTime(
-                                            arclink_payload['endtime']),
-                                        format='MSEED')
-                                        
-                                    length_bytes = len(bf.getvalue())
-                                        
-                            except Exception, e:
-                                    
-                                error_msg = "Arclink error: %s" % e
-                                LOG.error(error_msg)
-                                continue
-                                
-                            # time it
-                            t_end = time.time()
-                            t_req = t_end - t_start
-                               
-                            store_result(
-                                result[node]['result'], length_bytes, 
-                                t_req, arclink_payload, time_int_category, 
-                                protocol, service)
-                        
-                    elif protocol == 'http':
-                            
-                        # dataselect, station
-                        for service in params['services']:
-                            
-                            # GET, POST, federator (GET)
-                            for method in params['methods']:
-                                
-                                # only requested methods/services
-                                if method not in \
-                                        COMMANDLINE_PAR['the_services_list']:
-                                    continue
-                                    
-                                # service URL
-                                if method == 'federator':
-                                        
-                                    # test federator only for EIDA nodes
-                                    if node not in settings.EIDA_NODES:
-                                        continue
-                                    else:
-                                        server = \
-                                            settings.EIDA_FEDERATOR_BASE_URL
-                                else:
-                                    server = get_fdsnws_connection(node_par)
-                                    
-                                endpoint = "%s/fdsnws/%s/1/query" % (
-                                    server, service)
-                                    
-                                LOG.info("querying HTTP {}: {}".format(
-                                    method.upper(), endpoint))
-                                
-                                if method in ('get', 'federator'):
-                                        
-                                    # no cached version
-                                    #headers = {
-                                        #'cache-control': 'private, max-age=0, 
-                                        #no-cache'}
-                                        
-                                    headers = {
-                                        'cache-control': 'max-age=0,no-cache'}
-                                        
-                                    # start timer
-                                    t_start = time.time()
-                                        
-                                    # fire GET request
-                                    try:
-                                        response = requests.get(
-                                            endpoint, params=payload, 
-                                            headers=headers, stream=False)
-                                            
-                                    except requests.exceptions.ConnectionError:
-                                            
-                                        error_msg = "error: no connection"
-                                        LOG.error(error_msg)
-                                        continue
-                                        
-                                    LOG.info("url: {}".format(response.url))
-                                        
-                                elif method == 'post':
-                                        
-                                    # POST params
-                                    postdata = convert_payload_to_postdata(
-                                        payload)
-                                        
-                                    LOG.info(postdata)
-                                        
-                                    # no cached version
-                                    #headers = {
-                                        #'cache-control': 'private, max-age=0, 
-                                        #no-cache'}
-                                        
-                                    headers = {
-                                        'cache-control': 'max-age=0,no-cache'}
-                                        
-                                    # start timer
-                                    t_start = time.time()
-                                        
-                                    # fire POST request
-                                    try:
-                                        response = requests.post(
-                                            endpoint, data=postdata, 
-                                            headers=headers, stream=False)
-                                            
-                                    except requests.exceptions.ConnectionError:
-                                            
-                                        error_msg = "error: no connection"
-                                        LOG.error(error_msg)
-                                        continue
-                                    
-                                else:
-                                    LOG.info("method {} not supported".format(
-                                        method))
-                                    continue
-                                    
-                                if not response.ok:
-                                    error_msg = "service failed with "\
-                                        "code %s" % (response.status_code)
-                                    LOG.error(error_msg)
-                                    continue
-
-                                # time it
-                                t_end = time.time()
-                                t_req = t_end - t_start
-                                    
-                                content = response.content
-                                length_bytes = len(content)
-                                    
-                                store_result(
-                                    result[node]['result'], length_bytes, 
-                                    t_req, payload, time_int_category, 
-                                    protocol, service, method=method, 
-                                    latency=response.elapsed.total_seconds())
-
-    
-    # compute stats
-    for node, node_res in result.items():
+        probes = run_preflight()
+        attach_preflight(result, probes)
         
-        for time_int_category in COMMANDLINE_PAR['the_responsesize_list']:
-            
-            for protocol, params in TEST_SERVICES.items():
-                
-                for service in params['services']:
-                    
-                    base_loc = node_res['result'][time_int_category][protocol]\
-                        [service]
-                    
-                    if protocol == 'arclink':
-                        method_loop = ('arclink',)
-                    else:
-                        method_loop = TEST_SERVICES['http']['methods']
-                    
-                    for method in method_loop:
-                        
-                        if protocol == 'arclink':
-                            stats_to = base_loc
-                            write_to = base_loc['data']
-                        else:
-                            stats_to = base_loc[method]
-                            write_to = base_loc[method]['data']
-                        
-                        if write_to['throughput']:
-                    
-                            LOG.info("----- {}: {}\n".format(
-                                node, base_loc['params']))
-                            
-                            LOG.info("result size (MiB): %.3f" % (
-                                base_loc['length'] / (1000.0 * 1000.0)))
-            
-                            time_median = numpy.median(write_to['time'])
-                            time_min = min(write_to['time'])
-                            time_max = max(write_to['time'])
-                            
-                            tp_median = numpy.median(write_to['throughput'])
-                            tp_min = min(write_to['throughput'])
-                            tp_max = max(write_to['throughput'])
-                            
-                            LOG.info("t_req med/min/max (sec): %.3f %.3f %.3f" % (
-                                time_median, time_min, time_max))
-                            
-                            LOG.info("Mbits_per_sec med/min/max: %.1f %.1f %.1f"\
-                                % (tp_median, tp_min, tp_max))
-                            
-                            if write_to['latency']:
-                                
-                                la_median = numpy.median(write_to['latency'])
-                                la_min = min(write_to['latency'])
-                                la_max = max(write_to['latency'])
-                                
-                                LOG.info("latency med/min/max (sec): %.1f "\
-                                    "%.1f %.1f" % (la_median, la_min, la_max))
-                            
-                                stats_to['stats'] = \
-                                    dict(
-                                        time=dict(
-                                            median=time_median, min=time_min, 
-                                            max=time_max),
-                                        throughput=dict(
-                                            median=tp_median, min=tp_min, 
-                                            max=tp_max),
-                                        latency=dict(
-                                            median=la_median, min=la_min, 
-                                            max=la_max))
-                                        
-                            else:
-                                
-                                stats_to['stats'] = \
-                                    dict(
-                                        time=dict(
-                                            median=time_median, min=time_min, 
-                                            max=time_max),
-                                        throughput=dict(
-                                            median=tp_median, min=tp_min, 
-                                            max=tp_max))
-    
-    # write results to JSON file
-    if FLAGS.of:
-        outfile = FLAGS.of
-    else:
-        outfile = "{}_{}.json.gz".format(
-            OUTFILE_BASE, 
-            datetime.datetime.utcnow().strftime(
-                DATETIME_TIMESTAMP_FORMAT_FOR_FILENAME_SECOND))
+        unreachable = get_unreachable_endpoints(probes)
+    
+    with profiling.phase('measurement'):
+        run_measurements(result, breaker, exclude=unreachable)
+    
+    if unreachable and FLAGS.preflight == 'defer':
+        
+        LOG.info("===== probing deferred endpoints =====")
+        
+        with profiling.phase('planning'):
+            reprobes = run_preflight(unreachable)
+            attach_preflight(result, reprobes, key='reprobe')
+        
+        recovered = set(unreachable) - get_unreachable_endpoints(reprobes)
+        
+        if recovered:
+            LOG.info("===== measuring recovered endpoints: {} =====".format(
+                ", ".join(sorted(recovered))))
             
-    outpath = utils.get_outpath(outfile, FLAGS.od)
+            with profiling.phase('measurement'):
+                run_measurements(
+                    result, breaker, exclude=set(probes) - recovered)
 
-    with gzip.open(outpath, 'wb') as fp:
-        json.dump(result, fp, sort_keys=True, indent=OUTFILE_INDENT)
+    finish_result(result)
+    export_prometheus(result)
+    log_run_summary(result, breaker, time.time() - t_run_start)
 
 
-def init_result_dict():
+def run_cache_study():
+    """
+    Run every measurement alternately with the identical (fixed) time window 
+    and with a randomized window, the order alternating between iterations.
+    The result file contains the measurements of randomized windows, and 
+    per node the cache speed-up (see attach_cache_study).
     
-    global COMMANDLINE_PAR
+    """
     
-    result = dict()
+    breaker = deadlines.CircuitBreaker(FLAGS.breaker)
+    t_run_start = time.time()
     
-    for node, node_par in node_generator():
+    with profiling.phase('planning'):
         
-        result[node] = dict()
-        result[node]['result'] = dict()
+        result = init_result_dict()
+        identical = init_result_dict()
         
-        # reqsize/protocol/service/(method)/
-        for sizemodel in COMMANDLINE_PAR['the_responsesize_list']:
-            result[node]['result'][sizemodel] = dict()
-            result[node]['result'][sizemodel]['http'] = dict()
-            
-            for service in ('dataselect',):
-                
-                result[node]['result'][sizemodel]['http'][service] = dict()
-                
-                for method in ('get', 'post', 'federator'):  
-                    
-                    result[node]['result'][sizemodel]['http'][service]\
-                        [method] = dict()
-                    result[node]['result'][sizemodel]['http'][service][method]\
-                        ['data'] = dict()
+        probes = run_preflight()
+        attach_preflight(result, probes)
+        
+        unreachable = get_unreachable_endpoints(probes)
+    
+    with profiling.phase('measurement'):
+        
+        for time_int_category in COMMANDLINE_PAR['the_responsesize_list']:
             
-                    init_result_store(
-                        result[node]['result'][sizemodel]['http'][service]\
-                            [method]['data'])
-
-            result[node]['result'][sizemodel]['arclink'] = dict()
+            LOG.info("===== cache study: {} time intervals =====".format(
+                time_int_category))
             
-            for service in ('waveform',):
-                result[node]['result'][sizemodel]['arclink'][service] = dict()
-                result[node]['result'][sizemodel]['arclink'][service]['data'] \
-                    = dict()
+            iteration_count = get_iteration_count(time_int_category)
             
-                init_result_store(
-                    result[node]['result'][sizemodel]['arclink'][service]\
-                        ['data'])
+            for it in xrange(iteration_count):
                 
-    return result
-
-
-def init_result_store(result_dict):
-            
-    result_dict['length'] = []
-    result_dict['time'] = []
-    result_dict['throughput'] = []
-    result_dict['latency'] = []
+                LOG.info("========== ITERATION {} of {} ==========".format(
+                    it + 1, iteration_count))
+                
+                variants = [(identical, 'fixed'), (result, 'random')]
+                
+                # neither variant profits systematically from going first
+                if it % 2:
+                    variants.reverse()
+                
+                for node, node_par in node_generator():
+                    
+                    for protocol, service, method in measurement_generator(
+                        node, node_par, time_int_category, unreachable):
+                        
+                        for table, window in variants:
+                            measure(
+                                table, node, node_par, time_int_category, 
+                                protocol, service, method, breaker=breaker, 
+                                window=window)
+    
+    with profiling.phase('statistics'):
+        
+        LOG.info("===== identical windows =====")
+        compute_stats(identical)
+        
+        attach_cache_study(result, identical)
     
+    finish_result(result)
+    export_prometheus(result)
+    log_run_summary(result, breaker, time.time() - t_run_start)
 
-def convert_payload_to_arclink(payload, testsncls):
+
+def attach_cache_study(result, identical):
+    """
+    Store median throughput of identical and randomized windows and cache 
+    speed-up (their ratio) per node: node/cachestudy/size/service/method, 
+    median speed-up of all cells of a node in node/cachestudy/speedup.
     
-    pl = {}
+    """
     
-    for key, value in payload.items():
+    for cell_id, key in identical.iter_cells():
         
-        # if sncl contains comma-separated list, use only first entry
-        if key in ('network', 'station', 'location', 'channel'):
-            
-            if ',' in testsncls[key]:
-                s = testsncls[key].split(',')[0]
-            else:
-                s = testsncls[key]
-                
-            pl[key] = s.replace('?', '*')
-            
+        node, size, _, service, method = key
+        
+        random_cell_id = result.cell_ids.get(key)
+        
+        if random_cell_id is None:
+            random_throughput = []
         else:
-            pl[key] = value
-                                
-    if pl['location'] == '--':
-        pl['location'] = ''
+            random_throughput = result.get_data(random_cell_id)['throughput']
         
-    return pl
+        speedup = windows.get_cache_speedup(
+            identical.get_data(cell_id)['throughput'], random_throughput)
+        
+        result.info[node].setdefault('cachestudy', dict()).setdefault(
+            size, dict()).setdefault(service, dict())[method or 'arclink'] = \
+                speedup
     
-
-def convert_payload_to_postdata(payload):
+    LOG.info("===== cache speed-up (identical / randomized windows) =====")
     
-    pl = ''
+    for node, node_info in sorted(result.info.items()):
+        
+        if 'cachestudy' not in node_info:
+            continue
+        
+        speedups = [
+            cell['speedup'] for size_res in node_info['cachestudy'].values() \
+                for service_res in size_res.values() \
+                    for cell in service_res.values() \
+                        if cell['speedup'] is not None]
+        
+        if speedups:
+            node_info['cachestudy']['speedup'] = float(numpy.median(speedups))
+            LOG.info("%s: median cache speed-up %.2f (%d cells)" % (
+                node, node_info['cachestudy']['speedup'], len(speedups)))
+        else:
+            LOG.info("{}: no cache speed-up (no successful requests)".format(
+                node))
+
+
+def run_buffer_experiment():
+    """
+    Run every HTTP measurement (not federator, not ArcLink) with each 
+    receive buffer size of --rcvbuf, the order of buffer sizes rotating 
+    between iterations. Every request uses a new session (connection) with
+    the buffer size. The result file contains the measurements with the 
+    system default buffer, and per node the throughput vs. buffer size curve
+    and the recommended buffer size (see attach_buffer_experiment).
     
-    sncl_arrays = {}
-    for key in ('network', 'station', 'location', 'channel'):
+    """
     
-        if ',' in payload[key]:
-            sncl_arrays[key] = [x.strip() for x in payload[key].split(',')]
-        else:
-            sncl_arrays[key] = [payload[key],]
+    breaker = deadlines.CircuitBreaker(FLAGS.breaker)
+    t_run_start = time.time()
     
-    starttime_str = UTCDateTime(payload['starttime']).datetime.isoformat()
-    endtime_str = UTCDateTime(payload['endtime']).datetime.isoformat()
+    buffer_sizes = COMMANDLINE_PAR['the_rcvbuf_list']
     
-    for net in sncl_arrays['network']:
-        for sta in sncl_arrays['station']:
-            for loc in sncl_arrays['location']:
-                for cha in sncl_arrays['channel']:
-                    
-                    pl += "{} {} {} {} {} {}\n".format(
-                        net, sta, loc, cha, starttime_str, endtime_str)
-
+    with profiling.phase('planning'):
         
-    return pl
-
-
-def get_node_par(node):
+        tables = dict((x, init_result_dict()) for x in buffer_sizes)
+        result = tables[0]
+        
+        probes = run_preflight()
+        attach_preflight(result, probes)
+        
+        unreachable = get_unreachable_endpoints(probes)
     
-    node_par = None
+    with profiling.phase('measurement'):
+        
+        for time_int_category in COMMANDLINE_PAR['the_responsesize_list']:
+            
+            LOG.info("===== receive buffers: {} time intervals =====".format(
+                time_int_category))
+            
+            iteration_count = get_iteration_count(time_int_category)
+            
+            for it in xrange(iteration_count):
+                
+                LOG.info("========== ITERATION {} of {} ==========".format(
+                    it + 1, iteration_count))
+                
+                # no buffer size profits systematically from its position
+                shift = it % len(buffer_sizes)
+                order = buffer_sizes[shift:] + buffer_sizes[:shift]
+                
+                for node, node_par in node_generator():
+                    
+                    for protocol, service, method in measurement_generator(
+                        node, node_par, time_int_category, unreachable):
+                        
+                        if protocol != 'http' or method == 'federator':
+                            continue
+                        
+                        for rcvbuf in order:
+                            
+                            LOG.info("receive buffer: {}".format(
+                                "%d KiB" % rcvbuf if rcvbuf else 'default'))
+                            
+                            session = sockbuf.make_session(rcvbuf * 1024)
+                            
+                            try:
+                                measure(
+                                    tables[rcvbuf], node, node_par, 
+                                    time_int_category, protocol, service, 
+                                    method, 
+                                    connections=dict(
+                                        http=session, arclink=dict()), 
+                                    breaker=breaker)
+                            finally:
+                                session.close()
     
-    if node in settings.EIDA_NODES:
-        node_par = settings.EIDA_NODES[node] 
-    elif node in settings.OTHER_SERVERS:
-        node_par = settings.OTHER_SERVERS[node]
+    with profiling.phase('statistics'):
+        attach_buffer_experiment(result, tables)
     
-    return node_par
+    finish_result(result)
+    export_prometheus(result)
+    log_run_summary(result, breaker, time.time() - t_run_start)
 
 
-def node_generator():
+def attach_buffer_experiment(result, tables):
+    """
+    Store throughput vs. receive buffer size curve of all HTTP requests of a
+    node and response size (see sockbuf.get_buffer_curve) and the 
+    recommended buffer size (KiB, 0: system default) in 
+    node/rcvbuf/size/curve and node/rcvbuf/size/recommended.
     
-    global COMMANDLINE_PAR
+    """
     
-    # shuffle order
-    nodes = list(COMMANDLINE_PAR['the_node_list'])
-    random.shuffle(nodes)
+    # (node, size) -> buffer size -> throughput samples
+    throughput = dict()
     
-    for node in nodes:
+    for rcvbuf, table in tables.items():
+        
+        for cell_id, (node, size, _, _, _) in table.iter_cells():
+            
+            throughput.setdefault((node, size), dict((x, []) for x in tables))\
+                [rcvbuf].extend(table.get_data(cell_id)['throughput'])
     
-        node_par = get_node_par(node)
+    LOG.info("===== throughput (Mbits/s) vs. receive buffer size =====")
+    
+    for (node, size), throughput_by_buffer in sorted(throughput.items()):
         
-        if node not in COMMANDLINE_PAR['the_excludenode_list']:
-            yield node, node_par
+        curve = sockbuf.get_buffer_curve(throughput_by_buffer)
+        recommended = sockbuf.recommend_buffer(curve)
+        
+        result.info[node].setdefault('rcvbuf', dict())[size] = dict(
+            curve=curve, recommended=recommended)
+        
+        for point in curve:
+            
+            label = "%d KiB" % point['rcvbuf'] if point['rcvbuf'] \
+                else 'default'
+            
+            if point['throughput'] is None:
+                LOG.info("%s %s: %s: no successful requests" % (
+                    node, size, label))
+            else:
+                LOG.info("%s %s: %s (effective %d KiB): %.2f (%d requests)" % (
+                    node, size, label, point['effective'] / 1024, 
+                    point['throughput'], point['count']))
+        
+        if recommended is None:
+            LOG.info("{} {}: no recommendation".format(node, size))
+        elif recommended:
+            LOG.info("{} {}: recommended receive buffer {} KiB".format(
+                node, size, recommended))
+        else:
+            LOG.info("{} {}: system default receive buffer is sufficient"\
+                .format(node, size))
 
 
-def store_result(
-    result, length_bytes, t_req, payload, time_int_category, protocol, 
-    service, method='', latency=None):
+def run_tls_study():
+    """
+    Probe TLS handshakes of the fdsnws servers of all https nodes: per 
+    iteration (--itersmall) a full handshake, followed by a handshake that 
+    resumes its session (pyOpenSSL, see tlssession). The result file 
+    contains the handshake records and their summary per node (see 
+    attach_tls_study), no measurements.
+    
+    """
+    
+    t_run_start = time.time()
+    
+    with profiling.phase('planning'):
+        
+        result = init_result_dict()
+        context = tlssession.make_context()
+    
+    with profiling.phase('measurement'):
+        
+        for it in xrange(FLAGS.itersmall):
+            
+            LOG.info("========== ITERATION {} of {} ==========".format(
+                it + 1, FLAGS.itersmall))
+            
+            for node, node_par in node_generator():
+                
+                server = get_fdsnws_connection(node_par)
+                address = tlssession.get_tls_address(server)
+                
+                if address is None:
+                    continue
+                
+                records = result.info[node].setdefault(
+                    'tls', dict(server=server, full=[], resumed=[]))
+                
+                LOG.info("TLS handshake: {}:{}".format(*address))
+                
+                full, session = tlssession.measure_handshake(
+                    address[0], address[1], context, 
+                    timeout=REQUEST_DEADLINES['small']['connect'])
+                
+                records['full'].append(full)
+                
+                if session is not None:
+                    resumed, _ = tlssession.measure_handshake(
+                        address[0], address[1], context, session, 
+                        timeout=REQUEST_DEADLINES['small']['connect'])
+                    
+                    records['resumed'].append(resumed)
+    
+    with profiling.phase('statistics'):
+        attach_tls_study(result)
+    
+    finish_result(result)
+    
+    LOG.info("===== summary =====")
+    LOG.info("run time: %.1f seconds" % (time.time() - t_run_start))
+
+
+def attach_tls_study(result):
+    """
+    Store summary of the full and resumed handshakes of a node (see 
+    tlssession.summarize_handshakes) in node/tls/summary. Nodes that are 
+    not reached over https have no entry.
+    
+    """
+    
+    LOG.info("===== TLS handshakes (median seconds) =====")
+    
+    for node, node_info in sorted(result.info.items()):
+        
+        if node == utils.RUN_INFO_KEY:
+            continue
+        
+        if 'tls' not in node_info:
+            LOG.info("{}: not https".format(node))
+            continue
+        
+        summary = tlssession.summarize_handshakes(
+            node_info['tls']['full'], node_info['tls']['resumed'])
+        
+        node_info['tls']['summary'] = summary
+        
+        if summary['full'] is None:
+            LOG.info("%s: no successful handshake (%d failed)" % (
+                node, summary['failed']))
+            continue
+        
+        LOG.info("%s: %s %s, connect %.4f, full handshake %.4f, first byte "\
+            "%.4f" % (
+                node, summary['version'], summary['cipher'], 
+                summary['full']['connect'], summary['full']['handshake'], 
+                summary['full']['first_byte']))
+        
+        if summary['resumed'] is not None and \
+            summary['resumption'] is None:
+            LOG.info("%s: resumed handshake %.4f, saving %.4f, resumption "\
+                "unknown (pyOpenSSL)" % (
+                    node, summary['resumed']['handshake'], summary['saving']))
+        
+        elif summary['resumed'] is not None:
+            LOG.info("%s: resumed handshake %.4f, saving %.4f, resumed in "\
+                "%.0f%% of attempts" % (
+                    node, summary['resumed']['handshake'], summary['saving'], 
+                    100 * summary['resumption']))
+        
+        elif summary['resumption'] is not None:
+            LOG.info("{}: sessions not resumed by server".format(node))
+
+
+def run_replay():
+    """
+    Replay the dataselect requests of the access logs of --accesslog against
+    every node, at their logged times (relative to the first request), 
+    compressed by --compression. Requests are sent one after the other; if a
+    request is not complete at the scheduled time of the next one, the next
+    one is sent late. Request class (response size of the result) is the 
+    size category of the duration of the requested time window. The result
+    file contains the measurements, and per node the replay report (see 
+    attach_replay_report).
+    
+    """
+    
+    breaker = deadlines.CircuitBreaker(FLAGS.breaker)
+    t_run_start = time.time()
+    
+    with profiling.phase('planning'):
+        
+        result = init_result_dict()
+        
+        schedule, skipped = accesslog.read_schedule(
+            COMMANDLINE_PAR['the_accesslog_list'], FLAGS.compression, 
+            FLAGS.replaylimit)
+        
+        LOG.info("access logs: %d requests, %d templates, %d lines skipped, "\
+            "replay time %.1f seconds" % (
+                len(schedule), 
+                len(set(repr(sorted(x[1].items())) for x in schedule)), 
+                skipped, schedule[-1][0] if schedule else 0.0))
+        
+        # request classes: size categories by time window duration
+        categories = sorted(
+            [(name, x['time_interval_duration']) \
+                for name, x in TEST_TIME_INTERVALS.items()], 
+            key=lambda x: x[1])
+    
+    with profiling.phase('measurement'):
+        
+        for node, node_par in node_generator():
+            
+            LOG.info("===== replaying access logs: {} =====".format(node))
+            
+            lags = []
+            t_start = time.time()
+            
+            for offset, template in schedule:
+                
+                delay = t_start + offset - time.time()
+                
+                if delay > 0:
+                    time.sleep(delay)
+                
+                lags.append(max(0.0, -delay))
+                
+                measure(
+                    result, node, node_par, 
+                    accesslog.classify(template['duration'], categories), 
+                    'http', 'dataselect', template['method'], 
+                    breaker=breaker, 
+                    payload=template['params'] or template['body'])
+            
+            if lags:
+                result.info[node]['replay'] = dict(
+                    requests=len(lags), 
+                    late=len([x for x in lags if x > REPLAY_LATE_SECONDS]),
+                    lag_median=float(numpy.median(lags)), lag_max=max(lags),
+                    compression=FLAGS.compression, skipped=skipped)
+    
+    with profiling.phase('statistics'):
+        attach_replay_report(result)
+    
+    finish_result(result)
+    export_prometheus(result)
+    log_run_summary(result, breaker, time.time() - t_run_start)
+
+
+def attach_replay_report(result):
+    """
+    Store percentiles (REPLAY_PERCENTILES) of latency, request time and 
+    throughput of the replayed requests per request class and method in 
+    node/replay/classes/class/method, and log them with the lag of the 
+    replay (time requests were sent after their scheduled time).
+    
+    """
+    
+    LOG.info("===== replay: percentiles %s per request class =====" % (
+        "/".join("p%d" % x for x in REPLAY_PERCENTILES)))
+    
+    for cell_id, (node, request_class, _, _, method) in sorted(
+        result.iter_cells(), key=lambda x: x[1]):
+        
+        data = result.get_data(cell_id)
+        
+        report = dict(
+            count=len(data['throughput']), attempts=len(data['attempts']))
+        
+        for metric in ('latency', 'time', 'throughput'):
+            
+            if len(data[metric]):
+                report[metric] = [
+                    float(x) for x in numpy.percentile(
+                        data[metric], REPLAY_PERCENTILES)]
+        
+        result.info[node].setdefault('replay', dict()).setdefault(
+            'classes', dict()).setdefault(request_class, dict())[method] = \
+                report
+        
+        LOG.info("%s %s %s: %d of %d requests successful" % (
+            node, request_class, method, report['count'], 
+            report['attempts']))
+        
+        for metric, unit in (
+            ('latency', 'sec'), ('time', 'sec'), ('throughput', 'Mbits/s')):
+            
+            if metric in report:
+                LOG.info("    %s (%s): %s" % (metric, unit, " ".join(
+                    "%.3f" % x for x in report[metric])))
+    
+    for node, node_info in sorted(result.info.items()):
+        
+        if 'lag_median' in node_info.get('replay', dict()):
+            LOG.info("%s: %d requests, %d late (> %.1f sec), lag med/max "\
+                "(sec): %.3f %.3f" % (
+                    node, node_info['replay']['requests'], 
+                    node_info['replay']['late'], REPLAY_LATE_SECONDS, 
+                    node_info['replay']['lag_median'], 
+                    node_info['replay']['lag_max']))
+
+
+def run_open_loop():
+    """
+    Send dataselect GET requests to every node in load steps of increasing 
+    rate (--rates, --stepduration), scheduled with --arrivals and sent 
+    concurrently by up to --workers threads regardless of completion. 
+    Latency and request time are measured from the scheduled send time. The
+    result file contains the measurements of all steps, and per node the 
+    load steps and the knee (see attach_load_steps).
+    
+    """
+    
+    t_run_start = time.time()
+    
+    with profiling.phase('planning'):
+        result = init_result_dict()
+    
+    for time_int_category in COMMANDLINE_PAR['the_responsesize_list']:
+        
+        for node, node_par in node_generator():
+            
+            steps = []
+            
+            for rate in COMMANDLINE_PAR['the_rate_list']:
+                
+                LOG.info("===== open loop: {} {}, {} requests/s =====".format(
+                    node, time_int_category, rate))
+                
+                with profiling.phase('planning'):
+                    
+                    # parameters drawn here, random windows are not 
+                    # thread-safe
+                    schedule = [
+                        (offset, (get_payload(
+                            node, node_par, time_int_category, 
+                            FLAGS.windows),)) \
+                            for offset in openloop.make_arrivals(
+                                rate, FLAGS.stepduration, FLAGS.arrivals)]
+                
+                with profiling.phase('measurement'):
+                    
+                    responses = openloop.run_schedule(
+                        schedule, 
+                        lambda t_scheduled, payload: fire_load_request(
+                            node_par, time_int_category, payload, 
+                            t_scheduled), 
+                        FLAGS.workers)
+                
+                records = []
+                
+                for t_scheduled, (measurement, attempt, payload) in responses:
+                    
+                    attempt['scheduled'] = t_scheduled
+                    
+                    store_attempt(
+                        result, node, attempt, time_int_category, 'http', 
+                        'dataselect', 'get')
+                    
+                    if measurement is None:
+                        latency = None
+                    else:
+                        length_bytes, t_req, latency, _ = measurement
+                        
+                        store_result(
+                            result, node, length_bytes, t_req, payload, 
+                            time_int_category, 'http', 'dataselect', 
+                            method='get', latency=latency)
+                    
+                    records.append(
+                        openloop.make_record(t_scheduled, attempt, latency))
+                
+                steps.append(openloop.summarize_step(
+                    records, rate, FLAGS.stepduration))
+            
+            attach_load_steps(result, node, time_int_category, steps)
+    
+    finish_result(result)
+    export_prometheus(result)
+    
+    LOG.info("===== summary =====")
+    LOG.info("run time: %.1f seconds" % (time.time() - t_run_start))
+
+
+def fire_load_request(node_par, time_int_category, payload, t_scheduled):
+    """
+    Fire dataselect GET request (in worker thread of open loop). A request 
+    that waited for a free worker beyond its total deadline is not sent and
+    fails with outcome deadline, so that an overloaded run ends. Return 
+    tuple (measurement, attempt, payload), see fire_http_request.
+    
+    """
+    
+    request_deadlines = get_request_deadlines(time_int_category)
+    
+    if time.time() - t_scheduled > request_deadlines['total']:
+        return None, make_attempt('deadline', time.time()), payload
+    
+    endpoint = get_http_endpoint(node_par, 'dataselect', 'get')
+    dns_record = dict()
+    
+    with resolver.record(dns_record):
+        measurement, attempt = fire_http_request(
+            'get', endpoint, payload, request_deadlines=request_deadlines)
+    
+    if dns_record:
+        attempt['dns'] = dns_record
+    
+    return measurement, attempt, payload
+
+
+def attach_load_steps(result, node, time_int_category, steps):
+    """
+    Store load steps (see openloop.summarize_step) and knee (lowest rate 
+    with latency blow-up or failures, see openloop.find_knee) of node in 
+    node/openloop/size, and log them.
+    
+    """
+    
+    knee = openloop.find_knee(steps)
+    
+    result.info[node].setdefault('openloop', dict())[time_int_category] = \
+        dict(
+            steps=steps, knee=knee, arrivals=FLAGS.arrivals, 
+            workers=FLAGS.workers, duration=FLAGS.stepduration)
+    
+    LOG.info("===== open loop: %s %s, latency percentiles %s (sec) vs. "\
+        "offered load =====" % (node, time_int_category, "/".join(
+            "p%d" % x for x in openloop.LOAD_PERCENTILES)))
+    
+    for step in steps:
+        
+        LOG.info("%s: %.2f requests/s offered, %.2f achieved, %d of %d "\
+            "failed, latency %s, queue %s" % (
+                node, step['rate'], step['achieved'], step['failed'], 
+                step['requests'], 
+                " ".join("%.3f" % x for x in step.get('latency', [])) or '-', 
+                " ".join("%.3f" % x for x in step.get('queue', [])) or '-'))
+    
+    if knee is None:
+        LOG.info("{}: no latency blow-up or failures up to {} "\
+            "requests/s".format(node, steps[-1]['rate'] if steps else 0))
+    else:
+        LOG.info("{}: latency blows up or requests fail at {} "\
+            "requests/s".format(node, knee))
+
+
+def run_split_benchmark():
+    """
+    Fetch the dataselect time window of every response size (default: 
+    verylarge, huge) in one GET request and split into K contiguous 
+    sub-windows (--splits), fetched concurrently over a pool of K 
+    connections, per iteration and node. The records of every split run 
+    are compared with those of the single request of the same iteration. 
+    The result file contains the single requests as measurements, and per 
+    node the runs and their comparison (see attach_split_benchmark).
+    
+    """
+    
+    t_run_start = time.time()
+    
+    with profiling.phase('planning'):
+        result = init_result_dict()
+    
+    # (node, size) -> list of runs
+    runs = dict()
+    
+    with profiling.phase('measurement'):
+        
+        for time_int_category in COMMANDLINE_PAR['the_responsesize_list']:
+            
+            iteration_count = get_iteration_count(time_int_category)
+            
+            for it in xrange(iteration_count):
+                
+                LOG.info("========== ITERATION {} of {} ==========".format(
+                    it + 1, iteration_count))
+                
+                for node, node_par in node_generator():
+                    
+                    iteration_runs = dict()
+                    
+                    for splits in COMMANDLINE_PAR['the_split_list']:
+                        
+                        LOG.info("===== split window: {} {}, {} "\
+                            "sub-windows =====".format(
+                                node, time_int_category, splits))
+                        
+                        iteration_runs[splits] = run_split_download(
+                            result, node, node_par, time_int_category, 
+                            splits)
+                    
+                    reference = iteration_runs[1]['digests']
+                    
+                    for splits, run in sorted(iteration_runs.items()):
+                        
+                        digests = run.pop('digests')
+                        
+                        if splits > 1 and reference is not None and \
+                            digests is not None:
+                            run.update(splitwindow.compare_records(
+                                reference, digests))
+                        
+                        runs.setdefault((node, time_int_category), []).append(
+                            run)
+    
+    with profiling.phase('statistics'):
+        attach_split_benchmark(result, runs)
+    
+    finish_result(result)
+    export_prometheus(result)
+    
+    LOG.info("===== summary =====")
+    LOG.info("run time: %.1f seconds" % (time.time() - t_run_start))
+
+
+def run_split_download(result, node, node_par, time_int_category, splits):
+    """
+    Fetch the time window of the response size in splits sub-windows 
+    concurrently, over a new session with a pool of splits connections. The
+    single request (splits 1) is stored as measurement. Return run dict: 
+    splits, time (first request sent to last byte received), bytes, 
+    throughput (Mbits/s), failed requests, record digests (None if a 
+    request failed).
+    
+    """
+    
+    payload = get_payload(node, node_par, time_int_category)
+    
+    payloads = [
+        dict(payload, starttime=start.isoformat(), endtime=end.isoformat()) \
+            for start, end in splitwindow.split_window(
+                UTCDateTime(payload['starttime']).datetime, 
+                UTCDateTime(payload['endtime']).datetime, splits)]
+    
+    endpoint = get_http_endpoint(node_par, 'dataselect', 'get')
+    request_deadlines = get_request_deadlines(time_int_category)
+    
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1, pool_maxsize=splits)
+    
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    
+    connections = dict(http=session, arclink=dict())
+    pool = ThreadPool(splits)
+    
+    t_start = time.time()
+    
+    try:
+        responses = pool.map(
+            lambda x: fire_http_request(
+                'get', endpoint, x, 'miniseed', connections, 
+                request_deadlines), 
+            payloads)
+    
+    finally:
+        pool.close()
+        pool.join()
+        session.close()
+    
+    t_total = time.time() - t_start
+    
+    measurements = [x[0] for x in responses]
+    length_bytes = sum(x[1]['bytes'] for x in responses)
+    
+    if splits == 1:
+        
+        measurement, attempt = responses[0]
+        
+        store_attempt(
+            result, node, attempt, time_int_category, 'http', 'dataselect', 
+            'get')
+        
+        if measurement is not None:
+            store_result(
+                result, node, measurement[0], measurement[1], payload, 
+                time_int_category, 'http', 'dataselect', method='get', 
+                latency=measurement[2])
+    
+    failed = len([x for x in measurements if x is None])
+    
+    if failed:
+        digests = None
+    else:
+        digests = [
+            digest for x in measurements for digest in x[3].digests]
+    
+    LOG.info("%d sub-windows: %.3f MiB in %.2f seconds, %.2f Mbits/s, %d "\
+        "failed" % (
+            splits, length_bytes / (1000.0 * 1000.0), t_total, 
+            8 * length_bytes / (t_total * 1000 * 1000), failed))
+    
+    return dict(
+        splits=splits, start=t_start, time=t_total, bytes=length_bytes, 
+        throughput=8 * length_bytes / (t_total * 1000 * 1000), 
+        failed=failed, digests=digests)
+
+
+def attach_split_benchmark(result, runs):
+    """
+    Store runs, their summary per number of sub-windows (see 
+    splitwindow.summarize_runs) and the recommended number of sub-windows 
+    (see splitwindow.recommend_splits) of a node in node/splitwindow/size, 
+    and log them.
+    
+    """
+    
+    LOG.info("===== split window: time to complete vs. sub-windows =====")
+    
+    for (node, time_int_category), node_runs in sorted(runs.items()):
+        
+        summary = splitwindow.summarize_runs(node_runs)
+        recommended = splitwindow.recommend_splits(summary)
+        
+        result.info[node].setdefault('splitwindow', dict())\
+            [time_int_category] = dict(
+                runs=node_runs, summary=summary, recommended=recommended)
+        
+        for splits, x in sorted(summary.items()):
+            
+            if x['time'] is None:
+                LOG.info("%s %s: %d sub-windows: all %d runs failed" % (
+                    node, time_int_category, splits, x['runs']))
+                continue
+            
+            LOG.info("%s %s: %d sub-windows: med time %.2f sec, med %.2f "\
+                "Mbits/s, speed-up %s, all records %s, %d of %d runs "\
+                "failed" % (
+                    node, time_int_category, splits, x['time'], 
+                    x['throughput'], 
+                    "%.2f" % x['speedup'] if x['speedup'] else '-', 
+                    "%.0f%%" % (100 * x['complete']) \
+                        if x['complete'] is not None else '-', 
+                    x['failed'], x['runs']))
+        
+        LOG.info("{} {}: recommended sub-windows: {}".format(
+            node, time_int_category, recommended or '-'))
+
+
+def run_measurements(result, breaker, exclude=()):
+    """
+    Run all requested measurements back to back, except those of the 
+    endpoints in exclude (see get_endpoint_key).
+    
+    """
+    
+    for time_int_category in COMMANDLINE_PAR['the_responsesize_list']:
+        
+        LOG.info("===== testing {} time intervals =====".format(
+            time_int_category))
+        
+        # make iterations outer loop so that there is some time
+        # between requests for the same node
+        iteration_count = get_iteration_count(time_int_category)
+            
+        for it in xrange(iteration_count):
+            
+            LOG.info("========== ITERATION {} of {} ==========".format(
+                it + 1, iteration_count))
+ 
+            # iterate over nodes
+            for node, node_par in node_generator():
+                
+                for protocol, service, method in measurement_generator(
+                    node, node_par, time_int_category, exclude):
+                    
+                    measure(
+                        result, node, node_par, time_int_category, protocol, 
+                        service, method, breaker=breaker)
+
+
+def run_preflight(endpoints=None):
+    """
+    Probe endpoints (fdsnws and ArcLink of selected nodes, federator) 
+    concurrently, or only those in endpoints. Return dict endpoint key -> 
+    probe result (see preflight.make_probe_result), empty if --preflight 
+    is off.
+    
+    """
+    
+    if FLAGS.preflight == 'off':
+        return dict()
+    
+    targets = get_preflight_targets()
+    
+    if endpoints is not None:
+        targets = dict(
+            (key, target) for key, target in targets.items() \
+                if key in endpoints)
+    
+    probes = preflight.probe_all(targets, FLAGS.preflighttimeout)
+    
+    for key, probe in sorted(probes.items()):
+        
+        if probe['reachable']:
+            LOG.info("pre-flight {}: {} reachable, RTT {:.3f} s".format(
+                key, probe['target'], probe['rtt']))
+        else:
+            LOG.error("pre-flight {}: {} unreachable ({})".format(
+                key, probe['target'], probe['error'] or probe['status']))
+    
+    return probes
+
+
+def get_preflight_targets():
+    """Return dict endpoint key -> probe target (see preflight.probe_all)."""
+    
+    targets = dict()
+    
+    for node, node_par in node_generator():
+        
+        targets[get_endpoint_key(node, 'http', 'get')] = (
+            'http', preflight.get_fdsnws_version_url(
+                get_fdsnws_connection(node_par)))
+        
+        if 'arclink' in COMMANDLINE_PAR['the_services_list'] and \
+            'arclink' in node_par['services']:
+            
+            targets[get_endpoint_key(node, 'arclink', '')] = (
+                'tcp', get_arclink_connection(node_par))
+        
+        if 'federator' in COMMANDLINE_PAR['the_services_list'] and \
+            node in settings.EIDA_NODES:
+            
+            targets[get_endpoint_key(node, 'http', 'federator')] = (
+                'http', preflight.get_fdsnws_version_url(
+                    settings.EIDA_FEDERATOR_BASE_URL))
+    
+    return targets
+
+
+def get_endpoint_key(node, protocol, method):
+    """Endpoint of measurement: node/fdsnws, node/arclink, or federator."""
+    
+    if protocol == 'arclink':
+        return "{}/arclink".format(node)
+    
+    elif method == 'federator':
+        return 'federator'
+    
+    else:
+        return "{}/fdsnws".format(node)
+
+
+def get_unreachable_endpoints(probes):
+    return set(key for key, probe in probes.items() if not probe['reachable'])
+
+
+def attach_preflight(result, probes, key='probe'):
+    """
+    Store probe results in result: node/preflight/endpoint/key
+    (endpoint fdsnws, arclink, federator).
+    
+    """
+    
+    for endpoint_key, probe in probes.items():
+        
+        if endpoint_key == 'federator':
+            nodes = [
+                node for node in result.info if node in settings.EIDA_NODES]
+            endpoint = 'federator'
+        else:
+            node, endpoint = endpoint_key.split('/')
+            nodes = [node]
+        
+        for node in nodes:
+            if node in result.info:
+                result.info[node].setdefault('preflight', dict()).setdefault(
+                    endpoint, dict())[key] = probe
+
+
+def run_daemon():
+    """
+    Run as long-lived process. In every cycle (default: 24 hours), all 
+    requested measurements are spread evenly with a random jitter, 
+    iterations of the same measurement are spaced by about cycle length / 
+    iteration count. HTTP connections and ArcLink clients are kept open 
+    between requests. Every --rollinterval minutes, the statistics of the 
+    measurements since the last roll are written to a new result file.
+    
+    """
+    
+    if FLAGS.of:
+        raise ValueError, "--of cannot be used in daemon mode"
+    
+    # write partial rolling file when terminated
+    signal.signal(signal.SIGTERM, terminate)
+    
+    connections = init_connections()
+    roll_seconds = FLAGS.rollinterval * 60
+    cycle_seconds = FLAGS.cycle * 60 * 60
+    
+    result = init_result_dict()
+    breaker = deadlines.CircuitBreaker(FLAGS.breaker)
+    
+    cycle_start = time.time()
+    t_run_start = cycle_start
+    roll_end = cycle_start + roll_seconds
+    
+    try:
+        while True:
+            
+            # unreachable endpoints are skipped for this cycle
+            with profiling.phase('planning'):
+                probes = run_preflight()
+                attach_preflight(result, probes)
+                
+                schedule = make_daemon_schedule(
+                    cycle_start, cycle_seconds, 
+                    get_unreachable_endpoints(probes))
+            
+            # nodes skipped in last cycle get a new chance
+            breaker.reset()
+            
+            LOG.info("===== daemon cycle: {} requests in {} hours =====".format(
+                len(schedule), FLAGS.cycle))
+            
+            if not schedule:
+                LOG.error("no reachable endpoints, waiting for next cycle")
+                time.sleep(max(0, cycle_start + cycle_seconds - time.time()))
+            
+            for t_scheduled, node, time_int_category, protocol, service, \
+                method in schedule:
+                
+                # wait for scheduled time, roll result file on the way
+                while True:
+                    
+                    now = time.time()
+                    
+                    if now >= roll_end:
+                        
+                        if result.has_attempts():
+                            finish_result(result)
+                        
+                        result = init_result_dict()
+                        attach_preflight(result, probes)
+                        
+                        while roll_end <= now:
+                            roll_end += roll_seconds
+                        continue
+                    
+                    if now >= t_scheduled:
+                        break
+                    
+                    time.sleep(min(t_scheduled, roll_end) - now)
+                
+                with profiling.phase('measurement'):
+                    measure(
+                        result, node, get_node_par(node), time_int_category, 
+                        protocol, service, method, connections=connections, 
+                        breaker=breaker)
+            
+            # next cycle starts on time, or immediately if behind schedule
+            cycle_start = max(cycle_start + cycle_seconds, time.time())
+    
+    finally:
+        
+        if result.has_attempts():
+            finish_result(result)
+            export_prometheus(result)
+        
+        log_run_summary(result, breaker, time.time() - t_run_start)
+
+
+def terminate(signum, frame):
+    raise SystemExit("terminated by signal {}".format(signum))
+
+
+def make_daemon_schedule(cycle_start, cycle_seconds, exclude=()):
+    """
+    Return list of scheduled requests (t_scheduled, node, size, protocol, 
+    service, method) for one cycle, sorted by time. Measurements of
+    endpoints in exclude are not scheduled.
+    
+    """
+    
+    measurements = []
+    
+    for time_int_category in COMMANDLINE_PAR['the_responsesize_list']:
+        
+        iteration_count = get_iteration_count(time_int_category)
+        
+        for node, node_par in node_generator():
+            
+            for protocol, service, method in measurement_generator(
+                node, node_par, time_int_category, exclude):
+                
+                # iterations of the same measurement are evenly spaced
+                # over the cycle, with a random phase
+                phase = random.random()
+                
+                for it in xrange(iteration_count):
+                    measurements.append((
+                        (it + phase) / iteration_count, node, 
+                        time_int_category, protocol, service, method))
+    
+    measurements.sort()
+    
+    if not measurements:
+        
+        # all endpoints unreachable
+        if exclude:
+            return []
+        
+        raise ValueError, "no measurements selected"
+    
+    # one request per time slot, at random time within slot
+    slot = float(cycle_seconds) / len(measurements)
+    
+    return [
+        (cycle_start + (idx + random.random()) * slot,) + m[1:] \
+            for idx, m in enumerate(measurements)]
+
+
+def get_iteration_count(time_int_category):
+    
+    if time_int_category in ('verylarge', 'huge'):
+        return FLAGS.iterlarge
+    else:
+        return FLAGS.itersmall
+
+
+def measurement_generator(node, node_par, time_int_category, exclude=()):
+    """
+    Yield (protocol, service, method) of all requested measurements for a 
+    node and a response size category, except those of endpoints in exclude
+    (see get_endpoint_key). ArcLink has no method.
+    
+    """
+    
+    # protocol (arclink, http fdsnws)
+    for protocol, params in TEST_SERVICES.items():
+        
+        # skip arclink for huge request, no node
+        # delivers it
+        if protocol == 'arclink':
+            
+            if 'arclink' in COMMANDLINE_PAR['the_services_list'] and \
+                'arclink' in node_par['services'] and \
+                'huge' != time_int_category and \
+                get_endpoint_key(node, protocol, '') not in exclude:
+                
+                # waveform, station, etc
+                for service in params['services']:
+                    yield protocol, service, ''
+            
+        elif protocol == 'http':
+            
+            # dataselect, station levels, availability
+            for service in params['services']:
+                
+                if service not in COMMANDLINE_PAR['the_httpservices_list']:
+                    continue
+                
+                # GET, POST, federator (GET)
+                for method in params['methods']:
+                    
+                    # only requested methods/services
+                    if method not in COMMANDLINE_PAR['the_services_list']:
+                        continue
+                    
+                    if method not in HTTP_SERVICE_QUERIES[service]['methods']:
+                        continue
+                    
+                    # test federator only for EIDA nodes
+                    if method == 'federator' and \
+                        node not in settings.EIDA_NODES:
+                        continue
+                    
+                    # unreachable in pre-flight probe
+                    if get_endpoint_key(node, protocol, method) in exclude:
+                        continue
+                    
+                    yield protocol, service, method
+
+
+def get_payload(node, node_par, time_int_category, window='fixed'):
+    """
+    Return request parameters. Window random: time window drawn from
+    archive range, not overlapping with earlier windows of the node.
+    
+    """
+    
+    if window == 'random':
+        starttime, endtime = COMMANDLINE_PAR['window_generator'].draw(
+            node, TEST_TIME_INTERVALS[time_int_category]\
+                ['time_interval_duration'])
+        
+        starttime = starttime.isoformat()
+        endtime = endtime.isoformat()
+    
+    else:
+        starttime = TEST_TIME_INTERVALS[time_int_category]['start']
+        endtime = TEST_TIME_INTERVALS[time_int_category]['end']
+    
+    return {
+        'network': node_par['testquerysncls']['network'],
+        'station': node_par['testquerysncls']['station'],
+        'location': node_par['testquerysncls']['location'],
+        'channel': node_par['testquerysncls']['channel'],
+        'starttime': starttime,
+        'endtime': endtime
+    }
+
+
+def measure(
+    result, node, node_par, time_int_category, protocol, service, method, 
+    connections=None, breaker=None, window=None, payload=None):
+    """
+    Run one request and store its result and the record of the attempt 
+    (also if it failed). Window (fixed, random) overrides --windows, 
+    payload (request parameters, or POST body) the parameters of the 
+    response size category. If 
+    connections (see init_connections) are given, they are reused. If a 
+    circuit breaker is given, requests to a node with too many consecutive 
+    failures are skipped (separately for fdsnws and ArcLink, which are 
+    different servers). Host name lookups of the request are added to the 
+    attempt record (dns, see resolver.record), with --memory, the memory 
+    use of the request.
+    
+    """
+    
+    breaker_key = (node, protocol)
+    
+    if breaker is not None and breaker.is_open(breaker_key):
+        LOG.info("skipping {} {} (circuit breaker open)".format(
+            node, protocol))
+        breaker.skip(breaker_key)
+        return
+    
+    if FLAGS.memory:
+        memory_record = dict()
+    else:
+        memory_record = None
+    
+    dns_record = dict()
+    
+    with memory.record(memory_record), resolver.record(dns_record):
+        attempt = run_request(
+            result, node, node_par, time_int_category, protocol, service, 
+            method, connections, window or FLAGS.windows, payload)
+    
+    if memory_record is not None:
+        attempt['memory'] = memory_record
+    
+    if dns_record:
+        attempt['dns'] = dns_record
+    
+    store_attempt(
+        result, node, attempt, time_int_category, protocol, service, method)
+    
+    if breaker is not None and breaker.record(
+        breaker_key, attempt['outcome'] == 'ok', attempt['elapsed']):
+        
+        LOG.error("{} consecutive failures, skipping remaining {} requests "\
+            "of {}".format(breaker.max_failures, protocol, node))
+    
+    # continuous run: metrics after every request, otherwise at the end only
+    if FLAGS.mode == 'daemon':
+        export_prometheus(result)
+
+
+def run_request(
+    result, node, node_par, time_int_category, protocol, service, method, 
+    connections=None, window='fixed', payload=None):
+    """
+    Fire request, store result if successful. Return attempt record. 
+    Payload (dict of request parameters, or POST body) is the one of the 
+    response size category if not given.
+    
+    """
+    
+    if payload is None:
+        payload = get_payload(node, node_par, time_int_category, window)
+    request_deadlines = get_request_deadlines(time_int_category)
+    
+    if protocol == 'arclink':
+    
+        # check empty loc, wildcard *
+        # no comma-separated list allowed 
+        # in Arclink client
+        arclink_payload = convert_payload_to_arclink(
+            payload, node_par['testquerysncls'])
+        
+        measurement, attempt = fire_arclink_request(
+            node_par, arclink_payload, connections, request_deadlines)
+        
+        if measurement is not None:
+            length_bytes, t_req = measurement
+            
+            store_result(
+                result, node, length_bytes, t_req, arclink_payload, 
+                time_int_category, protocol, service)
+    
+    elif protocol == 'http':
+        
+        query = HTTP_SERVICE_QUERIES[service]
+        
+        # POST body (replay) is sent as it is
+        if isinstance(payload, basestring):
+            service_payload = payload
+        else:
+            service_payload = dict(payload)
+            service_payload.update(query['params'])
+        
+        # service URL
+        endpoint = get_http_endpoint(node_par, service, method)
+            
+        LOG.info("querying HTTP {}: {}".format(method.upper(), endpoint))
+        
+        measurement, attempt = fire_http_request(
+            method, endpoint, service_payload, query['format'], connections, 
+            request_deadlines)
+        
+        if measurement is not None:
+            length_bytes, t_req, latency, counter = measurement
+            
+            if counter is not None:
+                count = counter.count(query['count'])
+            else:
+                count = None
+                
+            store_result(
+                result, node, length_bytes, t_req, service_payload, 
+                time_int_category, protocol, service, method=method, 
+                latency=latency, count=count)
+    
+    return attempt
+
+
+def get_http_endpoint(node_par, service, method):
+    """Return service URL of node, of the federator for method federator."""
+    
+    if method == 'federator':
+        server = settings.EIDA_FEDERATOR_BASE_URL
+    else:
+        server = get_fdsnws_connection(node_par)
+    
+    return "%s/fdsnws/%s" % (server, HTTP_SERVICE_QUERIES[service]['path'])
+
+
+def get_request_deadlines(time_int_category):
+    """Return dict of connect, read and total deadline (seconds)."""
+    
+    return dict(
+        (key, value * FLAGS.timeoutscale) for key, value in \
+            REQUEST_DEADLINES[time_int_category].items())
+
+
+def log_run_summary(result, breaker, t_run):
+    
+    attempts = [
+        attempt for cell_id, _ in result.iter_cells() \
+            for attempt in result.get_attempts(cell_id)]
+    
+    failed = [x for x in attempts if x['outcome'] != 'ok']
+    
+    LOG.info("===== summary =====")
+    LOG.info("run time: %.1f seconds, requests: %d, failed: %d (%.1f "\
+        "seconds)" % (
+            t_run, len(attempts), len(failed), 
+            sum(x['elapsed'] for x in failed)))
+    
+    for outcome in merging.ATTEMPT_OUTCOMES[1:]:
+        count = len([x for x in failed if x['outcome'] == outcome])
+        
+        if count:
+            LOG.info("failed requests ({}): {}".format(outcome, count))
+    
+    skipped = breaker.summary()
+    
+    for (node, protocol), (skipped_count, saved_seconds) in sorted(
+        skipped.items()):
+        
+        LOG.info("%s %s: %d requests skipped (circuit breaker), about %.1f "\
+            "seconds saved" % (node, protocol, skipped_count, saved_seconds))
+    
+    if skipped:
+        LOG.info("circuit breaker: %d requests skipped, about %.1f seconds "\
+            "saved" % (
+                sum(x[0] for x in skipped.values()), 
+                sum(x[1] for x in skipped.values())))
+    
+    if FLAGS.tlsresume:
+        context = COMMANDLINE_PAR['tls_context']
+        
+        LOG.info("TLS handshakes: {}, resumed: {}".format(
+            context.handshakes, 
+            'unknown' if context.resumed is None else context.resumed))
+
+
+def init_connections():
+    """
+    HTTP session and ArcLink clients (per server) kept between requests. 
+    With --tlsresume, the HTTP session resumes TLS sessions.
+    
+    """
+    
+    if FLAGS.tlsresume:
+        http = tlssession.make_session(COMMANDLINE_PAR['tls_context'])
+    else:
+        http = requests.Session()
+    
+    return dict(http=http, arclink=dict())
+
+
+def compute_stats(result):
+    """
+    Compute statistics and quantile sketches of all cells of the sample 
+    table that have attempts.
+    
+    """
+    
+    for cell_id, (node, _, _, _, _) in result.iter_cells():
+        
+        data = result.get_data(cell_id)
+        
+        if not data['attempts']:
+            continue
+        
+        service_info = result.get_service_info(cell_id)
+        
+        LOG.info("----- {}: {}\n".format(node, service_info.get('params')))
+        
+        if 'length' in service_info:
+            LOG.info("result size (MiB): %.3f" % (
+                service_info['length'] / (1000.0 * 1000.0)))
+        
+        stats = merging.compute_cell_stats(data)
+        log_stats(stats)
+        
+        # mergeable quantile sketches for aggregation across runs
+        result.set_stats(cell_id, stats, merging.compute_cell_sketches(data))
+
+
+def log_stats(stats):
+    
+    LOG.info("attempts: %d, failed: %d, success ratio: %.2f" % (
+        stats['attempts']['count'], stats['attempts']['failed'], 
+        stats['attempts']['success_ratio']))
+    
+    if 'failure_time' in stats:
+        LOG.info("failure time med/min/max (sec): %.3f %.3f %.3f" % (
+            stats['failure_time']['median'], stats['failure_time']['min'], 
+            stats['failure_time']['max']))
+    
+    if 'effective_throughput' in stats:
+        LOG.info("effective Mbits_per_sec (failures counted in): %.1f" % (
+            stats['effective_throughput']))
+    
+    if 'transfer' in stats:
+        LOG.info("transfer med steady Mbits_per_sec/ramp-up/stall (sec): "\
+            "%.1f %.1f %.1f" % (
+                stats['transfer']['steady_rate'], 
+                stats['transfer']['rampup_time'], 
+                stats['transfer']['longest_stall']))
+    
+    if 'dns' in stats:
+        LOG.info("dns resolution med/max (sec): %.4f %.4f" % (
+            stats['dns']['median'], stats['dns']['max']))
+    
+    if 'tcp' in stats:
+        LOG.info("tcp_info med: {}".format(", ".join(
+            "%s %.6g" % (field, stats['tcp'][field]) \
+                for field in tcpinfo.TCP_INFO_STATS if field in stats['tcp'])))
+    
+    # all attempts failed
+    if 'throughput' not in stats:
+        return
+    
+    LOG.info("t_req med/min/max (sec): %.3f %.3f %.3f" % (
+        stats['time']['median'], stats['time']['min'], 
+        stats['time']['max']))
+    
+    LOG.info("Mbits_per_sec med/min/max: %.1f %.1f %.1f" % (
+        stats['throughput']['median'], stats['throughput']['min'], 
+        stats['throughput']['max']))
+    
+    if 'latency' in stats:
+        LOG.info("latency med/min/max (sec): %.1f %.1f %.1f" % (
+            stats['latency']['median'], stats['latency']['min'], 
+            stats['latency']['max']))
+    
+    # returned elements (station, availability)
+    if 'count' in stats:
+        LOG.info("elements med/min/max: %.1f %d %d" % (
+            stats['count']['median'], stats['count']['min'], 
+            stats['count']['max']))
+
+
+def get_outfile_name():
+    
+    if FLAGS.of:
+        outfile = FLAGS.of
+    else:
+        # result files of experiment modes are named apart from the history,
+        # mode after the time stamp, so that files still sort by time
+        if FLAGS.mode in utils.HISTORY_MODES:
+            mode_suffix = ''
+        else:
+            mode_suffix = "_{}".format(FLAGS.mode)
+        
+        outfile = "{}_{}{}{}".format(
+            OUTFILE_BASE, 
+            datetime.datetime.utcnow().strftime(
+                DATETIME_TIMESTAMP_FORMAT_FOR_FILENAME_SECOND), 
+            mode_suffix, serialization.CODEC_EXTENSIONS[get_codec()])
+    
+    return outfile
+
+
+def finish_result(result):
+    """
+    Compute statistics and write result file. With --memory, memory use of
+    the statistics and output phases is recorded, and a memory summary is 
+    added to the run info of the result. The output phase ends after the
+    file is written, so it is only logged.
+    
+    """
+    
+    phases = dict()
+    
+    with memory.record(get_phase_memory_record(phases, 'stats')), \
+        profiling.phase('statistics'):
+        
+        compute_stats(result)
+        attach_dns_report(result)
+    
+    if FLAGS.memory:
+        result.info.setdefault(utils.RUN_INFO_KEY, dict())['memory'] = \
+            summarize_memory(result, phases)
+    
+    with memory.record(get_phase_memory_record(phases, 'output')), \
+        profiling.phase('serialization'):
+        
+        write_result(result.to_result(), get_outfile_name())
+    
+    if FLAGS.memory:
+        LOG.info("memory: output phase %s" % (phases['output']))
+
+
+def attach_dns_report(result):
+    """
+    Store summary of the host name lookups of all requests of a node (see 
+    resolver.summarize) in node/dns, and log it.
+    
+    """
+    
+    records = dict()
+    
+    for cell_id, (node, _, _, _, _) in result.iter_cells():
+        
+        records.setdefault(node, []).extend(
+            attempt['dns'] for attempt in result.get_attempts(cell_id) \
+                if 'dns' in attempt)
+    
+    LOG.info("===== host name resolution =====")
+    
+    for node, node_records in sorted(records.items()):
+        
+        summary = resolver.summarize(node_records)
+        result.info[node]['dns'] = summary
+        
+        if not summary['requests']:
+            continue
+        
+        LOG.info("%s: %d lookups (%d cached, %d failed), resolution time "\
+            "per request med/p90/max (sec): %.4f %.4f %.4f" % (
+                node, summary['lookups'], summary['cached'], 
+                summary['failed'], summary['median'], summary['p90'], 
+                summary['max']))
+
+
+def get_phase_memory_record(phases, phase):
+    
+    if FLAGS.memory:
+        return phases.setdefault(phase, dict())
+    else:
+        return None
+
+
+def summarize_memory(result, phases):
+    """
+    Return memory summary: requests per response size and protocol, phases,
+    and peak RSS of the process.
+    
+    """
+    
+    records = dict()
+    
+    for cell_id, (_, size, protocol, _, _) in result.iter_cells():
+        
+        for attempt in result.get_attempts(cell_id):
+            if 'memory' in attempt:
+                records.setdefault(size, dict()).setdefault(
+                    protocol, []).append(attempt['memory'])
+    
+    summary = dict(
+        method=memory.get_method(), peak_rss=memory.get_peak_rss_bytes(), 
+        phases=dict(phases), requests=dict())
+    
+    for size, size_records in records.items():
+        for protocol, protocol_records in size_records.items():
+            
+            summary['requests'].setdefault(size, dict())[protocol] = \
+                memory.summarize(protocol_records)
+            
+            LOG.info("memory: {} {}: {}".format(
+                size, protocol, summary['requests'][size][protocol]))
+    
+    return summary
+
+
+def write_result(result, outfile):
+    """Write results to compact (compressed) JSON file."""
+    
+    serialization.write_result(
+        result, utils.get_outpath(outfile, FLAGS.od), get_codec(), 
+        FLAGS.level, FLAGS.split)
+
+
+def get_codec():
+    
+    if FLAGS.codec:
+        return FLAGS.codec
+    elif FLAGS.of:
+        return serialization.get_codec_from_filename(FLAGS.of)
+    else:
+        return serialization.DEFAULT_CODEC
+
+
+def export_prometheus(result):
+    """Update Prometheus textfile, if requested."""
+    
+    if not FLAGS.promfile:
+        return
+    
+    try:
+        with profiling.phase('serialization'):
+            prometheus.write_textfile(
+                utils.get_outpath(FLAGS.promfile), result.to_result())
+    
+    except (IOError, OSError), e:
+        error_msg = "cannot write Prometheus textfile: %s" % e
+        LOG.error(error_msg)
+
+
+def init_result_dict():
+    """
+    Return empty sample table (see sampletable) with the selected nodes and
+    the run info (run mode, HTTP connection reuse). Cells are added when 
+    they are measured.
+    
+    """
+    
+    result = sampletable.SampleTable()
+    
+    for node, _ in node_generator():
+        result.add_node(node)
+    
+    result.info[utils.RUN_INFO_KEY] = {
+        utils.RUN_MODE_KEY: FLAGS.mode, 
+        utils.RUN_CONNECTIONS_KEY: get_connection_reuse()}
+    
+    return result
+
+
+def get_connection_reuse():
+    """Return HTTP connection reuse of run (see utils.CONNECTION_REUSE)."""
+    
+    # the daemon keeps HTTP connections open (see init_connections)
+    if FLAGS.mode == 'daemon':
+        return 'reused'
+    elif FLAGS.tlsresume:
+        return 'resumed'
+    else:
+        return 'new'
+
+
+def convert_payload_to_arclink(payload, testsncls):
+    
+    pl = {}
+    
+    for key, value in payload.items():
+        
+        # if sncl contains comma-separated list, use only first entry
+        if key in SNCL_KEYS:
+            
+            if ',' in testsncls[key]:
+                s = testsncls[key].split(',')[0]
+            else:
+                s = testsncls[key]
+                
+            pl[key] = s.replace('?', '*')
+            
+        else:
+            pl[key] = value
+                                
+    if pl['location'] == '--':
+        pl['location'] = ''
+        
+    return pl
+    
+
+def convert_payload_to_postdata(payload):
+    
+    pl = ''
+    
+    # additional query parameters (e.g., level) precede the SNCL lines
+    for key in sorted(payload):
+        if key not in SNCL_KEYS and key not in ('starttime', 'endtime'):
+            pl += "{}={}\n".format(key, payload[key])
+    
+    sncl_arrays = {}
+    for key in SNCL_KEYS:
+    
+        if ',' in payload[key]:
+            sncl_arrays[key] = [x.strip() for x in payload[key].split(',')]
+        else:
+            sncl_arrays[key] = [payload[key],]
+    
+    starttime_str = UTCDateTime(payload['starttime']).datetime.isoformat()
+    endtime_str = UTCDateTime(payload['endtime']).datetime.isoformat()
+    
+    for net in sncl_arrays['network']:
+        for sta in sncl_arrays['station']:
+            for loc in sncl_arrays['location']:
+                for cha in sncl_arrays['channel']:
+                    
+                    pl += "{} {} {} {} {} {}\n".format(
+                        net, sta, loc, cha, starttime_str, endtime_str)
+
+        
+    return pl
+
+
+def fire_arclink_request(
+    node_par, arclink_payload, connections=None, request_deadlines=None):
+    """
+    Fetch waveforms with ArcLink client. Return tuple (measurement, attempt),
+    measurement is tuple (length_bytes, t_req), or None if request failed,
+    attempt is the record of the request (see make_attempt). If connections
+    are given, clients are reused.
+    If request_deadlines are given, the read deadline is the client's socket
+    timeout, and the request is interrupted after the total deadline.
+    
+    """
+    
+    if request_deadlines is None:
+        request_deadlines = dict()
+    
+    client_kwargs = dict()
+    if 'read' in request_deadlines:
+        client_kwargs['timeout'] = request_deadlines['read']
+    
+    arclink_server, arclink_port = get_arclink_connection(node_par)
+    
+    LOG.info("querying ARCLINK: %s" % (arclink_server))
+    LOG.info(arclink_payload)
+        
+    # start timer
+    t_start = time.time()
+    
+    # RSS sampled per block written, for the memory peak of the request
+    bf = memory.SamplingBytesIO()
+    
+    try:
+        if connections is None:
+            client = ArclinkClient(
+                host=arclink_server,port=arclink_port, user=FLAGS.email, 
+                **client_kwargs)
+        
+        else:
+            client = connections['arclink'].get((arclink_server, arclink_port))
+            
+            if client is None:
+                client = ArclinkClient(
+                    host=arclink_server,port=arclink_port, user=FLAGS.email, 
+                    **client_kwargs)
+                connections['arclink'][(arclink_server, arclink_port)] = \
+                    client
+        
+        with deadlines.alarm(request_deadlines.get('total')):
+            
+            client.save_waveforms(
+                bf,
+                arclink_payload['network'], 
+                arclink_payload['station'], 
+                arclink_payload['location'], 
+                arclink_payload['channel'], 
+                UTCDateTime(arclink_payload['starttime']), 
+                UTCDateTime(arclink_payload['endtime']),
+                format='MSEED')
+                
+        length_bytes = bf.tell()
+                
+    except Exception, e:
+            
+        error_msg = "Arclink error: %s" % e
+        LOG.error(error_msg)
+        
+        if isinstance(e, deadlines.DeadlineExceeded):
+            outcome = 'deadline'
+        else:
+            outcome = 'error'
+        
+        return None, make_attempt(
+            outcome, t_start, exception=e, length_bytes=bf.tell())
+    
+    finally:
+        bf.close()
+        
+    # time it
+    t_end = time.time()
+    
+    return (length_bytes, t_end - t_start), make_attempt(
+        'ok', t_start, length_bytes=length_bytes, t_end=t_end)
+
+
+def fire_http_request(
+    method, endpoint, payload, response_format=None, connections=None, 
+    request_deadlines=None):
+    """
+    Fire HTTP GET or POST request (federator uses GET) and read the streamed
+    response. If response_format is given, returned elements are counted
+    while reading. If connections are given, their HTTP session is used 
+    (otherwise a new connection, with --tlsresume resuming the TLS session
+    of the last request to the same host).
+    If request_deadlines are given, the request fails when connecting takes
+    too long, no bytes arrive for the read deadline (stall), or the response
+    is not complete after the total deadline.
+    Return tuple (measurement, attempt), measurement is tuple (length_bytes,
+    t_req, latency, counter), or None if request failed, attempt is the 
+    record of the request (see make_attempt).
+    
+    """
+    
+    if request_deadlines is None:
+        timeout = None
+        total = None
+    else:
+        timeout = (request_deadlines['connect'], request_deadlines['read'])
+        total = request_deadlines['total']
+    
+    # no cached version
+    #headers = {
+        #'cache-control': 'private, max-age=0, 
+        #no-cache'}
+        
+    headers = {'cache-control': 'max-age=0,no-cache'}
+    
+    counter = streaming.get_response_counter(response_format)
+    
+    if connections is not None:
+        http = connections['http']
+    elif FLAGS.tlsresume:
+        http = COMMANDLINE_PAR['tls_requests']
+    else:
+        http = requests
+    
+    if method in ('get', 'federator'):
+            
+        # start timer
+        t_start = time.time()
+            
+        # fire GET request
+        try:
+            response = http.get(
+                endpoint, params=payload, headers=headers, stream=True, 
+                timeout=timeout)
+                
+        except requests.exceptions.RequestException, e:
+                
+            error_msg = "error: no connection: %s" % e
+            LOG.error(error_msg)
+            return None, make_connection_failure(t_start, e)
+            
+        LOG.info("url: {}".format(response.url))
+            
+    elif method == 'post':
+            
+        # POST params
+        if isinstance(payload, basestring):
+            postdata = payload
+        else:
+            postdata = convert_payload_to_postdata(payload)
+            
+        LOG.info(postdata)
+            
+        # start timer
+        t_start = time.time()
+            
+        # fire POST request
+        try:
+            response = http.post(
+                endpoint, data=postdata, headers=headers, stream=True, 
+                timeout=timeout)
+                
+        except requests.exceptions.RequestException, e:
+                
+            error_msg = "error: no connection: %s" % e
+            LOG.error(error_msg)
+            return None, make_connection_failure(t_start, e)
+        
+    else:
+        LOG.info("method {} not supported".format(method))
+        return None, make_attempt('error', time.time())
+        
+    if not response.ok:
+        error_msg = "service failed with code %s" % (response.status_code)
+        LOG.error(error_msg)
+        response.close()
+        return None, make_attempt(
+            'status', t_start, status=response.status_code)
+    
+    if FLAGS.series > 0:
+        series = streaming.TransferSeries(FLAGS.series, t_start)
+    else:
+        series = None
+    
+    if FLAGS.tcpinfo:
+        tcp_sampler = tcpinfo.TcpInfoSampler(
+            tcpinfo.get_response_socket(response), t_start=t_start)
+    else:
+        tcp_sampler = None
+    
+    failure = None
+
+    try:
+        try:
+            length_bytes = streaming.consume_response(
+                response, counter, deadlines.get_deadline(total, t_start),
+                series, tcp_sampler)
+
+        except (
+            requests.exceptions.RequestException,
+            deadlines.DeadlineExceeded), e:
+            failure = e
+
+        # time it
+        t_end = time.time()
+
+        # TCP_INFO at the end of the transfer, outside the timed interval
+        # but before the connection is released
+        if tcp_sampler is not None:
+            tcp_sampler.finish()
+
+    finally:
+        response.close()
+
+    if failure is not None:
+
+        error_msg = "error: incomplete response: %s" % failure
+        LOG.error(error_msg)
+
+        if isinstance(failure, deadlines.DeadlineExceeded):
+            outcome = 'deadline'
+        else:
+            outcome = 'incomplete'
+
+        return None, make_attempt(
+            outcome, t_start, status=response.status_code, exception=failure,
+            length_bytes=getattr(failure, 'bytes_received', 0), t_end=t_end,
+            series=series, tcp_sampler=tcp_sampler)
+
+    return (
+        length_bytes, t_end - t_start, response.elapsed.total_seconds(), 
+        counter), make_attempt(
+            'ok', t_start, status=response.status_code, 
+            length_bytes=length_bytes, t_end=t_end, series=series, 
+            tcp_sampler=tcp_sampler)
+
+
+def make_connection_failure(t_start, e):
+    
+    if isinstance(e, requests.exceptions.Timeout):
+        outcome = 'timeout'
+    else:
+        outcome = 'connection'
+    
+    return make_attempt(outcome, t_start, exception=e)
+
+
+def make_attempt(
+    outcome, t_start, status=None, exception=None, length_bytes=0, 
+    t_end=None, series=None, tcp_sampler=None):
+    """
+    Return record of request attempt: outcome (see 
+    merging.ATTEMPT_OUTCOMES), start time (epoch seconds), HTTP status, 
+    exception class, bytes received (before failure), and elapsed time.
+    With transfer time series (streaming.TransferSeries), the series and its 
+    metrics (transfer), with TCP_INFO sampler (tcpinfo.TcpInfoSampler), the
+    TCP_INFO at the end of the transfer and its series (tcp_info).
+    
+    """
+    
+    if t_end is None:
+        t_end = time.time()
+    
+    if exception is not None:
+        exception = exception.__class__.__name__
+    
+    attempt = dict(
+        outcome=outcome, start=t_start, status=status, exception=exception, 
+        bytes=length_bytes, elapsed=t_end - t_start)
+    
+    if series is not None:
+        attempt['series'] = series.to_dict()
+        
+        transfer = streaming.get_transfer_metrics(
+            series.bins, series.interval)
+        
+        if transfer is not None:
+            attempt['transfer'] = transfer
+    
+    if tcp_sampler is not None and tcp_sampler.to_dict() is not None:
+        attempt['tcp_info'] = tcp_sampler.to_dict()
+    
+    return attempt
+
+
+def get_node_par(node):
+    
+    node_par = None
+    
+    if node in settings.EIDA_NODES:
+        node_par = settings.EIDA_NODES[node] 
+    elif node in settings.OTHER_SERVERS:
+        node_par = settings.OTHER_SERVERS[node]
+    
+    return node_par
+
+
+def node_generator():
+    
+    global COMMANDLINE_PAR
+    
+    # shuffle order
+    nodes = list(COMMANDLINE_PAR['the_node_list'])
+    random.shuffle(nodes)
+    
+    for node in nodes:
+    
+        node_par = get_node_par(node)
+        
+        if node not in COMMANDLINE_PAR['the_excludenode_list']:
+            yield node, node_par
+
+
+def store_attempt(
+    result, node, attempt, time_int_category, protocol, service, method=''):
+    
+    cell_id = result.get_cell_id(
+        node, time_int_category, protocol, service, method)
+    
+    result.add_attempt(cell_id, attempt)
+
+
+def store_result(
+    result, node, length_bytes, t_req, payload, time_int_category, protocol, 
+    service, method='', latency=None, count=None):
                         
     mbits_per_sec = 8 * length_bytes / (t_req * 1000 * 1000)
     LOG.info("%.3f MiB in %.2f seconds, %.2f Mbits/s" % (
         length_bytes / (1000.0 * 1000.0), t_req, mbits_per_sec))
-                        
-    result[time_int_category][protocol][service]['params'] = payload
-    result[time_int_category][protocol][service]['length'] = length_bytes
-                        
-    # write to result list
-    if protocol == 'http':
-        write_to = result[time_int_category][protocol][service][method]['data']
-    else:
-        write_to = result[time_int_category][protocol][service]['data']
-
-    write_to['length'].append(length_bytes)
-    write_to['time'].append(t_req)
-    write_to['throughput'].append(mbits_per_sec)
     
-    if latency is not None:
-        write_to['latency'].append(latency)
+    cell_id = result.get_cell_id(
+        node, time_int_category, protocol, service, method)
+    
+    result.set_service_info(cell_id, payload, length_bytes)
+    result.add_sample(
+        cell_id, length_bytes, t_req, mbits_per_sec, latency=latency, 
+        count=count)
 
 
 def set_commandline_parameters():
@@ -707,9 +2703,101 @@ def set_commandline_parameters():
             if x not in TEST_TIME_INTERVALS:
                 raise ValueError, "response size {} unknown".format(x)
                 
+    elif FLAGS.mode == 'rcvbuf':
+        COMMANDLINE_PAR['the_responsesize_list'] = [
+            sockbuf.BUFFER_EXPERIMENT_SIZE]
+    
+    elif FLAGS.mode == 'openloop':
+        COMMANDLINE_PAR['the_responsesize_list'] = [OPENLOOP_SIZE]
+    
+    elif FLAGS.mode == 'splitwindow':
+        COMMANDLINE_PAR['the_responsesize_list'] = list(SPLIT_SIZES)
+        
     else:
         COMMANDLINE_PAR['the_responsesize_list'] = TEST_TIME_INTERVALS.keys()
     
+    COMMANDLINE_PAR['the_httpservices_list'] = []
+    for x in [y.strip() for y in FLAGS.httpservices.split(',')]:
+        if x not in HTTP_SERVICE_GROUPS:
+            raise ValueError, "fdsnws service {} unknown".format(x)
+        
+        COMMANDLINE_PAR['the_httpservices_list'].extend(
+            HTTP_SERVICE_GROUPS[x])
+    
+    if FLAGS.mode not in RUN_MODES:
+        raise ValueError, "mode {} unknown".format(FLAGS.mode)
+    
+    if FLAGS.preflight not in PREFLIGHT_MODES:
+        raise ValueError, "pre-flight mode {} unknown".format(FLAGS.preflight)
+    
+    # system default always measured, as reference
+    COMMANDLINE_PAR['the_rcvbuf_list'] = [0]
+    
+    for x in [y.strip() for y in FLAGS.rcvbuf.split(',') if y.strip()]:
+        
+        if not x.isdigit():
+            raise ValueError, "receive buffer size {} invalid".format(x)
+        
+        if int(x) not in COMMANDLINE_PAR['the_rcvbuf_list']:
+            COMMANDLINE_PAR['the_rcvbuf_list'].append(int(x))
+    
+    COMMANDLINE_PAR['the_rcvbuf_list'].sort()
+    
+    if FLAGS.mode == 'tls' and not tlssession.HAS_SESSION:
+        raise ValueError, "mode tls needs pyOpenSSL"
+    
+    if FLAGS.tlsresume:
+        
+        if not tlssession.HAS_SESSION:
+            raise ValueError, "TLS session resumption needs pyOpenSSL"
+        
+        # one context: sessions can only be resumed by the context that 
+        # created them
+        COMMANDLINE_PAR['tls_context'] = tlssession.ResumingContext()
+        COMMANDLINE_PAR['tls_requests'] = tlssession.ResumingRequests(
+            COMMANDLINE_PAR['tls_context'])
+    
+    COMMANDLINE_PAR['the_accesslog_list'] = [
+        x.strip() for x in FLAGS.accesslog.split(',') if x.strip()]
+    
+    if FLAGS.mode == 'replay' and not COMMANDLINE_PAR['the_accesslog_list']:
+        raise ValueError, "mode replay needs --accesslog"
+    
+    try:
+        COMMANDLINE_PAR['the_rate_list'] = sorted(
+            float(x) for x in FLAGS.rates.split(',') if x.strip())
+    except ValueError:
+        raise ValueError, "request rates {} invalid".format(FLAGS.rates)
+    
+    if not all(x > 0 for x in COMMANDLINE_PAR['the_rate_list']):
+        raise ValueError, "request rates must be positive"
+    
+    # single request always fetched, as reference
+    COMMANDLINE_PAR['the_split_list'] = [1]
+    
+    for x in [y.strip() for y in FLAGS.splits.split(',') if y.strip()]:
+        
+        if not x.isdigit() or int(x) < 1:
+            raise ValueError, "number of sub-windows {} invalid".format(x)
+        
+        if int(x) not in COMMANDLINE_PAR['the_split_list']:
+            COMMANDLINE_PAR['the_split_list'].append(int(x))
+    
+    COMMANDLINE_PAR['the_split_list'].sort()
+    
+    if FLAGS.arrivals not in openloop.ARRIVAL_PROCESSES:
+        raise ValueError, "arrival process {} unknown".format(FLAGS.arrivals)
+    
+    if FLAGS.windows not in WINDOW_MODES:
+        raise ValueError, "window mode {} unknown".format(FLAGS.windows)
+    
+    COMMANDLINE_PAR['window_generator'] = windows.WindowGenerator(
+        UTCDateTime(FLAGS.archivestart).datetime, 
+        UTCDateTime(FLAGS.archiveend).datetime)
+    
+    # fail before the measurements, not when writing the result
+    serialization.check_codec(get_codec(), FLAGS.level)
+    
     if FLAGS.services:
         COMMANDLINE_PAR['the_services_list'] = [
             x.strip() for x in FLAGS.services.split(',')]
@@ -0,0 +1,592 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Creates a static HTML dashboard (offline, no external resources) from JSON
+result files: an index page with the all-nodes comparison of the latest run
+and the performance of all nodes over time (one figure per month), and one 
+page per node.
+
+Every figure carries a content hash of the slice of result data it is drawn
+from. A manifest in the output directory records the hashes, and only
+figures whose input data changed are rendered again. Extracted medians of
+result files are cached, so that a daily update only reads new files.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+from __future__ import unicode_literals
+
+import cgi
+import datetime
+import glob
+import hashlib
+import importlib
+import io
+import json
+import os
+import sys
+
+from gflags import DEFINE_boolean
+from gflags import DEFINE_integer
+from gflags import DEFINE_string
+from gflags import FLAGS
+
+import numpy
+
+# avoid matplotlib X11 display problem when running headless
+import matplotlib
+matplotlib.use('Agg')
+
+from matplotlib import rcParams
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eidanodetest import downsampling
+from eidanodetest import utils
+
+
+MANIFEST_FILE = 'dashboard_manifest.json'
+CACHE_FILE = 'dashboard_cache.json'
+
+# plot key (protocol/service/method), label, color
+PLOT_SERIES = (
+    ('http/dataselect/get', 'dataselect-get', 'k'),
+    ('http/dataselect/post', 'dataselect-post', 'r'),
+    ('http/dataselect/federator', 'dataselect-federator', 'b'),
+    ('arclink/waveform/arclink', 'arclink', 'm'))
+
+SIZE_KEYS = ('small', 'medium', 'large', 'verylarge', 'huge')
+
+SIZE_KEY = 'large'
+
+PLOT_ABSCISSA_SIZE = 'Response size in Bytes'
+PLOT_ABSCISSA_TIME = 'Days since {}'
+PLOT_ORDINATE = 'Network throughput (Mbits / s)'
+
+PLOTSIZE = (8, 4)
+FIG_RESOLUTION_DPI = 100
+TITLE_FONTSIZE = 10
+LEGEND_FONTSIZE = 6
+
+MAX_POINTS = 1000
+
+FIGURE_EXTENSION = 'png'
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8"/>
+<title>{title}</title>
+</head>
+<body>
+<h1>{title}</h1>
+<p>{nav}</p>
+{body}
+<p><small>created {created}</small></p>
+</body>
+</html>
+"""
+
+FIGURE_TEMPLATE = """<h2>{caption}</h2>
+<p><img alt="{caption}" src="{src}?v={digest}" data-hash="{digest}"/></p>
+"""
+
+
+importlib.import_module('matplotlib.pyplot')
+PYPLOT = sys.modules['matplotlib.pyplot']
+
+
+DEFINE_string('id', '', 'Input directory')
+DEFINE_string('od', '', 'Output directory (dashboard site)')
+DEFINE_string(
+    'requestsize', SIZE_KEY,
+    'Request size for over time plots (small, medium, large, verylarge, '\
+    'huge)')
+DEFINE_integer('daysbefore', 0, 'Days before last result file (0: all)')
+DEFINE_string(
+    'connections', 'new',
+    'History of runs with a new HTTP connection per request (new: suite '\
+    'mode; resumed: with --tlsresume) or with reused connections (reused: '\
+    'daemon mode)')
+
+DEFINE_boolean('force', False, 'Render all figures')
+
+
+def main():
+
+    _ = FLAGS(sys.argv)
+
+    if not FLAGS.id:
+        error_msg = "you need to specify an input directory name with the "\
+            "--id option"
+        raise RuntimeError, error_msg
+
+    # iterates through files with ascending time stamps
+    # (earliest first)
+    source_file_iterator = sorted(
+        glob.iglob(
+            os.path.join(FLAGS.id, utils.FILENAME_DATETIME_PATTERN_GLOB)))
+
+    if not source_file_iterator:
+        error_msg = "no result files in {}".format(FLAGS.id)
+        raise RuntimeError, error_msg
+
+    manifest = load_json_if_exists(
+        utils.get_outpath(MANIFEST_FILE, FLAGS.od), dict())
+
+    cache = load_json_if_exists(
+        utils.get_outpath(CACHE_FILE, FLAGS.od), dict())
+
+    if cache.get('requestsize') != FLAGS.requestsize:
+        cache = dict(requestsize=FLAGS.requestsize, files=dict())
+
+    history, latest_path = load_history(source_file_iterator, cache)
+
+    if latest_path is None:
+        error_msg = "no result files of runs with {} connections in {}"\
+            .format(FLAGS.connections, FLAGS.id)
+        raise RuntimeError, error_msg
+
+    # without run info
+    latest = dict(utils.iter_node_results(utils.load_json(latest_path)))
+    latest_timestamp = utils.get_timestamp_from_filename(latest_path)
+
+    nodes = sorted(set(latest) | set(
+        node for _, points in history for node in points))
+
+    # figure name -> (data slice, render function, title, caption). The 
+    # title is drawn into the figure, the caption is only on the page, so
+    # that the time stamp of the latest run does not change the digests
+    figures = dict()
+
+    latest_slices = dict(
+        (node, get_latest_slice(latest.get(node, {}))) for node in nodes)
+
+    figures['allnodes_latest'] = (
+        latest_slices, render_allnodes_latest, "all nodes, dataselect GET",
+        "all nodes, dataselect GET, run of {}".format(latest_timestamp))
+
+    for node in nodes:
+        figures["node_{}_latest".format(node)] = (
+            dict(node=node, data=latest_slices[node]), render_node_latest,
+            "{} ({})".format(utils.get_node_name(node), node.upper()),
+            "{} ({}), run of {}".format(
+                utils.get_node_name(node), node.upper(), latest_timestamp))
+
+    # the history over time is split into periods (months), so that closed
+    # periods keep their digests and are rendered once
+    periods = get_periods(history)
+
+    for period in periods:
+
+        if period == periods[-1]:
+            period_caption = "{} (current, until {})".format(
+                period, latest_timestamp)
+        else:
+            period_caption = period
+
+        overtime_slices = dict(
+            (node, get_overtime_slice(history, node, period)) \
+                for node in nodes)
+
+        title = "all nodes over time, dataselect GET, {} requests, {}"\
+            .format(FLAGS.requestsize, period)
+
+        figures["allnodes_overtime_{}".format(period)] = (
+            overtime_slices, render_allnodes_overtime, title,
+            "all nodes over time, dataselect GET, {} requests, {}".format(
+                FLAGS.requestsize, period_caption))
+
+        for node in nodes:
+
+            node_title = "{} ({}) over time, {} requests".format(
+                utils.get_node_name(node), node.upper(), FLAGS.requestsize)
+
+            figures["node_{}_overtime_{}".format(node, period)] = (
+                dict(node=node, data=overtime_slices[node]),
+                render_node_overtime,
+                "{}, {}".format(node_title, period),
+                "{}, {}".format(node_title, period_caption))
+
+    rendered = 0
+    digests = dict()
+
+    for name, (data_slice, render_function, title, _) in sorted(
+        figures.items()):
+
+        digest = get_digest(dict(title=title, data=data_slice))
+        digests[name] = digest
+
+        filename = "{}.{}".format(name, FIGURE_EXTENSION)
+        outpath = utils.get_outpath(filename, FLAGS.od)
+
+        if not FLAGS.force and manifest.get(name) == digest and \
+            os.path.isfile(outpath):
+            continue
+
+        print "rendering {}".format(name)
+        render_function(outpath, data_slice, title)
+
+        manifest[name] = digest
+        rendered += 1
+
+    print "rendered {} of {} figures".format(rendered, len(figures))
+
+    write_pages(nodes, periods, figures, digests)
+
+    # remove figures of nodes and periods that disappeared
+    for name in set(manifest) - set(figures):
+
+        del manifest[name]
+
+        outpath = utils.get_outpath(
+            "{}.{}".format(name, FIGURE_EXTENSION), FLAGS.od)
+
+        if os.path.isfile(outpath):
+            os.remove(outpath)
+
+    utils.write_atomic(
+        utils.get_outpath(MANIFEST_FILE, FLAGS.od),
+        json.dumps(manifest, sort_keys=True, indent=4))
+
+    utils.write_atomic(
+        utils.get_outpath(CACHE_FILE, FLAGS.od), json.dumps(cache))
+
+
+def load_json_if_exists(path, default):
+
+    if not os.path.isfile(path):
+        return default
+
+    try:
+        with io.open(path, 'r', encoding='utf-8') as fh:
+            return json.load(fh)
+
+    except ValueError:
+        print "WARNING: {} is not valid JSON, ignored".format(path)
+        return default
+
+
+def load_history(source_paths, cache):
+    """
+    Return tuple (history, latest path). history is a list of (timestamp 
+    string, {node: {plot key: median throughput}}) for result files in the
+    requested time span that belong to the history of runs with 
+    --connections, latest path the last of these files (None if there is
+    none). Run info and medians of files are cached by file name, 
+    modification time and size.
+
+    """
+
+    last_timestamp = utils.get_timestamp_from_filename(source_paths[-1])
+
+    if FLAGS.daysbefore > 0:
+        first_timestamp = last_timestamp - datetime.timedelta(
+            days=FLAGS.daysbefore)
+    else:
+        first_timestamp = None
+
+    history = []
+    files = dict()
+    latest_path = None
+
+    for source_path in source_paths:
+
+        timestamp = utils.get_timestamp_from_filename(source_path)
+
+        if timestamp is None or (
+            first_timestamp is not None and timestamp < first_timestamp):
+            continue
+
+        filename = os.path.basename(source_path)
+        stat = os.stat(source_path)
+        file_id = [stat.st_mtime, stat.st_size]
+
+        cached = cache['files'].get(filename)
+
+        if cached is not None and cached['id'] == file_id and \
+            'run' in cached:
+            run_info = cached['run']
+            points = cached['points']
+
+        else:
+            try:
+                d = utils.load_json(source_path)
+            except Exception:
+                print "WARNING: {} is not a valid (gzipped) JSON file".format(
+                    filename)
+                continue
+
+            run_info = utils.get_run_info(d)
+            points = get_file_points(d)
+
+        files[filename] = dict(id=file_id, run=run_info, points=points)
+
+        if not utils.is_history_run(run_info, FLAGS.connections):
+            continue
+
+        history.append((str(timestamp), points))
+        latest_path = source_path
+
+    # files outside of time span are dropped from cache
+    cache['files'] = files
+
+    return history, latest_path
+
+
+def get_file_points(d):
+
+    points = dict()
+
+    for node, size, protocol, service, method, _, method_res in \
+        utils.iter_result_cells(d):
+
+        # no throughput if all requests failed
+        if size != FLAGS.requestsize or \
+            'throughput' not in method_res.get('stats', {}):
+            continue
+
+        plot_key = get_plot_key(protocol, service, method)
+        points.setdefault(node, dict())[plot_key] = \
+            method_res['stats']['throughput']['median']
+
+    return points
+
+
+def get_plot_key(protocol, service, method):
+    return "/".join((protocol, service, method or protocol))
+
+
+def get_latest_slice(node_result):
+    """{plot key: [[length, median throughput], ...]} ordered by size."""
+
+    cells = dict()
+
+    for sk in SIZE_KEYS:
+
+        if sk not in node_result.get('result', {}):
+            continue
+
+        for plot_key, _, _ in PLOT_SERIES:
+
+            protocol, service, method = plot_key.split('/')
+
+            if protocol == 'arclink':
+                method = ''
+
+            service_res, method_res = utils.get_result_cell(
+                node_result['result'][sk], protocol, service, method)
+
+            if service_res is None or 'length' not in service_res or \
+                'throughput' not in method_res.get('stats', {}):
+                continue
+
+            cells.setdefault(plot_key, []).append([
+                service_res['length'],
+                method_res['stats']['throughput']['median']])
+
+    return cells
+
+
+def get_period(timestamp):
+    """Period (month, YYYY-MM) of time stamp string."""
+    return timestamp[:7]
+
+
+def get_periods(history):
+    """Sorted periods of history, the last one is the current period."""
+    return sorted(set(get_period(timestamp) for timestamp, _ in history))
+
+
+def get_overtime_slice(history, node, period):
+    """{plot key: [[timestamp, median throughput], ...]} of period"""
+
+    series = dict()
+
+    for timestamp, points in history:
+
+        if get_period(timestamp) != period:
+            continue
+
+        for plot_key, value in points.get(node, {}).items():
+            series.setdefault(plot_key, []).append([timestamp, value])
+
+    return series
+
+
+def get_digest(data_slice):
+    return hashlib.sha1(
+        json.dumps(data_slice, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def render_node_latest(outpath, data_slice, title):
+
+    figure, the_ax = new_figure(title)
+
+    for plot_key, label, color in PLOT_SERIES:
+
+        points = data_slice['data'].get(plot_key)
+        if points:
+            the_ax.semilogx(
+                [p[0] for p in points], [p[1] for p in points], color=color,
+                marker='o', markersize=3, label=label)
+
+    finish_figure(figure, the_ax, PLOT_ABSCISSA_SIZE, outpath)
+
+
+def render_node_overtime(outpath, data_slice, title):
+
+    figure, the_ax = new_figure(title)
+    start = get_overtime_start([data_slice['data']])
+
+    for plot_key, label, color in PLOT_SERIES:
+
+        points = data_slice['data'].get(plot_key)
+        if points:
+            days, values = downsampling.minmax_decimate(
+                get_days(points, start), [p[1] for p in points], MAX_POINTS)
+            the_ax.plot(days, values, color=color, label=label)
+
+    finish_figure(
+        figure, the_ax, PLOT_ABSCISSA_TIME.format(start), outpath)
+
+
+def render_allnodes_latest(outpath, data_slice, title):
+
+    figure, the_ax = new_figure(title)
+
+    for node, node_slice in sorted(data_slice.items()):
+
+        points = node_slice.get(PLOT_SERIES[0][0])
+        if points:
+            the_ax.semilogx(
+                [p[0] for p in points], [p[1] for p in points],
+                color=utils.get_node_text_color_linestyle(node)[0],
+                linestyle=utils.get_node_text_color_linestyle(node)[1],
+                marker='o', markersize=3, label=node)
+
+    finish_figure(figure, the_ax, PLOT_ABSCISSA_SIZE, outpath)
+
+
+def render_allnodes_overtime(outpath, data_slice, title):
+
+    figure, the_ax = new_figure(title)
+    start = get_overtime_start(data_slice.values())
+
+    for node, node_slice in sorted(data_slice.items()):
+
+        points = node_slice.get(PLOT_SERIES[0][0])
+        if points:
+            days, values = downsampling.minmax_decimate(
+                get_days(points, start), [p[1] for p in points], MAX_POINTS)
+            the_ax.plot(days, values, label=node)
+
+    finish_figure(
+        figure, the_ax, PLOT_ABSCISSA_TIME.format(start), outpath)
+
+
+def get_overtime_start(slices):
+    """Midnight of first day in series."""
+
+    first = min([
+        points[0][0] for series in slices for points in series.values() \
+            if points] or [None])
+
+    if first is None:
+        return datetime.datetime.utcnow().replace(
+            hour=0, minute=0, second=0, microsecond=0)
+
+    first = datetime.datetime.strptime(first, '%Y-%m-%d %H:%M:%S')
+    return first.replace(hour=0, minute=0, second=0)
+
+
+def get_days(points, start):
+
+    return [
+        (datetime.datetime.strptime(p[0], '%Y-%m-%d %H:%M:%S') - start
+            ).total_seconds() / (60 * 60 * 24) for p in points]
+
+
+def new_figure(title):
+
+    rcParams['figure.figsize'] = PLOTSIZE
+
+    figure = PYPLOT.figure()
+    figure.clf()
+
+    the_ax = figure.add_subplot(1, 1, 1)
+    the_ax.set_title(title, fontdict={'size': TITLE_FONTSIZE})
+
+    return figure, the_ax
+
+
+def finish_figure(figure, the_ax, abscissa, outpath):
+
+    ymin, ymax = the_ax.get_ylim()
+    the_ax.set_ylim(0, ymax)
+
+    if the_ax.get_legend_handles_labels()[0]:
+        the_ax.legend(fontsize=LEGEND_FONTSIZE)
+
+    the_ax.set_xlabel(abscissa)
+    the_ax.set_ylabel(PLOT_ORDINATE)
+
+    figure.tight_layout()
+
+    PYPLOT.savefig(
+        outpath, format=FIGURE_EXTENSION, dpi=FIG_RESOLUTION_DPI)
+    PYPLOT.close(figure)
+
+
+def write_pages(nodes, periods, figures, digests):
+
+    created = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')
+
+    node_links = " | ".join(
+        '<a href="node_{0}.html">{0}</a>'.format(cgi.escape(node)) \
+            for node in nodes)
+
+    nav = '<a href="index.html">all nodes</a> | {}'.format(node_links)
+
+    # latest period first
+    body = "".join(
+        get_figure_html(name, figures, digests) \
+            for name in ['allnodes_latest'] + [
+                "allnodes_overtime_{}".format(period) \
+                    for period in reversed(periods)])
+
+    write_page('index.html', "EIDA node performance", nav, body, created)
+
+    for node in nodes:
+
+        body = "".join(
+            get_figure_html(name, figures, digests) \
+                for name in ["node_{}_latest".format(node)] + [
+                    "node_{}_overtime_{}".format(node, period) \
+                        for period in reversed(periods)])
+
+        write_page(
+            "node_{}.html".format(node),
+            "{} ({})".format(utils.get_node_name(node), node.upper()), nav,
+            body, created)
+
+
+def get_figure_html(name, figures, digests):
+
+    return FIGURE_TEMPLATE.format(
+        caption=cgi.escape(figures[name][3], quote=True),
+        src="{}.{}".format(name, FIGURE_EXTENSION), digest=digests[name])
+
+
+def write_page(filename, title, nav, body, created):
+
+    utils.write_atomic(
+        utils.get_outpath(filename, FLAGS.od),
+        PAGE_TEMPLATE.format(
+            title=cgi.escape(title), nav=nav, body=body,
+            created=created).encode('utf-8'))
+
+
+if __name__ == '__main__':
+    main()
@@ -35,6 +35,8 @@ import matplotlib.patches as mpatches
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from eidanodetest import downsampling
+from eidanodetest import profiling
 from eidanodetest import utils
 
 
@@ -125,6 +127,19 @@ COMBINED_SYMBOLS = ('o', '^', 'v', '<')
 MARKERSIZE_THROUGHPUT = 3
 MARKERSIZE_LATENCY = 2
 
+# time bins for --aggregate
+AGGREGATION_BIN_DAYS = {
+    'hourly': 1.0 / 24,
+    'daily': 1.0,
+    'weekly': 7.0
+}
+
+# p10-p90 band
+BAND_ALPHA = 0.25
+
+# raw lines are decimated to this number of points
+MAX_POINTS = 1000
+
 LEGEND_ANCHOR_THROUGHPUT = (0.0, -2.0)
 LEGEND_ANCHOR_LATENCY = (1.0, -2.0)
 
@@ -133,6 +148,8 @@ BIG_TITLE = "dataselect and arclink throughput/latency (~10 MiB response)"
 PLOT_ABSCISSA = 'Days since {}'
 PLOT_ORDINATE = 'Network throughput (Mbits / s)'
 PLOT_ORDINATE_LATENCY = 'Latency (s)'
+PLOT_ORDINATE_EFFECTIVE = 'Effective throughput (Mbits / s)'
+PLOT_ORDINATE_SUCCESS = 'Success ratio'
 
 PLOT_MODELS_COLOR = '0.75'
 PLOT_REFERENCE_COLOR = '0.0'
@@ -153,24 +170,102 @@ PLOTS = {
     'dataselect-get': {
         'title': 'dataselect (GET) throughput',
         'filename': 'dataselect_get_throughput',
-        'latency_color': 'g'
+        'latency_color': 'g',
+        'group': 'waveform',
+        'protocol': 'http',
+        'service': 'dataselect',
+        'method': 'get'
     },
     'dataselect-post': {
         'title': 'dataselect (POST) throughput',
         'filename': 'dataselect_post_throughput',
-        'latency_color': 'c'
+        'latency_color': 'c',
+        'group': 'waveform',
+        'protocol': 'http',
+        'service': 'dataselect',
+        'method': 'post'
     },
     'dataselect-federator': {
         'title': 'federator dataselect throughput',
         'filename': 'federator_dataselect_throughput',
-        'latency_color': 'y'
+        'latency_color': 'y',
+        'group': 'waveform',
+        'protocol': 'http',
+        'service': 'dataselect',
+        'method': 'federator'
     },
     'arclink': {
         'title': 'ArcLink throughput',
-        'filename': 'arclink_throughput'
+        'filename': 'arclink_throughput',
+        'group': 'waveform',
+        'protocol': 'arclink',
+        'service': 'waveform',
+        'method': ''
+    },
+    'station-network': {
+        'title': 'station (GET, level=network) throughput',
+        'filename': 'station_network_throughput',
+        'latency_color': 'g',
+        'group': 'station',
+        'protocol': 'http',
+        'service': 'station-network',
+        'method': 'get'
+    },
+    'station-station': {
+        'title': 'station (GET, level=station) throughput',
+        'filename': 'station_station_throughput',
+        'latency_color': 'c',
+        'group': 'station',
+        'protocol': 'http',
+        'service': 'station-station',
+        'method': 'get'
+    },
+    'station-channel': {
+        'title': 'station (GET, level=channel) throughput',
+        'filename': 'station_channel_throughput',
+        'latency_color': 'y',
+        'group': 'station',
+        'protocol': 'http',
+        'service': 'station-channel',
+        'method': 'get'
+    },
+    'station-response': {
+        'title': 'station (GET, level=response) throughput',
+        'filename': 'station_response_throughput',
+        'latency_color': '0.5',
+        'group': 'station',
+        'protocol': 'http',
+        'service': 'station-response',
+        'method': 'get'
+    },
+    'availability-get': {
+        'title': 'availability (GET) throughput',
+        'filename': 'availability_get_throughput',
+        'latency_color': 'g',
+        'group': 'availability',
+        'protocol': 'http',
+        'service': 'availability',
+        'method': 'get'
+    },
+    'availability-post': {
+        'title': 'availability (POST) throughput',
+        'filename': 'availability_post_throughput',
+        'latency_color': 'c',
+        'group': 'availability',
+        'protocol': 'http',
+        'service': 'availability',
+        'method': 'post'
     }
 }
 
+PLOT_GROUP_TITLES = {
+    'waveform': BIG_TITLE,
+    'station': "station throughput/latency",
+    'availability': "availability throughput/latency"
+}
+
+PLOT_GROUP = 'waveform'
+
 
 importlib.import_module('matplotlib.pyplot')
 PYPLOT = sys.modules['matplotlib.pyplot']
@@ -187,12 +282,37 @@ DEFINE_string('enddate', '',  'End date')
 DEFINE_string('id', '', 'Input directory')
 DEFINE_string('od', '', 'Output directory')
 DEFINE_string('of', '', 'Output file')
+DEFINE_string(
+    'plotgroup', PLOT_GROUP, 
+    'Plotted services (waveform, station, availability)')
 DEFINE_string(
     'requestsize', SIZE_KEY, 
     'Request size (small, medium, large, verylarge, huge)')
 DEFINE_string('startdate', '', 'Start date')
+DEFINE_string(
+    'connections', 'new', 
+    'History of runs with a new HTTP connection per request (new: suite '\
+    'mode; resumed: with --tlsresume) or with reused connections (reused: '\
+    'daemon mode)')
 
 DEFINE_boolean('markers', False, 'Line with markers')
+DEFINE_boolean(
+    'effective', False, 
+    'Plot effective throughput (failed requests counted in) and success '\
+    'ratio instead of median throughput and latency')
+
+DEFINE_string(
+    'aggregate', 'none', 
+    'Aggregate into time bins with p10-p90 band (none, hourly, daily, weekly)')
+DEFINE_integer(
+    'maxpoints', MAX_POINTS, 
+    'Maximum points of raw (not aggregated) lines, 0 for all points')
+
+DEFINE_string('profile', '', 'Write cProfile statistics (pstats) to file')
+DEFINE_boolean(
+    'phases', False, 
+    'Print wall clock and CPU time of loading and rendering phases '\
+    '(implied by --profile)')
 
 
 def main():
@@ -203,6 +323,30 @@ def main():
         error_msg = "you need to specify an input directory name with the "\
             "--id option"
         raise RuntimeError, error_msg
+    
+    if FLAGS.aggregate != 'none' and \
+        FLAGS.aggregate not in AGGREGATION_BIN_DAYS:
+        error_msg = "unknown aggregation {}".format(FLAGS.aggregate)
+        raise RuntimeError, error_msg
+    
+    if FLAGS.plotgroup not in PLOT_GROUP_TITLES:
+        error_msg = "unknown plot group {}".format(FLAGS.plotgroup)
+        raise RuntimeError, error_msg
+    
+    try:
+        with profiling.profile(FLAGS.profile):
+            make_plot()
+    
+    finally:
+        if FLAGS.profile or FLAGS.phases:
+            print "\n".join(profiling.TIMER.format_summary())
+
+
+def make_plot():
+    
+    plot_types = [
+        plot_type for plot_type in sorted(PLOTS) \
+            if PLOTS[plot_type]['group'] == FLAGS.plotgroup]
 
     # iterates through files with ascending time stamps
     # (earliest first)
@@ -263,7 +407,7 @@ def main():
     for node in NODES:
         data[node] = dict()
             
-        for plot_type in PLOTS:
+        for plot_type in plot_types:
             data[node][plot_type] = dict(ord=[], ord2=[])
                 
     for file_idx, source_path in enumerate(source_file_iterator):
@@ -277,94 +421,73 @@ def main():
             continue
         
         try:
-            d = utils.load_json(source_path)
+            with profiling.phase('loading'):
+                d = utils.load_json(source_path)
         except Exception:
             print "WARNING: {} is not a valid (gzipped) JSON file".format(
                 os.path.basename(source_path))
             continue
         
+        if not utils.is_history_result(d, FLAGS.connections):
+            continue
+        
         timestamps.append(timestamp)
         last_filetail = utils.FILETAIL_DATETIME_PATTERN.search(
             source_path).group(1)
         
-        for node, n_res in d.items():
-                
-            if node not in data:
-                continue
+        node_results = dict(utils.iter_node_results(d))
         
-            # dataselect-get, -post, or arclink
-            for plot_type, plot_data in PLOTS.items():
+        # nodes missing in the file (e.g., tested by another instance that
+        # writes to the same directory) get NaN, so that all series stay
+        # aligned with the time stamps
+        for node in data:
             
-                # http get, dataselect
-                if plot_type == 'dataselect-get':
-                    
-                    try:
-                        throughput = n_res['result'][SIZE_KEY]['http']\
-                            ['dataselect']['get']['stats']['throughput'].get(
-                                'median', numpy.nan)
-                    except Exception:
-                        throughput = numpy.nan
-                         
-                    try:
-                        latency = n_res['result'][SIZE_KEY]['http']\
-                            ['dataselect']['get']['stats']['latency'].get(
-                                'median', numpy.nan)
-                    except Exception:
-                        latency = numpy.nan
-               
-                    data[node][plot_type]['ord'].append(throughput)
-                    data[node][plot_type]['ord2'].append(latency)
+            n_res = node_results.get(node, {})
+        
+            # dataselect-get, -post, arclink, station-*, availability-*
+            for plot_type in plot_types:
+                
+                plot_data = PLOTS[plot_type]
+                
+                _, method_res = utils.get_result_cell(
+                    n_res.get('result', {}).get(FLAGS.requestsize), 
+                    plot_data['protocol'], plot_data['service'], 
+                    plot_data['method'])
                 
-                elif plot_type == 'dataselect-post':
+                if FLAGS.effective:
                     
+                    # old result files have no attempt records
                     try:
-                        throughput = n_res['result'][SIZE_KEY]['http']\
-                            ['dataselect']['post']['stats']['throughput'].get(
-                                'median', numpy.nan)
+                        throughput = method_res['stats'].get(
+                            'effective_throughput', numpy.nan)
+                        success = method_res['stats']['attempts'].get(
+                            'success_ratio', numpy.nan)
                     except Exception:
                         throughput = numpy.nan
-                         
-                    try:
-                        latency = n_res['result'][SIZE_KEY]['http']\
-                            ['dataselect']['post']['stats']['latency'].get(
-                                'median', numpy.nan)
-                    except Exception:
-                        latency = numpy.nan
+                        success = numpy.nan
                     
                     data[node][plot_type]['ord'].append(throughput)
-                    data[node][plot_type]['ord2'].append(latency)
+                    data[node][plot_type]['ord2'].append(success)
+                    continue
+                
+                try:
+                    throughput = method_res['stats']['throughput'].get(
+                        'median', numpy.nan)
+                except Exception:
+                    throughput = numpy.nan
                 
-                # only for EIDA nodes
-                elif plot_type == 'dataselect-federator':
+                data[node][plot_type]['ord'].append(throughput)
+                
+                # http methods: latency
+                if 'latency_color' in plot_data:
                     
                     try:
-                        throughput = n_res['result'][SIZE_KEY]['http']\
-                            ['dataselect']['federator']['stats']\
-                                ['throughput'].get('median', numpy.nan)
-                    except Exception:
-                        throughput = numpy.nan
-                         
-                    try:
-                        latency = n_res['result'][SIZE_KEY]['http']\
-                            ['dataselect']['federator']['stats']['latency'].get(
-                                'median', numpy.nan)
+                        latency = method_res['stats']['latency'].get(
+                            'median', numpy.nan)
                     except Exception:
                         latency = numpy.nan
-                    
-                    data[node][plot_type]['ord'].append(throughput)
+               
                     data[node][plot_type]['ord2'].append(latency)
-                    
-                # arclink, waveform
-                elif plot_type == 'arclink':
-                    
-                    try:
-                        throughput = n_res['result'][SIZE_KEY]['arclink']\
-                            ['waveform']['stats']['throughput'].get(
-                                'median', numpy.nan)
-                    except Exception:
-                        throughput = numpy.nan
-                    
-                    data[node][plot_type]['ord'].append(throughput)
     
     # abscissae
     abscissa_start = timestamps[0].date()
@@ -390,12 +513,15 @@ def main():
             last_filetail, FLAGS.backend.lower())
         
     outpath= utils.get_outpath(outfile, FLAGS.od)
-    make_compare_plot_allnodes(
-        outpath, abscissa_start_timestamp, days_since_beginning, data)
+    
+    with profiling.phase('rendering'):
+        make_compare_plot_allnodes(
+            outpath, abscissa_start_timestamp, days_since_beginning, data, 
+            plot_types)
 
 
 def make_compare_plot_allnodes(
-    outpath, first_timestamp, days_since_beginning, data):
+    outpath, first_timestamp, days_since_beginning, data, plot_types):
     
     print "plotting all node comparison"
     
@@ -410,7 +536,8 @@ def make_compare_plot_allnodes(
     the_bigax = figure.add_subplot(111) 
     the_bigax2 = the_bigax.twinx()
     
-    the_bigax.set_title(BIG_TITLE, fontdict={'size': TITLE_FONTSIZE})
+    the_bigax.set_title(
+        PLOT_GROUP_TITLES[FLAGS.plotgroup], fontdict={'size': TITLE_FONTSIZE})
     
     # Turn off axis lines and ticks of the big subplot
     for the_axis in (the_bigax, the_bigax2):
@@ -422,8 +549,13 @@ def make_compare_plot_allnodes(
             labelcolor='w', top='off', bottom='off', left='off', right='off')
     
     the_bigax.set_xlabel(PLOT_ABSCISSA.format(first_timestamp))
-    the_bigax.set_ylabel(PLOT_ORDINATE)
-    the_bigax2.set_ylabel(PLOT_ORDINATE_LATENCY)
+    
+    if FLAGS.effective:
+        the_bigax.set_ylabel(PLOT_ORDINATE_EFFECTIVE)
+        the_bigax2.set_ylabel(PLOT_ORDINATE_SUCCESS)
+    else:
+        the_bigax.set_ylabel(PLOT_ORDINATE)
+        the_bigax2.set_ylabel(PLOT_ORDINATE_LATENCY)
     
     for node in data:
         
@@ -445,7 +577,7 @@ def make_compare_plot_allnodes(
         the_ax = figure.add_subplot(row_count, col_count, plot_idx+1)
         the_ax2 = the_ax.twinx()
         
-        for idx, plot_type in enumerate(PLOTS):
+        for idx, plot_type in enumerate(plot_types):
             
             #print "plot curve throughput: {}".format(plot_type)
             #print n_res[plot_type]['ord']
@@ -457,28 +589,32 @@ def make_compare_plot_allnodes(
                 else:
                     marker = None
                   
-                the_ax.plot(
-                    days_since_beginning, n_res[plot_type]['ord'],                   
+                plot_series(
+                    the_ax, days_since_beginning, n_res[plot_type]['ord'],                   
                     color=COMBINED_COLORS[idx], marker=marker,
                     markersize=MARKERSIZE_THROUGHPUT, label=plot_type)
                 
-            # http methods: latency
-            if plot_type.startswith('dataselect') and not(
-                numpy.isnan(n_res[plot_type]['ord2']).all()):
+            # http methods: latency, all: success ratio
+            if (FLAGS.effective or 'latency_color' in PLOTS[plot_type]) and \
+                not(numpy.isnan(n_res[plot_type]['ord2']).all()):
                     
                 #print "plot curve latency: {}".format(plot_type)
                 
-                method = plot_type[len('dataselect-'):]
-                label = "latency-{}".format(method)
-                col = PLOTS[plot_type]['latency_color']
+                if FLAGS.effective:
+                    label = "success-{}".format(plot_type)
+                else:
+                    label = "latency-{}".format(plot_type.split('-', 1)[1])
+                
+                col = PLOTS[plot_type].get(
+                    'latency_color', COMBINED_COLORS[idx])
                 
                 if FLAGS.markers:
                     marker = 'o'
                 else:
                     marker = None
                 
-                the_ax2.plot(
-                    days_since_beginning, n_res[plot_type]['ord2'], 
+                plot_series(
+                    the_ax2, days_since_beginning, n_res[plot_type]['ord2'], 
                     color=col, marker=marker, linestyle='--', linewidth=1,
                     markersize=MARKERSIZE_LATENCY, label=label)
   
@@ -520,6 +656,30 @@ def make_compare_plot_allnodes(
     PYPLOT.close(figure)
 
 
+def plot_series(the_ax, days, values, **kwargs):
+    """
+    Plot time series of per-file values. With --aggregate, median of time 
+    bins is plotted with a p10-p90 band, otherwise the raw line is decimated
+    to at most --maxpoints points.
+    
+    """
+    
+    if FLAGS.aggregate != 'none':
+        
+        centers, band = downsampling.bin_percentiles(
+            days, values, AGGREGATION_BIN_DAYS[FLAGS.aggregate])
+        
+        the_ax.fill_between(
+            centers, band[0], band[-1], color=kwargs['color'], 
+            alpha=BAND_ALPHA, linewidth=0)
+        
+        the_ax.plot(centers, band[1], **kwargs)
+    
+    else:
+        x, y = downsampling.minmax_decimate(days, values, FLAGS.maxpoints)
+        the_ax.plot(x, y, **kwargs)
+
+
 def put_node_label(the_ax, node, xmin, xmax, ymin, ymax):
 
     # all y axes start at 0, so use ymin = 0
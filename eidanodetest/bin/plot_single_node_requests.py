@@ -16,6 +16,7 @@ import os
 import re
 import sys
 
+from gflags import DEFINE_boolean
 from gflags import DEFINE_string
 from gflags import FLAGS
 
@@ -30,6 +31,7 @@ import matplotlib.patches as mpatches
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from eidanodetest import profiling
 from eidanodetest import utils
 
 
@@ -141,9 +143,15 @@ LEGEND_ANCHOR_LATENCY = (1.0, -1.5)
 BIG_TITLE = "dataselect and arclink throughput/latency"
 
 PLOT_ABSCISSA = 'Response size in Bytes'
+
+# response size axis (logarithmic) of the dataselect sizes, wider if needed
+XLIM_DEFAULT = (1e5, 1.1e9)
 PLOT_ORDINATE = 'Network throughput (Mbits / s)'
 PLOT_ORDINATE_LATENCY = 'Latency (s)'
 
+PLOT_ABSCISSA_TRANSFER = 'Time since start of request (s)'
+PLOT_ORDINATE_TRANSFER = 'Received (MB)'
+
 PLOT_MODELS_COLOR = '0.75'
 PLOT_REFERENCE_COLOR = '0.0'
 PLOT_REFERENCE_LINEWIDTH = 2
@@ -163,21 +171,110 @@ PLOTS = {
     'dataselect-get': {
         'title': 'dataselect (GET) throughput',
         'filename': 'dataselect_get_throughput',
-        'latency_color': 'g'
+        'latency_color': 'g',
+        'group': 'waveform',
+        'protocol': 'http',
+        'service': 'dataselect',
+        'method': 'get'
     },
     'dataselect-post': {
         'title': 'dataselect (POST) throughput',
         'filename': 'dataselect_post_throughput',
-        'latency_color': 'c'
+        'latency_color': 'c',
+        'group': 'waveform',
+        'protocol': 'http',
+        'service': 'dataselect',
+        'method': 'post'
     },
     'dataselect-federator': {
         'title': 'federator dataselect throughput',
         'filename': 'federator_dataselect_throughput',
-        'latency_color': 'y'
+        'latency_color': 'y',
+        'group': 'waveform',
+        'protocol': 'http',
+        'service': 'dataselect',
+        'method': 'federator'
     },
     'arclink': {
         'title': 'ArcLink throughput',
-        'filename': 'arclink_throughput'
+        'filename': 'arclink_throughput',
+        'group': 'waveform',
+        'protocol': 'arclink',
+        'service': 'waveform',
+        'method': ''
+    },
+    'station-network': {
+        'title': 'station (GET, level=network) throughput',
+        'filename': 'station_network_throughput',
+        'latency_color': 'g',
+        'group': 'station',
+        'protocol': 'http',
+        'service': 'station-network',
+        'method': 'get'
+    },
+    'station-station': {
+        'title': 'station (GET, level=station) throughput',
+        'filename': 'station_station_throughput',
+        'latency_color': 'c',
+        'group': 'station',
+        'protocol': 'http',
+        'service': 'station-station',
+        'method': 'get'
+    },
+    'station-channel': {
+        'title': 'station (GET, level=channel) throughput',
+        'filename': 'station_channel_throughput',
+        'latency_color': 'y',
+        'group': 'station',
+        'protocol': 'http',
+        'service': 'station-channel',
+        'method': 'get'
+    },
+    'station-response': {
+        'title': 'station (GET, level=response) throughput',
+        'filename': 'station_response_throughput',
+        'latency_color': '0.5',
+        'group': 'station',
+        'protocol': 'http',
+        'service': 'station-response',
+        'method': 'get'
+    },
+    'availability-get': {
+        'title': 'availability (GET) throughput',
+        'filename': 'availability_get_throughput',
+        'latency_color': 'g',
+        'group': 'availability',
+        'protocol': 'http',
+        'service': 'availability',
+        'method': 'get'
+    },
+    'availability-post': {
+        'title': 'availability (POST) throughput',
+        'filename': 'availability_post_throughput',
+        'latency_color': 'c',
+        'group': 'availability',
+        'protocol': 'http',
+        'service': 'availability',
+        'method': 'post'
+    }
+}
+
+# plot types of a group are combined in per-node and node comparison plots
+PLOT_GROUPS = {
+    'waveform': {
+        'title': BIG_TITLE,
+        'node_filename': 'http_arclink',
+        'compare_filename': 'allnodes_compare'
+    },
+    'station': {
+        'title': 'station throughput/latency',
+        'node_filename': 'station',
+        'compare_filename': 'allnodes_compare_station'
+    },
+    'availability': {
+        'title': 'availability throughput/latency',
+        'node_filename': 'availability',
+        'compare_filename': 'allnodes_compare_availability'
     }
 }
 
@@ -191,6 +288,14 @@ SIZE_KEYS = ('small', 'medium', 'large', 'verylarge', 'huge')
 DEFINE_string('backend', PDF_BACKEND_DEFAULT, 'Plot backend (default: pdf')
 DEFINE_string('infile', '', 'Input file')
 DEFINE_string('od', '', 'Output directory')
+DEFINE_string(
+    'transfers', '', 
+    'Plot transfer curves (bytes received over time) of requests to this node')
+DEFINE_string('profile', '', 'Write cProfile statistics (pstats) to file')
+DEFINE_boolean(
+    'phases', False, 
+    'Print wall clock and CPU time of loading and rendering phases\
+    (implied by --profile)')
 
 
 def main():
@@ -202,7 +307,20 @@ def main():
             "--infile option"
         raise RuntimeError, error_msg
     
-    d = utils.load_json(FLAGS.infile)
+    try:
+        with profiling.profile(FLAGS.profile):
+            make_plots()
+    
+    finally:
+        if FLAGS.profile or FLAGS.phases:
+            print "\n".join(profiling.TIMER.format_summary())
+
+
+def make_plots():
+    
+    # transfer time series are raw data
+    with profiling.phase('loading'):
+        d = utils.load_json(FLAGS.infile, raw=bool(FLAGS.transfers))
     
     # get datetime filename tail
     m = utils.FILETAIL_DATETIME_PATTERN.search(FLAGS.infile)
@@ -213,104 +331,104 @@ def main():
     
     # get datetime filename tail
     timestamp = utils.get_timestamp_from_filename(FLAGS.infile)
+    
+    if FLAGS.transfers:
         
+        if FLAGS.transfers not in d:
+            error_msg = "node {} not in result file".format(FLAGS.transfers)
+            raise RuntimeError, error_msg
+        
+        with profiling.phase('rendering'):
+            make_plot_transfers(
+                "{}_transfers_{}".format(FLAGS.transfers, filetail), 
+                d[FLAGS.transfers], FLAGS.transfers, timestamp)
+    
     data = {}
     
-    for node in d:
+    for node, _ in utils.iter_node_results(d):
         data[node] = dict()
         
         for plot_type in PLOTS:
-            data[node][plot_type] = dict(absc=[], ord=[], ord2=[])
+            data[node][plot_type] = dict(
+                absc=[], ord=[], ord2=[], effective=[], success=[])
 
-    # dataselect-get, -post, or arclink
+    # dataselect-get, -post, arclink, station-*, availability-*
     for plot_type, plot_data in PLOTS.items():
         
-        for node, n_res in d.items():
+        for node, n_res in utils.iter_node_results(d):
             
             for sk in SIZE_KEYS:
                 
                 if not sk in n_res['result']:
                     continue
                 
-                # http get, dataselect
-                if plot_type == 'dataselect-get' and \
-                    'length' in n_res['result'][sk]['http']['dataselect'] and \
-                     'stats' in  n_res['result'][sk]['http']['dataselect']\
-                         ['get']:
-                    
-                    #print n_res['result'][sk]['http']
-                    
-                    data[node][plot_type]['absc'].append(
-                        n_res['result'][sk]['http']['dataselect']['length'])
-                    data[node][plot_type]['ord'].append(
-                        n_res['result'][sk]['http']['dataselect']['get']\
-                            ['stats']['throughput']['median'])
-                    data[node][plot_type]['ord2'].append(
-                        n_res['result'][sk]['http']['dataselect']['get']\
-                            ['stats']['latency']['median'])
+                service_res, method_res = utils.get_result_cell(
+                    n_res['result'][sk], plot_data['protocol'], 
+                    plot_data['service'], plot_data['method'])
                 
-                elif plot_type == 'dataselect-post' and \
-                    'length' in n_res['result'][sk]['http']['dataselect'] and \
-                     'stats' in  n_res['result'][sk]['http']['dataselect']\
-                         ['post']:
-                    
-                    #print n_res['result'][sk]['http']
+                # no throughput if all requests failed
+                if service_res is None or 'length' not in service_res or \
+                    'throughput' not in method_res.get('stats', {}):
+                    continue
                     
-                    data[node][plot_type]['absc'].append(
-                        n_res['result'][sk]['http']['dataselect']['length'])
-                    data[node][plot_type]['ord'].append(
-                        n_res['result'][sk]['http']['dataselect']['post']\
-                            ['stats']['throughput']['median'])
-                    data[node][plot_type]['ord2'].append(
-                        n_res['result'][sk]['http']['dataselect']['post']\
-                            ['stats']['latency']['median'])
+                data[node][plot_type]['absc'].append(service_res['length'])
+                data[node][plot_type]['ord'].append(
+                    method_res['stats']['throughput']['median'])
+                data[node][plot_type]['ord2'].append(
+                    method_res['stats'].get('latency', {}).get(
+                        'median', numpy.nan))
                 
-                # only for EIDA nodes
-                elif plot_type == 'dataselect-federator' and \
-                    'length' in n_res['result'][sk]['http']['dataselect'] and \
-                     'stats' in  n_res['result'][sk]['http']['dataselect']\
-                         ['federator']:
-                    
-                    #print n_res['result'][sk]['http']
-                    
-                    data[node][plot_type]['absc'].append(
-                        n_res['result'][sk]['http']['dataselect']['length'])
-                    data[node][plot_type]['ord'].append(
-                        n_res['result'][sk]['http']['dataselect']['federator']\
-                            ['stats']['throughput']['median'])
-                    data[node][plot_type]['ord2'].append(
-                        n_res['result'][sk]['http']['dataselect']['federator']\
-                            ['stats']['latency']['median'])
-                    
-                # arclink, waveform
-                elif plot_type == 'arclink' and \
-                    'length' in n_res['result'][sk]['arclink']['waveform'] \
-                        and 'stats' in \
-                            n_res['result'][sk]['arclink']['waveform']:
-                    
-                    data[node][plot_type]['absc'].append(
-                        n_res['result'][sk]['arclink']['waveform']['length'])
-                    data[node][plot_type]['ord'].append(
-                        n_res['result'][sk]['arclink']['waveform']['stats']\
-                            ['throughput']['median'])
+                # old result files have no attempt records
+                data[node][plot_type]['effective'].append(
+                    method_res['stats'].get(
+                        'effective_throughput', numpy.nan))
+                data[node][plot_type]['success'].append(
+                    method_res['stats'].get('attempts', {}).get(
+                        'success_ratio', numpy.nan))
+        
+        # no empty plots for services that have not been tested
+        if not any(data[node][plot_type]['absc'] for node in data):
+            continue
         
         title = utils.set_title(plot_data['title'], timestamp)
         
-        make_plot_allnodes(
-            plot_data['filename'], data, title, plot_type, filetail)
+        with profiling.phase('rendering'):
+            make_plot_allnodes(
+                plot_data['filename'], data, title, plot_type, filetail)
+    
+    for group, group_data in PLOT_GROUPS.items():
         
-    for node, n_res in data.items():
-        make_plot_node(
-            "{}_{}_{}".format(node, 'http_arclink', filetail), n_res, node, 
-            timestamp)
+        plot_types = get_group_plot_types(group)
+        
+        if not any(data[node][plot_type]['absc'] for node in data \
+            for plot_type in plot_types):
+            continue
         
-    make_compare_plot_allnodes(
-        "allnodes_compare_{}".format(filetail), data, timestamp)
+        with profiling.phase('rendering'):
+            
+            for node, n_res in data.items():
+                make_plot_node(
+                    "{}_{}_{}".format(
+                        node, group_data['node_filename'], filetail), 
+                    n_res, node, timestamp, plot_types)
+            
+            make_compare_plot_allnodes(
+                "{}_{}".format(group_data['compare_filename'], filetail), 
+                data, timestamp, group_data['title'], plot_types)
 
 
-def make_compare_plot_allnodes(outfile, data, timestamp):
+def get_group_plot_types(group):
+    """Plot types of group in fixed order (determines colors)."""
     
-    print "plotting all node comparison"
+    return [
+        plot_type for plot_type in sorted(PLOTS) \
+            if PLOTS[plot_type]['group'] == group]
+
+
+def make_compare_plot_allnodes(
+    outfile, data, timestamp, big_title, plot_types):
+    
+    print "plotting all node comparison: {}".format(big_title)
     
     rcParams['figure.figsize'] = PLOTSIZE_TWOCOLUMNS
     
@@ -325,7 +443,7 @@ def make_compare_plot_allnodes(outfile, data, timestamp):
     the_bigax = figure.add_subplot(111) 
     the_bigax2 = the_bigax.twinx()
     
-    title = utils.set_title(BIG_TITLE, timestamp)
+    title = utils.set_title(big_title, timestamp)
     the_bigax.set_title(title, fontdict={'size': TITLE_FONTSIZE})
     
     # Turn off axis lines and ticks of the big subplot
@@ -341,6 +459,11 @@ def make_compare_plot_allnodes(outfile, data, timestamp):
     the_bigax.set_ylabel(PLOT_ORDINATE)
     the_bigax2.set_ylabel(PLOT_ORDINATE_LATENCY)
     
+    # same axis for all nodes
+    xlim = get_xlim(
+        data[node][plot_type]['absc'] for node in data \
+            for plot_type in plot_types)
+    
     for node in data:
         
         # no unicode
@@ -364,7 +487,7 @@ def make_compare_plot_allnodes(outfile, data, timestamp):
         the_ax = figure.add_subplot(row_count, col_count, plot_idx+1)
         the_ax2 = the_ax.twinx()
         
-        for idx, plot_type in enumerate(PLOTS):
+        for idx, plot_type in enumerate(plot_types):
             
             if n_res[plot_type]['absc'] and not all(
                 numpy.array(n_res[plot_type]['ord']) <= 0):
@@ -376,14 +499,13 @@ def make_compare_plot_allnodes(outfile, data, timestamp):
                     markersize=3, label=plot_type)
                 
             # http methods: latency
-            if plot_type.startswith('dataselect') and \
+            if 'latency_color' in PLOTS[plot_type] and \
                 n_res[plot_type]['absc'] and not all(
                     numpy.array(n_res[plot_type]['ord2']) <= 0):
                     
                 #print "plot curve latency: {}".format(plot_type)
                 
-                method = plot_type[len('dataselect-'):]
-                label = "latency-{}".format(method)
+                label = "latency-{}".format(plot_type.split('-', 1)[1])
                 col = PLOTS[plot_type]['latency_color']
                     
                 the_ax2.semilogx(
@@ -393,7 +515,7 @@ def make_compare_plot_allnodes(outfile, data, timestamp):
             
         ymin, ymax = the_ax.get_ylim()
         the_ax.set_ylim(0, ymax)
-        the_ax.set_xlim(1e5, 1.1e9)
+        the_ax.set_xlim(*xlim)
         
         ymin_2, ymax_2 = the_ax2.get_ylim()
         the_ax2.set_ylim(0, ymax_2)
@@ -423,7 +545,7 @@ def make_compare_plot_allnodes(outfile, data, timestamp):
     PYPLOT.close(figure)
 
 
-def make_plot_node(outfile, data, node, timestamp):
+def make_plot_node(outfile, data, node, timestamp, plot_types):
     
     print "making all plots for node {}".format(node)
     
@@ -439,7 +561,7 @@ def make_plot_node(outfile, data, node, timestamp):
     
     figure.suptitle(title, fontdict={'size': TITLE_FONTSIZE})
 
-    for idx, plot_type in enumerate(PLOTS):
+    for idx, plot_type in enumerate(plot_types):
         
         if data[plot_type]['absc'] and not all(
             numpy.array(data[plot_type]['ord']) <= 0):
@@ -448,11 +570,14 @@ def make_plot_node(outfile, data, node, timestamp):
                 data[plot_type]['absc'], data[plot_type]['ord'], 
                 color=COMBINED_COLORS[idx], marker=COMBINED_SYMBOLS[idx], 
                 label=plot_type)
+            
+            plot_failures(the_ax, data[plot_type], plot_type, idx)
 
     ymin, ymax = the_ax.get_ylim()
     the_ax.set_ylim(0, ymax)
     
-    the_ax.set_xlim(1e5, 1.1e9)
+    the_ax.set_xlim(*get_xlim(
+        data[plot_type]['absc'] for plot_type in plot_types))
     
     the_ax.legend()
     
@@ -467,6 +592,119 @@ def make_plot_node(outfile, data, node, timestamp):
     PYPLOT.close(figure)
     
 
+def make_plot_transfers(outfile, n_res, node, timestamp):
+    """
+    Cumulative bytes received over time of every HTTP request with transfer
+    time series, one panel per response size. Flat segments are stalls.
+    
+    """
+    
+    sizes = [sk for sk in SIZE_KEYS if sk in n_res['result']]
+    
+    curves = dict()
+    
+    for sk in sizes:
+        for idx, plot_type in enumerate(sorted(PLOTS)):
+            
+            plot_data = PLOTS[plot_type]
+            
+            _, method_res = utils.get_result_cell(
+                n_res['result'][sk], plot_data['protocol'], 
+                plot_data['service'], plot_data['method'])
+            
+            if method_res is None:
+                continue
+            
+            for attempt in method_res.get('data', {}).get('attempts', []):
+                if 'series' in attempt:
+                    curves.setdefault(sk, []).append(
+                        (idx, plot_type, get_transfer_curve(attempt['series'])))
+    
+    if not curves:
+        print "no transfer time series for node {}".format(node)
+        return
+    
+    print "plotting transfer curves for node {}".format(node)
+    
+    rcParams['figure.figsize'] = PLOTSIZE_TWOCOLUMNS
+    
+    figure = PYPLOT.figure()
+    figure.clf()
+    
+    title = utils.set_title(
+        "{} ({}) transfers".format(utils.get_node_name(node), node.upper()), 
+        timestamp)
+    
+    figure.suptitle(title, fontdict={'size': TITLE_FONTSIZE})
+    
+    sizes = [sk for sk in sizes if sk in curves]
+    
+    for row, sk in enumerate(sizes):
+        
+        the_ax = figure.add_subplot(len(sizes), 1, row + 1)
+        labelled = set()
+        
+        for idx, plot_type, (times, received) in curves[sk]:
+            
+            if plot_type in labelled:
+                label = '_nolegend_'
+            else:
+                label = plot_type
+                labelled.add(plot_type)
+            
+            the_ax.plot(
+                times, received, color=COLORS[idx % len(COLORS)], 
+                linewidth=1, label=label)
+        
+        the_ax.set_title(sk, fontdict={'size': TITLE_FONTSIZE})
+        the_ax.set_ylabel(PLOT_ORDINATE_TRANSFER)
+        the_ax.legend(loc='lower right', fontsize=LEGEND_ALL_FONTSIZE)
+    
+    the_ax.set_xlabel(PLOT_ABSCISSA_TRANSFER)
+    
+    filename = "{}.{}".format(outfile, FLAGS.backend.lower())
+    outpath = utils.get_outpath(filename, FLAGS.od)
+    
+    PYPLOT.savefig(
+        outpath, format=FLAGS.backend.lower(), dpi=FIG_RESOLUTION_DPI)
+    PYPLOT.close(figure)
+
+
+def get_transfer_curve(series):
+    """Return times (s) and cumulative MB received of transfer time series."""
+    
+    times = [0.0] + [
+        (idx + 1) * series['interval'] for idx in xrange(len(series['bytes']))]
+    received = [0.0] + list(numpy.cumsum(series['bytes']) / (1000.0 * 1000.0))
+    
+    return times, received
+
+
+def plot_failures(the_ax, data, plot_type, idx):
+    """
+    Dashed line of effective throughput (failed requests counted in), 
+    success ratio annotated at points with failed requests.
+    
+    """
+    
+    if numpy.isnan(data['effective']).all():
+        return
+    
+    the_ax.semilogx(
+        data['absc'], data['effective'], color=COMBINED_COLORS[idx], 
+        marker=COMBINED_SYMBOLS[idx], linestyle='--', linewidth=1, 
+        markersize=3, label="{} (effective)".format(plot_type))
+    
+    for absc, ordinate, success in zip(
+        data['absc'], data['ord'], data['success']):
+        
+        if success < 1.0:
+            the_ax.text(
+                absc, ordinate, " {:.0f}%".format(100 * success), 
+                color=COMBINED_COLORS[idx], fontsize=LEGEND_ALL_FONTSIZE, 
+                verticalalignment='bottom')
+
+
 def make_plot_allnodes(outfile, data, title, plot_type, filetail):
     
     print "plotting all nodes for {}".format(plot_type)
@@ -506,7 +744,8 @@ def make_plot_allnodes(outfile, data, title, plot_type, filetail):
     ymin, ymax = the_ax.get_ylim()
     the_ax.set_ylim(0, ymax)
     
-    the_ax.set_xlim(1e5, 1.1e9)
+    the_ax.set_xlim(*get_xlim(
+        n_res[plot_type]['absc'] for n_res in data.values()))
     the_ax.legend()
     
     the_ax.set_xlabel(PLOT_ABSCISSA)
@@ -521,22 +760,43 @@ def make_plot_allnodes(outfile, data, title, plot_type, filetail):
     PYPLOT.close(figure)
 
 
+def get_xlim(abscissas):
+    """
+    Return limits of response size axis: the default range if it contains 
+    all response sizes of abscissas (lists of bytes), otherwise the range of
+    the response sizes with a margin (e.g., station and availability 
+    responses of a few KB).
+    
+    """
+    
+    values = [x for absc in abscissas for x in absc if x > 0]
+    
+    if not values or (
+        min(values) >= XLIM_DEFAULT[0] and max(values) <= XLIM_DEFAULT[1]):
+        return XLIM_DEFAULT
+    
+    return 0.5 * min(values), 2.0 * max(values)
+
+
 def put_node_label(the_ax, node, ymax, ymin):
 
     # NOTE: do not put 0.0 as x coord, will raise an error (logarithmic)
     
+    # positions relative to the response size axis
+    xmin, xmax = the_ax.get_xlim()
+    
     # all y axes start at 0, so use ymin = 0
     ymin = 0
     # lower right
     if NODES[node]['legend_pos'] == 'lr':
         the_ax.text(
-            9.0e8, ymin + 0.05 * (ymax - ymin), node, 
+            xmax / 1.2, ymin + 0.05 * (ymax - ymin), node, 
             color=utils.get_node_text_color_linestyle(node)[0], 
             horizontalalignment='right',verticalalignment='bottom')
     
     else:
         the_ax.text(
-            1.5e5, 0.9 * ymax, node, 
+            xmin * 1.5, 0.9 * ymax, node, 
             color=utils.get_node_text_color_linestyle(node)[0], 
             horizontalalignment='left',verticalalignment='top')
 
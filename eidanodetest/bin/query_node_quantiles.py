@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Computes percentiles of throughput, latency and request time over a time
+range of JSON result files, by merging the quantile sketches stored with
+every result cell. Memory does not depend on the number of result files.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+from __future__ import unicode_literals
+
+import datetime
+import glob
+import json
+import os
+import sys
+
+import dateutil.parser
+
+from gflags import DEFINE_integer
+from gflags import DEFINE_string
+from gflags import FLAGS
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eidanodetest import sketch
+from eidanodetest import utils
+
+
+QUANTILES = '0.5,0.9,0.95,0.99'
+
+
+DEFINE_string('id', '', 'Input directory')
+DEFINE_string('od', '', 'Output directory')
+DEFINE_string('of', '', 'Output file (JSON, default: print only)')
+DEFINE_string('startdate', '', 'Start date')
+DEFINE_string('enddate', '',  'End date')
+DEFINE_integer('daysbefore', 0, 'Days before end date')
+DEFINE_string(
+    'requestsize', '',
+    'Comma-separated list of response sizes (small, medium, large, '\
+    'verylarge, huge; default: all)')
+DEFINE_string('nodes', '', 'Comma-separated list of nodes (default: all)')
+DEFINE_string(
+    'connections', 'new',
+    'History of runs with a new HTTP connection per request (new: suite '\
+    'mode; resumed: with --tlsresume) or with reused connections (reused: '\
+    'daemon mode)')
+DEFINE_string(
+    'quantiles', QUANTILES, 'Comma-separated list of quantiles (0-1)')
+
+
+def main():
+
+    _ = FLAGS(sys.argv)
+
+    if not FLAGS.id:
+        error_msg = "you need to specify an input directory name with the "\
+            "--id option"
+        raise RuntimeError, error_msg
+
+    quantiles = [float(x) for x in FLAGS.quantiles.split(',')]
+    size_list = get_list(FLAGS.requestsize)
+    node_list = get_list(FLAGS.nodes)
+
+    # iterates through files with ascending time stamps
+    # (earliest first)
+    source_file_iterator = sorted(
+        glob.iglob(
+            os.path.join(FLAGS.id, utils.FILENAME_DATETIME_PATTERN_GLOB)))
+
+    if not source_file_iterator:
+        error_msg = "no result files in {}".format(FLAGS.id)
+        raise RuntimeError, error_msg
+
+    first_timestamp = utils.get_timestamp_from_filename(
+        source_file_iterator[0])
+    last_timestamp = utils.get_timestamp_from_filename(
+        source_file_iterator[-1])
+
+    if FLAGS.startdate:
+        first_timestamp = dateutil.parser.parse(FLAGS.startdate)
+
+    if FLAGS.enddate:
+        last_timestamp = dateutil.parser.parse(FLAGS.enddate)
+
+    if FLAGS.daysbefore > 0:
+        if FLAGS.startdate:
+            error_msg = "--daysbefore is mutually exclusive with --startdate"
+            raise RuntimeError, error_msg
+
+        first_timestamp = last_timestamp - datetime.timedelta(
+            days=FLAGS.daysbefore)
+
+    # (node, size, protocol, service, method) -> metric -> merged sketch
+    merged = dict()
+    file_count = 0
+    no_sketch_count = 0
+
+    for source_path in source_file_iterator:
+
+        timestamp = utils.get_timestamp_from_filename(source_path)
+
+        if timestamp is None or not utils.is_valid_timestamp(
+                timestamp, first_timestamp, last_timestamp):
+            continue
+
+        try:
+            d = utils.load_json(source_path)
+        except Exception:
+            print "WARNING: {} is not a valid (gzipped) JSON file".format(
+                os.path.basename(source_path))
+            continue
+
+        if not utils.is_history_result(d, FLAGS.connections):
+            continue
+
+        file_count += 1
+
+        for node, size, protocol, service, method, _, method_res in \
+            utils.iter_result_cells(d):
+
+            if (size_list and size not in size_list) or \
+                (node_list and node not in node_list):
+                continue
+
+            if 'stats' in method_res and 'sketch' not in method_res:
+                no_sketch_count += 1
+                continue
+
+            for metric, sketch_dict in method_res.get('sketch', {}).items():
+
+                cell = merged.setdefault(
+                    (node, size, protocol, service, method or protocol), {})
+
+                if metric in cell:
+                    cell[metric].merge(
+                        sketch.QuantileSketch.from_dict(sketch_dict))
+                else:
+                    cell[metric] = sketch.QuantileSketch.from_dict(
+                        sketch_dict)
+
+    print "merged sketches of {} result files from {} until {}".format(
+        file_count, first_timestamp, last_timestamp)
+
+    if no_sketch_count:
+        print "WARNING: {} result cells without sketch (old result "\
+            "files) ignored".format(no_sketch_count)
+
+    output = dict(
+        startdate=str(first_timestamp), enddate=str(last_timestamp),
+        files=file_count, quantiles=quantiles, result=dict())
+
+    for key in sorted(merged):
+
+        print "----- {}".format("/".join(key))
+
+        cell_out = output['result'].setdefault(
+            key[0], {}).setdefault(key[1], {}).setdefault(
+                key[2], {}).setdefault(key[3], {}).setdefault(key[4], {})
+
+        for metric, metric_sketch in sorted(merged[key].items()):
+
+            values = [metric_sketch.quantile(q) for q in quantiles]
+
+            cell_out[metric] = dict(
+                count=metric_sketch.count, mean=metric_sketch.mean(),
+                min=metric_sketch.min, max=metric_sketch.max,
+                quantiles=dict(zip([str(q) for q in quantiles], values)))
+
+            print "{} (n={}): {}".format(
+                metric, metric_sketch.count, " ".join(
+                    "p{:g}={:.3f}".format(100 * q, v) for q, v in zip(
+                        quantiles, values)))
+
+    if FLAGS.of:
+        with open(utils.get_outpath(FLAGS.of, FLAGS.od), 'w') as fh:
+            json.dump(output, fh, sort_keys=True, indent=4)
+
+
+def get_list(flag_value):
+
+    if flag_value:
+        return [x.strip() for x in flag_value.split(',')]
+    else:
+        return []
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+Request templates from fdsnws-dataselect access logs, for workload replay.
+
+Two log formats are read (detected per line):
+
+    combined    Apache/NCSA combined (or common) log format, GET requests
+                with query string, e.g.
+
+                1.2.3.4 - - [10/Oct/2016:13:55:36 +0200] "GET
+                /fdsnws/dataselect/1/query?net=GE&sta=APE&start=... HTTP/1.1"
+                200 12345 "-" "ObsPy"
+
+    JSON lines  one JSON object per line with time (epoch seconds or ISO
+                8601, UTC), method (GET, POST), and query (query string) or
+                body (POST body), e.g. written by a WSGI middleware
+
+Lines of other requests (not dataselect query, POST without body, no start
+or end time) are skipped. Requests are normalized into templates: parameter
+aliases are replaced by their long names (net -> network, start ->
+starttime, ...), times are written in one ISO format, and POST bodies are
+rewritten with sorted options followed by the stream lines. The duration of
+the longest requested time window determines the request class.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import calendar
+import datetime
+import json
+import re
+import urlparse
+
+
+DATASELECT_PATH = 'fdsnws/dataselect/1/query'
+
+PARAM_ALIASES = dict(
+    net='network', sta='station', loc='location', cha='channel',
+    start='starttime', end='endtime')
+
+STREAM_KEYS = ('network', 'station', 'location', 'channel')
+TIME_KEYS = ('starttime', 'endtime')
+
+COMBINED_LOG_PATTERN = re.compile(
+    r'^\S+ \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<url>\S+)'
+    r'(?: [^"]*)?" (?P<status>\d{3})')
+
+COMBINED_LOG_TIME_FORMAT = '%d/%b/%Y:%H:%M:%S'
+
+ISO_TIME_FORMATS = (
+    '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d')
+
+OUTPUT_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def read_schedule(paths, compression=1.0, limit=0):
+    """
+    Read access log files, return tuple (schedule, skipped). schedule is a
+    list of (offset, template) in order of request time, offset is the time
+    of the request after the first one (seconds) divided by compression;
+    at most limit requests (0: all). skipped is the number of lines that
+    are not replayable.
+
+    """
+
+    if compression <= 0:
+        raise ValueError("time compression must be positive")
+
+    entries = []
+    skipped = 0
+
+    for path in paths:
+
+        with open(path, 'r') as fh:
+
+            for line in fh:
+
+                if not line.strip():
+                    continue
+
+                try:
+                    entry = parse_line(line)
+                    entry['template'] = make_template(entry)
+
+                except ValueError:
+                    skipped += 1
+                    continue
+
+                entries.append(entry)
+
+    entries.sort(key=lambda x: x['time'])
+
+    if limit:
+        entries = entries[:limit]
+
+    if not entries:
+        return [], skipped
+
+    t_first = entries[0]['time']
+
+    return [
+        ((x['time'] - t_first) / compression, x['template']) \
+            for x in entries], skipped
+
+
+def parse_line(line):
+    """
+    Return entry dict(time, method, query, body) of log line (query or body
+    is None). Raise ValueError if line is not a dataselect query.
+
+    """
+
+    line = line.strip()
+
+    if line.startswith('{'):
+        entry = parse_json_line(line)
+    else:
+        entry = parse_combined_line(line)
+
+    if entry['method'] not in ('get', 'post'):
+        raise ValueError("method {} not replayable".format(entry['method']))
+
+    if entry['method'] == 'post' and not entry['body']:
+        raise ValueError("POST request without body")
+
+    return entry
+
+
+def parse_combined_line(line):
+
+    match = COMBINED_LOG_PATTERN.match(line)
+
+    if match is None:
+        raise ValueError("not a combined log line")
+
+    if not match.group('status').startswith('2'):
+        raise ValueError("request failed")
+
+    url = urlparse.urlsplit(match.group('url'))
+
+    if not url.path.rstrip('/').endswith(DATASELECT_PATH):
+        raise ValueError("not a dataselect query")
+
+    return dict(
+        time=parse_combined_time(match.group('time')),
+        method=match.group('method').lower(), query=url.query, body=None)
+
+
+def parse_json_line(line):
+
+    try:
+        record = json.loads(line)
+    except ValueError:
+        raise ValueError("invalid JSON line")
+
+    if 'path' in record and \
+        not record['path'].rstrip('/').endswith(DATASELECT_PATH):
+        raise ValueError("not a dataselect query")
+
+    try:
+        if isinstance(record['time'], (int, long, float)):
+            t = float(record['time'])
+        else:
+            t = to_epoch(parse_time(record['time']))
+
+        return dict(
+            time=t, method=record.get('method', 'GET').lower(),
+            query=record.get('query'), body=record.get('body'))
+
+    except (KeyError, TypeError, AttributeError):
+        raise ValueError("incomplete JSON line")
+
+
+def parse_combined_time(text):
+    """Return epoch seconds of combined log time (with UTC offset)."""
+
+    parts = text.split()
+
+    t = to_epoch(datetime.datetime.strptime(
+        parts[0], COMBINED_LOG_TIME_FORMAT))
+
+    if len(parts) > 1:
+        offset = parts[1]
+        sign = -1 if offset.startswith('-') else 1
+
+        t -= sign * (int(offset[-4:-2]) * 3600 + int(offset[-2:]) * 60)
+
+    return t
+
+
+def parse_time(text):
+    """Return datetime of ISO 8601 time (UTC, optional Z)."""
+
+    text = text.strip().rstrip('Z')
+
+    for time_format in ISO_TIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, time_format)
+        except ValueError:
+            continue
+
+    raise ValueError("time {} not understood".format(text))
+
+
+def to_epoch(dt):
+    return calendar.timegm(dt.timetuple()) + dt.microsecond / 1e6
+
+
+def make_template(entry):
+    """
+    Return request template dict(method, params, body, duration, streams)
+    of entry: normalized query parameters (GET) or POST body, longest
+    requested time window (seconds) and number of stream lines (POST) or
+    stream parameter combinations (GET). Raise ValueError if the request
+    has no time window.
+
+    """
+
+    if entry['method'] == 'post':
+        body, duration, streams = normalize_body(entry['body'])
+        params = None
+
+    else:
+        params = normalize_params(
+            urlparse.parse_qsl(entry['query'] or '', keep_blank_values=True))
+        body = None
+
+        if not all(key in params for key in TIME_KEYS):
+            raise ValueError("request without time window")
+
+        duration = get_duration(params['starttime'], params['endtime'])
+
+        streams = 1
+        for key in STREAM_KEYS:
+            streams *= len(params.get(key, '*').split(','))
+
+    return dict(
+        method=entry['method'], params=params, body=body, duration=duration,
+        streams=streams)
+
+
+def normalize_params(pairs):
+    """Return dict of query parameters with long names and ISO times."""
+
+    params = dict()
+
+    for key, value in pairs:
+
+        key = PARAM_ALIASES.get(key.lower(), key.lower())
+
+        if key in TIME_KEYS:
+            value = parse_time(value).strftime(OUTPUT_TIME_FORMAT)
+
+        params[key] = value
+
+    return params
+
+
+def normalize_body(body):
+    """
+    Return tuple (body, duration, streams) of POST body: options (key=value
+    lines, long names) sorted, followed by stream lines with ISO times,
+    longest time window (seconds), number of stream lines. Raise ValueError
+    if body has no stream lines.
+
+    """
+
+    options = dict()
+    lines = []
+    duration = 0
+
+    for line in body.splitlines():
+
+        line = line.strip()
+
+        if not line:
+            continue
+
+        if '=' in line:
+            key, value = [x.strip() for x in line.split('=', 1)]
+            options.update(normalize_params([(key, value)]))
+            continue
+
+        fields = line.split()
+
+        if len(fields) != 6:
+            raise ValueError("invalid stream line {}".format(line))
+
+        starttime = parse_time(fields[4]).strftime(OUTPUT_TIME_FORMAT)
+        endtime = parse_time(fields[5]).strftime(OUTPUT_TIME_FORMAT)
+
+        lines.append(" ".join(fields[:4] + [starttime, endtime]))
+        duration = max(duration, get_duration(starttime, endtime))
+
+    if not lines:
+        raise ValueError("POST body without stream lines")
+
+    normalized = "".join(
+        "{}={}\n".format(key, options[key]) for key in sorted(options))
+    normalized += "".join("{}\n".format(line) for line in lines)
+
+    return normalized, duration, len(lines)
+
+
+def get_duration(starttime, endtime):
+    """Return seconds between ISO times, raise ValueError if negative."""
+
+    duration = to_epoch(parse_time(endtime)) - to_epoch(parse_time(starttime))
+
+    if duration < 0:
+        raise ValueError("time window ends before it starts")
+
+    return duration
+
+
+def classify(duration, categories):
+    """
+    Return request class of time window duration: name of the first of
+    categories (list of (name, seconds), ascending) whose duration is not
+    shorter, the last one for longer windows.
+
+    """
+
+    for name, seconds in categories:
+        if duration <= seconds:
+            return name
+
+    return categories[-1][0]
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Hard deadlines for requests and per-node circuit breaker.
+
+A request has three limits: connect (seconds to establish the connection),
+read (seconds without receiving a byte, i.e. stall) and total (seconds for
+the whole request). Clients that cannot enforce a total deadline themselves
+(ArcLink) are interrupted with a SIGALRM timer.
+
+The circuit breaker opens for a node after a number of consecutive failed
+requests. Further requests for an open node are skipped; the time they would
+presumably have taken (mean duration of the failures that opened the
+breaker) is accounted as saved.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import contextlib
+import signal
+import time
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def get_deadline(total, t_start=None):
+    """Return absolute time of total deadline, None if total is None."""
+
+    if total is None:
+        return None
+
+    if t_start is None:
+        t_start = time.time()
+
+    return t_start + total
+
+
+def check_deadline(deadline):
+
+    if deadline is not None and time.time() > deadline:
+        raise DeadlineExceeded("total request deadline exceeded")
+
+
+@contextlib.contextmanager
+def alarm(seconds):
+    """
+    Raise DeadlineExceeded in the main thread if block is not finished
+    after seconds (float). No-op if seconds is None.
+
+    """
+
+    if seconds is None:
+        yield
+        return
+
+    def handler(signum, frame):
+        raise DeadlineExceeded(
+            "total request deadline of {} s exceeded".format(seconds))
+
+    previous = signal.signal(signal.SIGALRM, handler)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+class CircuitBreaker(object):
+
+    def __init__(self, max_failures):
+
+        # 0: breaker disabled
+        self.max_failures = max_failures
+
+        # key -> consecutive failures, their durations
+        self.failures = dict()
+        self.failure_durations = dict()
+
+        self.opened = set()
+
+        # key -> skipped requests, estimated seconds saved
+        self.skipped = dict()
+        self.saved_seconds = dict()
+
+    def is_open(self, key):
+        return key in self.opened
+
+    def record(self, key, success, duration):
+        """Record outcome of request. Return True if breaker opens."""
+
+        if success:
+            self.failures[key] = 0
+            self.failure_durations[key] = []
+            return False
+
+        self.failures[key] = self.failures.get(key, 0) + 1
+        self.failure_durations.setdefault(key, []).append(duration)
+
+        if self.max_failures > 0 and key not in self.opened and \
+            self.failures[key] >= self.max_failures:
+
+            self.opened.add(key)
+            return True
+
+        return False
+
+    def skip(self, key):
+        """Account for request skipped because breaker is open."""
+
+        durations = self.failure_durations.get(key) or [0.0]
+
+        self.skipped[key] = self.skipped.get(key, 0) + 1
+        self.saved_seconds[key] = self.saved_seconds.get(key, 0.0) + \
+            sum(durations) / len(durations)
+
+    def reset(self):
+        """Close all breakers (keeps skip accounting)."""
+
+        self.failures = dict()
+        self.failure_durations = dict()
+        self.opened = set()
+
+    def summary(self):
+        """Return dict key -> (skipped requests, estimated seconds saved)."""
+
+        return dict(
+            (key, (self.skipped[key], self.saved_seconds[key])) \
+                for key in self.skipped)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Downsampling of long time series for plotting: aggregation into time bins
+with percentiles, and shape-preserving min/max decimation. Both are
+vectorized (groups are padded to a 2D array and reduced along rows), so that
+the number of plotted points does not depend on the length of the history.
+Gaps of a series (NaN values, empty bins) are kept as NaN, so that plotted
+lines are interrupted there.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import warnings
+
+import numpy
+
+
+BAND_PERCENTILES = (10, 50, 90)
+
+
+def to_padded_groups(group_idx, values):
+    """
+    Arrange values into rows by (sorted, non-negative) group index. Returns
+    array of unique group indices and 2D array (groups x maximum group size)
+    padded with NaN.
+
+    """
+
+    groups, starts, counts = numpy.unique(
+        group_idx, return_index=True, return_counts=True)
+
+    # position of every value within its group
+    position = numpy.arange(len(values)) - numpy.repeat(starts, counts)
+
+    padded = numpy.full((len(groups), counts.max()), numpy.nan)
+    padded[numpy.repeat(numpy.arange(len(groups)), counts), position] = values
+
+    return groups, padded
+
+
+def bin_percentiles(x, y, bin_width, percentiles=BAND_PERCENTILES):
+    """
+    Aggregate y into bins of x with width bin_width. NaN values of y are
+    ignored. Returns x of bin centers and array (len(percentiles) x bins),
+    from the first to the last bin with values; bins without values are NaN
+    (gaps in the plot).
+
+    """
+
+    x = numpy.asarray(x, dtype=float)
+    y = numpy.asarray(y, dtype=float)
+
+    valid = ~numpy.isnan(y)
+    x = x[valid]
+    y = y[valid]
+
+    if len(y) == 0:
+        return numpy.array([]), numpy.empty((len(percentiles), 0))
+
+    order = numpy.argsort(x, kind='mergesort')
+    x = x[order]
+    y = y[order]
+
+    bins = numpy.floor(x / bin_width).astype(int)
+    groups, padded = to_padded_groups(bins - bins[0], y)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        band_values = numpy.nanpercentile(padded, percentiles, axis=1)
+
+    centers = (numpy.arange(groups[-1] + 1) + bins[0] + 0.5) * bin_width
+
+    band = numpy.full((len(percentiles), len(centers)), numpy.nan)
+    band[:, groups] = band_values
+
+    return centers, band
+
+
+def minmax_decimate(x, y, max_points):
+    """
+    Reduce series to at most max_points by keeping the minimum and maximum
+    of y (in time order) in each of max_points / 3 buckets of equal point
+    count. Peaks and dips are preserved. NaN values of y (outages, missing
+    runs) are kept: a bucket with NaN values keeps its first one, so that 
+    the plotted line has a gap there. Series of at most max_points are 
+    returned unchanged.
+
+    """
+
+    x = numpy.asarray(x, dtype=float)
+    y = numpy.asarray(y, dtype=float)
+
+    if max_points <= 0 or len(y) <= max_points:
+        return x, y
+
+    # minimum, maximum and NaN of every bucket
+    bucket_count = max(1, max_points // 3)
+    buckets = (numpy.arange(len(y)) * bucket_count) // len(y)
+
+    _, padded = to_padded_groups(buckets, y)
+    starts = numpy.searchsorted(buckets, numpy.arange(bucket_count))
+
+    # padding and NaN values are replaced for argmin/argmax
+    idx_min = numpy.argmin(
+        numpy.where(numpy.isnan(padded), numpy.inf, padded), axis=1) + starts
+    idx_max = numpy.argmax(
+        numpy.where(numpy.isnan(padded), -numpy.inf, padded), axis=1) + starts
+
+    # first NaN of every bucket with NaN values
+    idx_nan = numpy.flatnonzero(numpy.isnan(y))
+    _, first = numpy.unique(buckets[idx_nan], return_index=True)
+
+    idx = numpy.unique(numpy.concatenate((idx_min, idx_max, idx_nan[first])))
+
+    return x[idx], y[idx]
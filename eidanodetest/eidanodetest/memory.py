@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Memory instrumentation of the test harness.
+
+Records resident set size (RSS) before and after a block of code, and the
+peak increase of RSS during the block. Where tracemalloc is available 
+(Python 3), peak and retained memory allocated by Python objects are 
+recorded as well.
+
+RSS is read from /proc/self/statm (Linux). The peak RSS of a process 
+(getrusage) cannot be reset, so the peak of a block is the maximum of the 
+RSS samples taken inside it: code that handles data block by block (e.g., 
+reading a response) calls sample() per block. Blocks without samples have no
+peak.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import contextlib
+import io
+import os
+import resource
+import sys
+import threading
+
+import numpy
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+STATM_PATH = '/proc/self/statm'
+
+# getrusage ru_maxrss unit
+if sys.platform == 'darwin':
+    MAXRSS_UNIT_BYTES = 1
+else:
+    MAXRSS_UNIT_BYTES = 1024
+
+# records of the blocks active in the current thread (nested blocks)
+LOCAL = threading.local()
+
+
+def start():
+    """Start tracing Python allocations, if tracemalloc is available."""
+
+    if tracemalloc is not None and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def get_method():
+
+    if tracemalloc is not None and tracemalloc.is_tracing():
+        return 'rss+tracemalloc'
+    else:
+        return 'rss'
+
+
+def get_rss_bytes():
+    """Return current RSS of process, None if not available."""
+
+    try:
+        with open(STATM_PATH, 'r') as fh:
+            pages = int(fh.read().split()[1])
+
+    except (IOError, OSError, IndexError, ValueError):
+        return None
+
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def get_peak_rss_bytes():
+    return resource.getrusage(
+        resource.RUSAGE_SELF).ru_maxrss * MAXRSS_UNIT_BYTES
+
+
+def sample():
+    """
+    Sample RSS for the peak of the blocks recorded in the current thread
+    (see record). No-op outside recorded blocks.
+
+    """
+
+    active = getattr(LOCAL, 'active', None)
+
+    if not active:
+        return
+
+    rss = get_rss_bytes()
+
+    if rss is None:
+        return
+
+    for state in active:
+        state['peak'] = max(state['peak'], rss)
+
+
+class SamplingBytesIO(io.BytesIO):
+    """In-memory file that samples RSS (see sample) on every write."""
+
+    def write(self, data):
+
+        length_bytes = io.BytesIO.write(self, data)
+        sample()
+
+        return length_bytes
+
+
+@contextlib.contextmanager
+def record(target):
+    """
+    Record memory use of block into dict target: rss (after block),
+    retained (RSS after - before), peak_increase (maximum of RSS samples 
+    taken in the block - RSS before, None without samples), and with 
+    tracemalloc traced_peak and traced_retained. No-op if target is None.
+
+    """
+
+    if target is None:
+        yield target
+        return
+
+    tracing = tracemalloc is not None and tracemalloc.is_tracing()
+
+    if tracing:
+        traced_before = tracemalloc.get_traced_memory()[0]
+
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+
+    rss_before = get_rss_bytes()
+
+    state = dict(peak=None)
+
+    if not hasattr(LOCAL, 'active'):
+        LOCAL.active = []
+
+    LOCAL.active.append(state)
+
+    try:
+        yield target
+
+    finally:
+        LOCAL.active.remove(state)
+
+        rss_after = get_rss_bytes()
+
+        target['rss'] = rss_after
+
+        if state['peak'] is not None and rss_before is not None:
+            target['peak_increase'] = max(
+                state['peak'], rss_after) - rss_before
+        else:
+            target['peak_increase'] = None
+
+        if rss_before is not None and rss_after is not None:
+            target['retained'] = rss_after - rss_before
+        else:
+            target['retained'] = None
+
+        if tracing:
+            traced, traced_peak = tracemalloc.get_traced_memory()
+            target['traced_retained'] = traced - traced_before
+            target['traced_peak'] = traced_peak
+
+
+def summarize(records):
+    """
+    Return summary of memory records: count, maximum RSS, maximum peak
+    increase, median/max/sum of retained memory (and of traced memory).
+
+    """
+
+    summary = dict(count=len(records))
+
+    for key in ('rss', 'peak_increase', 'traced_peak'):
+        values = [x[key] for x in records if x.get(key) is not None]
+
+        if values:
+            summary["{}_max".format(key)] = max(values)
+
+    for key in ('retained', 'traced_retained'):
+        values = [x[key] for x in records if x.get(key) is not None]
+
+        if values:
+            summary["{}_median".format(key)] = float(numpy.median(values))
+            summary["{}_max".format(key)] = max(values)
+            summary["{}_sum".format(key)] = sum(values)
+
+    return summary
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Statistics of result cells and merging of result dicts of several runs.
+
+A result cell is the dict of one node, response size, protocol, service and
+method, with the raw samples of successful requests and the records of all
+request attempts (see ATTEMPT_OUTCOMES) in 'data', summary statistics in
+'stats' and quantile sketches in 'sketch'. Cells present in only one of the merged
+results are copied. For cells present in several results, the merge policy
+decides:
+
+    newest          keep the cell of the newest result
+    concatenate     concatenate samples and merge sketches, stats are
+                    removed (they do not describe the merged samples)
+    recompute       concatenate samples, then recompute stats and sketches
+                    from all samples
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import numpy
+
+from eidanodetest import sketch
+from eidanodetest import streaming
+from eidanodetest import tcpinfo
+from eidanodetest import utils
+
+
+MERGE_POLICIES = ('newest', 'concatenate', 'recompute')
+
+# sample lists with summary statistics
+STATS_METRICS = ('time', 'throughput', 'latency', 'count')
+
+SKETCH_METRICS = ('throughput', 'latency', 'time')
+
+# outcome of a request attempt: successful, no connection, timeout before
+# response headers, non-OK HTTP status, error while receiving response,
+# total deadline exceeded, other error (ArcLink)
+ATTEMPT_OUTCOMES = (
+    'ok', 'connection', 'timeout', 'status', 'incomplete', 'deadline', 
+    'error')
+
+# service level entries besides methods
+SERVICE_KEYS = ('params', 'length')
+
+
+def compute_cell_stats(data):
+    """
+    Return stats dict (median, min, max) of samples in data dict, with
+    success ratio and failure times if attempts are recorded. None if there
+    are neither throughput samples nor attempts.
+
+    """
+
+    if not data.get('throughput') and not data.get('attempts'):
+        return None
+
+    stats = dict()
+
+    for metric in STATS_METRICS:
+        if data.get(metric):
+            stats[metric] = dict(
+                median=numpy.median(data[metric]), min=min(data[metric]),
+                max=max(data[metric]))
+
+    if data.get('attempts'):
+        stats.update(compute_attempt_stats(data['attempts']))
+
+    return stats
+
+
+def compute_attempt_stats(attempts):
+    """
+    Return stats of request attempts: number of attempts per outcome,
+    success ratio, elapsed time of failed attempts, effective throughput 
+    (Mbits / s of successful responses over the time spent on all attempts,
+    failures counted in), median and maximum of host name resolution time,
+    and medians of transfer time series metrics and of TCP_INFO fields.
+
+    """
+
+    outcomes = dict()
+    for attempt in attempts:
+        outcomes[attempt['outcome']] = outcomes.get(attempt['outcome'], 0) + 1
+
+    succeeded = [x for x in attempts if x['outcome'] == 'ok']
+    failure_times = [x['elapsed'] for x in attempts if x['outcome'] != 'ok']
+    total_time = sum(x['elapsed'] for x in attempts)
+
+    stats = dict(
+        attempts=dict(
+            count=len(attempts), failed=len(failure_times), 
+            success_ratio=float(len(succeeded)) / len(attempts),
+            outcomes=outcomes))
+
+    if failure_times:
+        stats['failure_time'] = dict(
+            median=numpy.median(failure_times), min=min(failure_times),
+            max=max(failure_times), sum=sum(failure_times))
+
+    if total_time > 0:
+        stats['effective_throughput'] = 8 * sum(
+            x['bytes'] for x in succeeded) / (total_time * 1000 * 1000)
+
+    dns_times = [
+        x['dns']['time'] for x in attempts if x.get('dns', {}).get('lookups')]
+
+    if dns_times:
+        stats['dns'] = dict(
+            median=numpy.median(dns_times), max=max(dns_times))
+
+    transfers = [x['transfer'] for x in attempts if 'transfer' in x]
+
+    if transfers:
+        stats['transfer'] = dict(
+            (metric, numpy.median([x[metric] for x in transfers])) \
+                for metric in streaming.TRANSFER_METRICS)
+
+    tcp_infos = [x['tcp_info'] for x in attempts if x.get('tcp_info')]
+
+    for field in tcpinfo.TCP_INFO_STATS:
+
+        values = [x[field] for x in tcp_infos if x.get(field) is not None]
+
+        if values:
+            stats.setdefault('tcp', dict())[field] = numpy.median(values)
+
+    return stats
+
+
+def compute_cell_sketches(data):
+    """Return dict of serialized quantile sketches of samples in data."""
+
+    return dict(
+        (metric, sketch.from_samples(data[metric]).to_dict()) \
+            for metric in SKETCH_METRICS if data.get(metric))
+
+
+def merge_result(merged, result, policy):
+    """
+    Merge result dict into merged (in place). Results have to be merged in
+    ascending time order, so that the last one is the newest.
+
+    """
+
+    if policy not in MERGE_POLICIES:
+        raise ValueError("unknown merge policy {}".format(policy))
+
+    # run info: newest wins
+    if utils.RUN_INFO_KEY in result:
+        merged[utils.RUN_INFO_KEY] = result[utils.RUN_INFO_KEY]
+
+    for node, node_res in utils.iter_node_results(result):
+
+        merged_node = merged.setdefault(node, dict(result=dict()))
+
+        # node level entries besides results: newest wins
+        for key, value in node_res.items():
+            if key != 'result':
+                merged_node[key] = value
+
+    for node, size, protocol, service, method, service_res, method_res in \
+        utils.iter_result_cells(result):
+
+        merged_service = merged[node]['result'].setdefault(
+            size, dict()).setdefault(protocol, dict()).setdefault(
+                service, dict())
+
+        for key in SERVICE_KEYS:
+            if key in service_res:
+                merged_service[key] = service_res[key]
+
+        if method:
+            merged_cell = merged_service.get(method)
+        elif 'data' in merged_service:
+            merged_cell = merged_service
+        else:
+            merged_cell = None
+
+        if merged_cell is None or policy == 'newest':
+            set_cell(merged_service, method, method_res)
+        else:
+            concatenate_cell(merged_cell, method_res)
+
+
+def set_cell(merged_service, method, method_res):
+
+    # ArcLink has no methods, cell is the service dict
+    if method:
+        merged_service[method] = method_res
+    else:
+        for key in ('data', 'stats', 'sketch'):
+            merged_service.pop(key, None)
+
+        merged_service.update(method_res)
+
+
+def concatenate_cell(merged_cell, cell):
+
+    sketches = dict()
+
+    for metric in SKETCH_METRICS:
+
+        merged_sketch = get_cell_sketch(merged_cell, metric)
+        cell_sketch = get_cell_sketch(cell, metric)
+
+        if merged_sketch is None:
+            merged_sketch = cell_sketch
+        elif cell_sketch is not None:
+            merged_sketch.merge(cell_sketch)
+
+        if merged_sketch is not None:
+            sketches[metric] = merged_sketch.to_dict()
+
+    for key, values in cell.get('data', {}).items():
+        merged_cell.setdefault('data', dict()).setdefault(
+            key, []).extend(values)
+
+    merged_cell['sketch'] = sketches
+    merged_cell.pop('stats', None)
+
+
+def get_cell_sketch(cell, metric):
+    """
+    Return quantile sketch of metric in cell, built from samples for old
+    results without sketches. None if there are no samples.
+
+    """
+
+    if metric in cell.get('sketch', {}):
+        return sketch.QuantileSketch.from_dict(cell['sketch'][metric])
+
+    elif cell.get('data', {}).get(metric):
+        return sketch.from_samples(cell['data'][metric])
+
+    else:
+        return None
+
+
+def finalize_result(merged, policy):
+    """Recompute stats and sketches of merged cells (policy recompute)."""
+
+    if policy != 'recompute':
+        return
+
+    for _, _, _, _, _, _, method_res in utils.iter_result_cells(merged):
+
+        # summary without raw samples: keep stats and sketches
+        if 'data' not in method_res:
+            continue
+
+        stats = compute_cell_stats(method_res['data'])
+
+        if stats is None:
+            method_res.pop('stats', None)
+        else:
+            method_res['stats'] = stats
+
+        method_res['sketch'] = compute_cell_sketches(method_res['data'])
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Per-node locks of test runs.
+
+Several instances of the single node test may run on one host at the same
+time, as long as they test disjoint nodes (e.g., slow non-EIDA nodes in one
+instance, EIDA nodes in another). An instance holds an exclusive lock per
+node it tests, and one for the federator, which all nodes share, for its
+whole run. Locks are acquired in sorted order, so that instances with
+overlapping nodes queue up instead of deadlocking.
+
+An instance that finds a node locked fails at once, or waits in the queue of
+the lock (blocking flock) up to a given time, e.g. a cron run that overlaps
+a long previous run.
+
+Locks are advisory (fcntl.flock) and released by the operating system when
+the process ends, also if it crashes, so stale lock files are harmless and
+are not removed. While a lock is held, its file contains the process ID of
+the holder; it is emptied on release. Holders are reported from these 
+process IDs (of running processes), without taking the locks, so that 
+reporting cannot make a concurrent acquire fail.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import errno
+import fcntl
+import os
+import re
+import tempfile
+
+from eidanodetest import deadlines
+
+
+LOCK_FILE_PREFIX = 'eida_test_single_node_request'
+
+FEDERATOR_LOCK = 'federator'
+
+
+class LockUnavailable(Exception):
+    pass
+
+
+class NodeLocks(object):
+    """Exclusive locks of names (nodes, federator), one lock file each."""
+
+    def __init__(self, names, path=None, prefix=LOCK_FILE_PREFIX):
+
+        self.names = sorted(set(names))
+        self.path = path or tempfile.gettempdir()
+        self.prefix = prefix
+
+        # name -> open lock file
+        self.held = dict()
+
+    def get_lockfile(self, name):
+
+        return os.path.join(self.path, "{}.{}.lock".format(
+            self.prefix, re.sub(r'[^\w.-]', '_', name)))
+
+    def get_holder(self, name):
+        """Return process ID in lock file of name, None if unknown."""
+
+        try:
+            with open(self.get_lockfile(name), 'r') as fh:
+                pid = fh.read().strip()
+
+        except (IOError, OSError):
+            return None
+
+        return int(pid) if pid.isdigit() else None
+
+    def acquire(self, wait=0.0):
+        """
+        Acquire locks of all names in sorted order. Wait up to wait seconds
+        in total for locks held by other processes (0: fail at once, None:
+        no limit). If a lock cannot be acquired, release the ones acquired
+        and raise LockUnavailable.
+
+        """
+
+        try:
+            if wait == 0:
+                for name in self.names:
+                    self.acquire_one(name, blocking=False)
+
+            else:
+                with deadlines.alarm(wait):
+                    for name in self.names:
+                        self.acquire_one(name, blocking=True)
+
+        except deadlines.DeadlineExceeded:
+            self.release()
+            raise LockUnavailable(
+                "locks not acquired within {} seconds: {}".format(
+                    wait, self.format_holders()))
+
+        except BaseException:
+            self.release()
+            raise
+
+    def acquire_one(self, name, blocking):
+
+        fh = open(self.get_lockfile(name), 'a+')
+
+        try:
+            if blocking:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            else:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+        except (IOError, OSError), e:
+            fh.close()
+
+            if e.errno in (errno.EAGAIN, errno.EACCES):
+                raise LockUnavailable("{} is locked by process {}".format(
+                    name, self.get_holder(name)))
+
+            raise
+
+        except BaseException:
+            fh.close()
+            raise
+
+        fh.seek(0)
+        fh.truncate()
+        fh.write(str(os.getpid()))
+        fh.flush()
+
+        self.held[name] = fh
+
+    def get_locked(self):
+        """
+        Return names whose locks are held by other processes: the lock file
+        contains the ID of another running process. No lock is taken, the
+        result may be outdated once returned.
+
+        """
+
+        locked = []
+
+        for name in self.names:
+
+            if name in self.held:
+                continue
+
+            pid = self.get_holder(name)
+
+            if pid is not None and pid != os.getpid() and is_running(pid):
+                locked.append(name)
+
+        return locked
+
+    def format_holders(self):
+
+        return ", ".join(
+            "{} (process {})".format(name, self.get_holder(name)) \
+                for name in self.get_locked()) or "none"
+
+    def release(self):
+
+        for fh in self.held.values():
+
+            try:
+                # no holder while still locked
+                fh.seek(0)
+                fh.truncate()
+
+                fcntl.flock(fh, fcntl.LOCK_UN)
+            finally:
+                fh.close()
+
+        self.held.clear()
+
+
+def is_running(pid):
+    """Return whether a process with ID pid exists."""
+
+    try:
+        os.kill(pid, 0)
+
+    except OSError, e:
+
+        # exists, owned by another user
+        return e.errno == errno.EPERM
+
+    return True
+
+
+def get_lock_names(nodes, federator=False):
+    """Return names of locks of nodes, and of the federator if requested."""
+
+    names = list(nodes)
+
+    if federator:
+        names.append(FEDERATOR_LOCK)
+
+    return names
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Open-loop load at a constant arrival rate.
+
+In a closed loop, the next request is only sent after the previous one is
+complete, so a slow node slows down the load generator and its queueing
+delay never shows (coordinated omission). In the open loop, requests are
+scheduled at a target rate, with Poisson (exponential inter-arrival times)
+or fixed arrivals, and sent by a pool of worker threads regardless of the
+completion of earlier requests. Latency and request time are measured from
+the scheduled send time, so time spent waiting for a free worker (queue)
+is counted in. Failed requests have no latency; they are counted in at the
+time they failed (censored), otherwise an overloaded node whose slowest
+requests time out would appear faster (survivorship bias).
+
+A load step is a run at one offered rate. The knee of a series of steps is
+the lowest rate at which the 90th percentile of latency exceeds KNEE_FACTOR
+times that of the lowest rate, or more than KNEE_FAILURE_FRACTION of the
+requests fail (fast failures, e.g. refused connections, lower the censored
+latencies).
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import random
+import time
+
+from multiprocessing.pool import ThreadPool
+
+import numpy
+
+
+ARRIVAL_PROCESSES = ('poisson', 'fixed')
+
+LOAD_PERCENTILES = (50, 90, 99)
+
+KNEE_FACTOR = 2.0
+KNEE_FAILURE_FRACTION = 0.1
+
+
+def make_arrivals(rate, duration, process='poisson', rng=None):
+    """
+    Return send times (seconds after start) of requests at rate (per
+    second) during duration (seconds).
+
+    """
+
+    if rate <= 0:
+        raise ValueError("request rate must be positive")
+
+    if process not in ARRIVAL_PROCESSES:
+        raise ValueError("unknown arrival process {}".format(process))
+
+    if process == 'fixed':
+        return [x / float(rate) for x in xrange(int(duration * rate))]
+
+    rng = rng or random.Random()
+
+    arrivals = []
+    t = rng.expovariate(rate)
+
+    while t < duration:
+        arrivals.append(t)
+        t += rng.expovariate(rate)
+
+    return arrivals
+
+
+def run_schedule(schedule, job, workers):
+    """
+    Call job(t_scheduled, *args) at t_scheduled = start + offset for every
+    (offset, args) of schedule (ascending offsets) in a pool of workers,
+    without waiting for earlier calls. Return list of (t_scheduled, return
+    value of job) in order of schedule.
+
+    """
+
+    pool = ThreadPool(workers)
+    pending = []
+
+    try:
+        t_start = time.time()
+
+        for offset, args in schedule:
+
+            t_scheduled = t_start + offset
+            delay = t_scheduled - time.time()
+
+            if delay > 0:
+                time.sleep(delay)
+
+            pending.append((
+                t_scheduled, pool.apply_async(job, (t_scheduled,) + args)))
+
+        pool.close()
+        pool.join()
+
+    finally:
+        pool.terminate()
+
+    return [(t_scheduled, x.get()) for t_scheduled, x in pending]
+
+
+def make_record(t_scheduled, attempt, latency=None):
+    """
+    Return load record of request from its attempt record (see
+    make_attempt of the driver): queue (send time after scheduled time),
+    latency (response headers after scheduled time; without latency, e.g.
+    failed requests, end of request after scheduled time, censored), time
+    (end of request after scheduled time), ok, censored.
+
+    """
+
+    queue = attempt['start'] - t_scheduled
+
+    censored = latency is None
+
+    if censored:
+        latency = attempt['elapsed']
+
+    return dict(
+        queue=queue, latency=queue + latency,
+        time=queue + attempt['elapsed'], ok=attempt['outcome'] == 'ok',
+        censored=censored)
+
+
+def summarize_step(records, rate, duration, percentiles=LOAD_PERCENTILES):
+    """
+    Return summary of load step: offered rate, number of requests, failed
+    requests, achieved rate (successful requests per second of step
+    duration), and percentiles of queue, latency (censored latencies of
+    failed requests included) and time (seconds).
+
+    """
+
+    succeeded = [x for x in records if x['ok']]
+
+    summary = dict(
+        rate=rate, requests=len(records),
+        failed=len(records) - len(succeeded),
+        achieved=len(succeeded) / float(duration), percentiles=percentiles)
+
+    for metric in ('queue', 'latency', 'time'):
+
+        values = [x[metric] for x in records if x[metric] is not None]
+
+        if values:
+            summary[metric] = [
+                float(x) for x in numpy.percentile(values, percentiles)]
+
+    return summary
+
+
+def find_knee(
+    steps, factor=KNEE_FACTOR, failure_fraction=KNEE_FAILURE_FRACTION):
+    """
+    Return lowest rate of steps (see summarize_step, ascending rates) whose
+    90th percentile of latency exceeds factor times that of the lowest
+    rate, or with more than failure_fraction of its requests failed. None
+    if there is none. Steps without requests are skipped.
+
+    """
+
+    baseline = None
+
+    for step in steps:
+
+        if not step['requests']:
+            continue
+
+        if step['failed'] > failure_fraction * step['requests']:
+            return step['rate']
+
+        p90 = step['latency'][list(step['percentiles']).index(90)]
+
+        if baseline is None:
+            baseline = p90
+
+        elif p90 > factor * baseline:
+            return step['rate']
+
+    return None
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Pre-flight reachability probe of web service and ArcLink endpoints.
+
+All endpoints are probed concurrently (thread pool) with a short timeout:
+HTTP endpoints with a GET request of a small document (e.g., fdsnws version),
+ArcLink servers with a TCP connect. The round trip time (time to response
+headers, or to established connection) serves as baseline RTT.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import socket
+import time
+
+from multiprocessing.pool import ThreadPool
+
+import requests
+
+
+PROBE_TIMEOUT = 5.0
+PROBE_WORKERS = 16
+
+FDSNWS_VERSION_PATH = 'fdsnws/dataselect/1/version'
+
+
+def probe_http(url, timeout=PROBE_TIMEOUT):
+    """Return probe result dict of HTTP GET request of url."""
+
+    t_start = time.time()
+
+    try:
+        response = requests.get(url, timeout=timeout)
+
+    except requests.exceptions.RequestException, e:
+        return make_probe_result(
+            'http', url, False, t_start, error=e.__class__.__name__)
+
+    response.close()
+
+    return make_probe_result(
+        'http', url, response.ok, t_start,
+        rtt=response.elapsed.total_seconds(), status=response.status_code)
+
+
+def probe_tcp(host, port, timeout=PROBE_TIMEOUT):
+    """Return probe result dict of TCP connect to host and port."""
+
+    target = "{}:{}".format(host, port)
+    t_start = time.time()
+
+    try:
+        sock = socket.create_connection((host, port), timeout)
+
+    except (socket.error, socket.timeout), e:
+        return make_probe_result(
+            'tcp', target, False, t_start, error=e.__class__.__name__)
+
+    rtt = time.time() - t_start
+    sock.close()
+
+    return make_probe_result('tcp', target, True, t_start, rtt=rtt)
+
+
+def make_probe_result(
+    kind, target, reachable, t_start, rtt=None, status=None, error=None):
+
+    return dict(
+        kind=kind, target=target, reachable=reachable, start=t_start,
+        rtt=rtt, status=status, error=error)
+
+
+def probe_all(targets, timeout=PROBE_TIMEOUT, workers=PROBE_WORKERS):
+    """
+    Probe targets concurrently. targets is a dict key -> ('http', url) or
+    ('tcp', (host, port)). Return dict key -> probe result.
+
+    """
+
+    if not targets:
+        return dict()
+
+    keys = sorted(targets)
+
+    pool = ThreadPool(min(workers, len(keys)))
+
+    try:
+        results = pool.map(
+            lambda key: run_probe(targets[key], timeout), keys)
+    finally:
+        pool.close()
+        pool.join()
+
+    return dict(zip(keys, results))
+
+
+def run_probe(target, timeout):
+
+    kind, address = target
+
+    if kind == 'http':
+        return probe_http(address, timeout)
+
+    elif kind == 'tcp':
+        return probe_tcp(address[0], address[1], timeout)
+
+    else:
+        raise ValueError("unknown probe kind {}".format(kind))
+
+
+def get_fdsnws_version_url(server):
+    return "{}/{}".format(server.rstrip('/'), FDSNWS_VERSION_PATH)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Profiling hooks for the command line tools.
+
+Named phases of a tool (e.g., planning, measurement, statistics,
+serialization, loading, rendering) are wrapped with lightweight wall clock
+and CPU timers, so that the dominating phase can be seen without a
+profiler. Optionally, the whole run is profiled with cProfile and the
+statistics are written to a pstats file (read with pstats, snakeviz,
+gprof2dot, ...).
+
+Phases may be nested and entered several times; times are inclusive, i.e.
+the time of a nested phase is also counted in the enclosing phase.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import contextlib
+import cProfile
+import time
+
+
+PHASE_SUMMARY_HEADER = "{:<16} {:>8} {:>12} {:>12} {:>7}".format(
+    'phase', 'count', 'wall (s)', 'cpu (s)', 'wall %')
+
+
+class PhaseTimer(object):
+    """Accumulates wall clock and CPU time of named phases."""
+
+    def __init__(self):
+
+        self.t_start = time.time()
+
+        # phase name -> dict(count, wall, cpu), names in order of first entry
+        self.phases = dict()
+        self.order = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+
+        wall_start = time.time()
+        cpu_start = time.clock()
+
+        try:
+            yield
+
+        finally:
+            if name not in self.phases:
+                self.phases[name] = dict(count=0, wall=0.0, cpu=0.0)
+                self.order.append(name)
+
+            self.phases[name]['count'] += 1
+            self.phases[name]['wall'] += time.time() - wall_start
+            self.phases[name]['cpu'] += time.clock() - cpu_start
+
+    def summary(self):
+        """
+        Return dict phase name -> dict(count, wall, cpu, fraction), fraction
+        is wall time of phase relative to time since start of timer.
+
+        """
+
+        total = max(time.time() - self.t_start, 1e-9)
+
+        summary = dict()
+
+        for name, timing in self.phases.items():
+            summary[name] = dict(timing, fraction=timing['wall'] / total)
+
+        return summary
+
+    def format_summary(self):
+        """Return summary as lines of text table."""
+
+        summary = self.summary()
+        lines = [PHASE_SUMMARY_HEADER]
+
+        for name in self.order:
+            lines.append("{:<16} {:>8} {:>12.3f} {:>12.3f} {:>7.1f}".format(
+                name, summary[name]['count'], summary[name]['wall'],
+                summary[name]['cpu'], 100.0 * summary[name]['fraction']))
+
+        return lines
+
+
+# process-wide timer, used by phase()
+TIMER = PhaseTimer()
+
+
+def phase(name):
+    """Context manager: time block as phase name with the global timer."""
+    return TIMER.phase(name)
+
+
+@contextlib.contextmanager
+def profile(outpath):
+    """
+    Profile block with cProfile, write statistics to pstats file outpath
+    (also if block raises). No-op if outpath is empty.
+
+    """
+
+    if not outpath:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    try:
+        yield
+
+    finally:
+        profiler.disable()
+        profiler.dump_stats(outpath)
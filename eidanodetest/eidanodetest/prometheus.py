@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Prometheus textfile export of node performance results.
+
+Writes a file in the Prometheus text exposition format that can be picked up
+by the node_exporter textfile collector. The file is replaced atomically,
+so that the collector never reads a partially written file.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import time
+
+import numpy
+
+from eidanodetest import merging
+from eidanodetest import utils
+
+
+METRIC_PREFIX = 'eidanodetest'
+
+SUMMARY_QUANTILES = (0.1, 0.5, 0.9)
+
+# result data key, metric name, help text
+SUMMARY_METRICS = (
+    ('throughput', 'throughput_mbits', 'Network throughput (Mbits / s)'),
+    ('latency', 'latency_seconds', 'Latency (time to response headers)'),
+    ('time', 'request_time_seconds', 'Total request time'))
+
+LABEL_NAMES = ('node', 'size', 'protocol', 'service', 'method')
+
+
+def write_textfile(path, result, timestamp=None):
+    """
+    Write Prometheus textfile for result dict of the node test driver.
+    Failed requests are counted from the request attempt records.
+
+    """
+
+    if timestamp is None:
+        timestamp = time.time()
+
+    lines = []
+    cells = sorted(
+        (get_labels(*cell[:5]), cell[6]['data']) \
+            for cell in utils.iter_result_cells(result))
+
+    for data_key, name, help_text in SUMMARY_METRICS:
+
+        metric = "{}_{}".format(METRIC_PREFIX, name)
+        lines.append("# HELP {} {}".format(metric, help_text))
+        lines.append("# TYPE {} summary".format(metric))
+
+        for labels, data in cells:
+
+            samples = data.get(data_key)
+            if not samples:
+                continue
+
+            quantiles = numpy.percentile(
+                samples, [100.0 * q for q in SUMMARY_QUANTILES])
+
+            for q, value in zip(SUMMARY_QUANTILES, quantiles):
+                lines.append(format_sample(
+                    metric, labels + (('quantile', str(q)),), value))
+
+            lines.append(format_sample(
+                "{}_sum".format(metric), labels, sum(samples)))
+            lines.append(format_sample(
+                "{}_count".format(metric), labels, len(samples)))
+
+    metric = "{}_response_bytes".format(METRIC_PREFIX)
+    lines.append("# HELP {} Size of last response".format(metric))
+    lines.append("# TYPE {} gauge".format(metric))
+
+    for labels, data in cells:
+        if data.get('length'):
+            lines.append(format_sample(metric, labels, data['length'][-1]))
+
+    metric = "{}_last_throughput_mbits".format(METRIC_PREFIX)
+    lines.append("# HELP {} Throughput of last request".format(metric))
+    lines.append("# TYPE {} gauge".format(metric))
+
+    for labels, data in cells:
+        if data.get('throughput'):
+            lines.append(
+                format_sample(metric, labels, data['throughput'][-1]))
+
+    attempt_stats = [
+        (labels, merging.compute_attempt_stats(data['attempts'])) \
+            for labels, data in cells if data.get('attempts')]
+
+    metric = "{}_failed_requests".format(METRIC_PREFIX)
+    lines.append("# HELP {} Number of failed requests".format(metric))
+    lines.append("# TYPE {} gauge".format(metric))
+
+    for labels, stats in attempt_stats:
+        lines.append(
+            format_sample(metric, labels, stats['attempts']['failed']))
+
+    metric = "{}_success_ratio".format(METRIC_PREFIX)
+    lines.append("# HELP {} Ratio of successful requests".format(metric))
+    lines.append("# TYPE {} gauge".format(metric))
+
+    for labels, stats in attempt_stats:
+        lines.append(format_sample(
+            metric, labels, stats['attempts']['success_ratio']))
+
+    metric = "{}_effective_throughput_mbits".format(METRIC_PREFIX)
+    lines.append(
+        "# HELP {} Throughput with time of failed requests counted "\
+        "in".format(metric))
+    lines.append("# TYPE {} gauge".format(metric))
+
+    for labels, stats in attempt_stats:
+        if 'effective_throughput' in stats:
+            lines.append(format_sample(
+                metric, labels, stats['effective_throughput']))
+
+    metric = "{}_last_update_timestamp_seconds".format(METRIC_PREFIX)
+    lines.append("# HELP {} Time of last update".format(metric))
+    lines.append("# TYPE {} gauge".format(metric))
+    lines.append(format_sample(metric, (), timestamp))
+
+    utils.write_atomic(path, "\n".join(lines) + "\n")
+
+
+def get_labels(node, size, protocol, service, method):
+
+    # ArcLink has no methods
+    if not method:
+        method = protocol
+
+    return tuple(zip(LABEL_NAMES, (node, size, protocol, service, method)))
+
+
+def format_sample(metric, labels, value):
+
+    if labels:
+        label_str = ",".join(
+            '{}="{}"'.format(k, escape_label_value(v)) for k, v in labels)
+        return "{}{{{}}} {}".format(metric, label_str, format_value(value))
+    else:
+        return "{} {}".format(metric, format_value(value))
+
+
+def format_value(value):
+
+    if numpy.isnan(value):
+        return 'NaN'
+
+    return repr(float(value))
+
+
+def escape_label_value(value):
+    return "{}".format(value).replace('\\', '\\\\').replace(
+        '"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Rolling baselines and regression detection for node performance time series.
+
+A time series is the sequence of per-run medians (e.g., throughput of
+dataselect GET for 'large' requests to one node), one point per result file.
+For every point, the baseline is the median and the scaled median absolute
+deviation (MAD) of the preceding points in a window, and an exponentially
+weighted moving average (EWMA) follows the series. All computations are
+vectorized over the whole series.
+
+Two kinds of events are flagged:
+
+    degradation     robust z-score of the point against the baseline is worse
+                    than the threshold for a number of consecutive points
+    levelshift      EWMA departs from the baseline median by more than a
+                    relative threshold, and the departure is significant
+                    given the baseline MAD and the effective EWMA sample size
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import math
+import warnings
+
+import numpy
+from numpy.lib.stride_tricks import as_strided
+
+
+# scale MAD to standard deviation for normally distributed data
+MAD_SCALE = 1.4826
+
+# lower bound of MAD, relative to median (constant baseline)
+MAD_FLOOR_FRACTION = 0.01
+
+# largest dynamic range of EWMA weights within one block
+EWMA_BLOCK_WEIGHT_RANGE = 1e30
+
+# points per series kept in the state of incremental runs, in windows 
+# (baselines of the last kept points are complete)
+STATE_TAIL_WINDOWS = 2
+
+DEFAULT_PARAMS = {
+    'window': 30,
+    'min_periods': 10,
+    'threshold': 3.5,
+    'persist': 3,
+    'alpha': 0.2,
+    'shift': 0.2
+}
+
+
+def rolling_median_mad(values, window, min_periods):
+    """
+    Return arrays of median and scaled MAD of the preceding window points for
+    every point of values. NaN where less than min_periods points precede.
+
+    """
+
+    n = len(values)
+
+    padded = numpy.concatenate((numpy.full(window, numpy.nan), values))
+    stride = padded.strides[0]
+
+    # row i is values[i-window:i]
+    windows = as_strided(padded, shape=(n, window), strides=(stride, stride))
+
+    with warnings.catch_warnings():
+
+        # all-NaN windows at the beginning
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+        median = numpy.nanmedian(windows, axis=1)
+        mad = MAD_SCALE * numpy.nanmedian(
+            numpy.abs(windows - median[:, numpy.newaxis]), axis=1)
+
+    count = numpy.sum(~numpy.isnan(windows), axis=1)
+
+    median[count < min_periods] = numpy.nan
+    mad[count < min_periods] = numpy.nan
+
+    return median, numpy.maximum(mad, MAD_FLOOR_FRACTION * numpy.abs(median))
+
+
+def ewma(values, alpha, initial=None):
+    """
+    Exponentially weighted moving average, vectorized in blocks (closed form
+    with cumulative sum, block length limited for numerical range). If
+    initial is given, it is the EWMA value before the first point.
+
+    """
+
+    values = numpy.asarray(values, dtype=float)
+    out = numpy.empty(len(values))
+
+    if not 0.0 < alpha <= 1.0:
+        raise ValueError("EWMA alpha must be in (0, 1]")
+
+    if len(values) == 0 or alpha == 1.0:
+        out[:] = values
+        return out
+
+    start = 0
+    if initial is None:
+        out[0] = previous = values[0]
+        start = 1
+    else:
+        previous = initial
+
+    w = 1.0 - alpha
+    block = max(1, int(math.log(EWMA_BLOCK_WEIGHT_RANGE) / -math.log(w)))
+
+    for block_start in range(start, len(values), block):
+
+        x = values[block_start:block_start + block]
+        powers = w ** numpy.arange(len(x))
+
+        # ewma_j = w^(j+1) * previous + alpha * sum_i<=j w^(j-i) * x_i
+        out[block_start:block_start + len(x)] = \
+            w * powers * previous + alpha * powers * numpy.cumsum(x / powers)
+
+        previous = out[block_start + len(x) - 1]
+
+    return out
+
+
+def run_lengths(flags):
+    """Number of consecutive True values ending at each index."""
+
+    idx = numpy.arange(len(flags))
+    last_false = numpy.maximum.accumulate(numpy.where(flags, -1, idx))
+
+    return idx - last_false
+
+
+def analyse_series(values, params, higher_is_worse, ewma_initial=None):
+    """
+    Compute baselines and flags for a series. Returns dict of arrays
+    (median, mad, zscore, ewma, relative_change, degradation, levelshift).
+    zscore and relative_change are positive if the value is worse than the
+    baseline.
+
+    """
+
+    values = numpy.asarray(values, dtype=float)
+
+    if higher_is_worse:
+        sign = 1.0
+    else:
+        sign = -1.0
+
+    median, mad = rolling_median_mad(
+        values, params['window'], params['min_periods'])
+
+    smoothed = ewma(values, params['alpha'], ewma_initial)
+    ewma_n = (2.0 - params['alpha']) / params['alpha']
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+
+        zscore = sign * (values - median) / mad
+        relative_change = sign * (smoothed - median) / numpy.abs(median)
+        zscore_ewma = sign * (smoothed - median) / (mad / math.sqrt(ewma_n))
+
+        worse = numpy.nan_to_num(zscore) >= params['threshold']
+
+        shifted = (numpy.nan_to_num(relative_change) >= params['shift']) & \
+            (numpy.nan_to_num(zscore_ewma) >= params['threshold'])
+
+    # flag once when run of degraded points reaches persist
+    degradation = run_lengths(worse) == params['persist']
+
+    # flag onset of level shift
+    levelshift = shifted & ~numpy.concatenate(([False], shifted[:-1]))
+
+    return dict(
+        median=median, mad=mad, zscore=zscore, ewma=smoothed,
+        relative_change=relative_change, degradation=degradation,
+        levelshift=levelshift)
+
+
+def new_tail():
+    """Return empty tail of a series."""
+    return dict(timestamps=[], values=[], ewma_before_tail=None)
+
+
+def analyse_tail(tail, timestamps, values, params, higher_is_worse):
+    """
+    Analyse the tail of a series (see new_tail) extended by the points of a
+    new run (time stamps, values), see analyse_series. Returns tuple
+    (series, result, next tail): series is a dict of the extended time 
+    stamps and values, and the index of the first new point (first_new). 
+    The next tail keeps the last STATE_TAIL_WINDOWS windows of points and 
+    the EWMA before them, so that analysing a series in several runs flags
+    the same points as analysing it at once.
+
+    """
+
+    series = dict(
+        timestamps=tail['timestamps'] + list(timestamps), 
+        values=tail['values'] + list(values), 
+        first_new=len(tail['values']))
+
+    res = analyse_series(
+        series['values'], params, higher_is_worse, tail['ewma_before_tail'])
+
+    cut = max(
+        0, len(series['values']) - STATE_TAIL_WINDOWS * params['window'])
+
+    if cut > 0:
+        ewma_before_tail = float(res['ewma'][cut - 1])
+    else:
+        ewma_before_tail = tail['ewma_before_tail']
+
+    next_tail = dict(
+        timestamps=series['timestamps'][cut:], 
+        values=series['values'][cut:], ewma_before_tail=ewma_before_tail)
+
+    return series, res, next_tail
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Timing and caching of host name resolution.
+
+Both the HTTP (urllib3) and the ArcLink (telnetlib) connections resolve the
+server host name with socket.getaddrinfo when they connect, so resolution
+time is part of the request time. The resolver replaces
+socket.getaddrinfo process-wide with a wrapper that times every lookup and
+adds it to the record of the current request (see record), so that slow or
+failing DNS can be told apart from a slow data centre.
+
+Optionally, the resolver caches the addresses of a host in-process. The
+system resolver does not report the TTL of the records, so cache entries
+expire after a fixed TTL. Failed lookups are not cached.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import contextlib
+import socket
+import threading
+import time
+
+import numpy
+
+
+# seconds cache entries are valid
+DEFAULT_TTL = 300.0
+
+
+class Resolver(object):
+    """
+    Drop-in replacement of socket.getaddrinfo that times lookups and
+    optionally caches their results for ttl seconds (0: no cache).
+
+    """
+
+    def __init__(self, ttl=0.0, getaddrinfo=None):
+
+        self.ttl = ttl
+        self.system_getaddrinfo = getaddrinfo or socket.getaddrinfo
+
+        # getaddrinfo arguments -> (expiry time, addresses)
+        self.cache = dict()
+        self.lock = threading.Lock()
+
+        # record of the current request of the thread (see record)
+        self.local = threading.local()
+
+    def getaddrinfo(self, host, port, *args, **kwargs):
+
+        key = (host, port) + args + tuple(sorted(kwargs.items()))
+        t_start = time.time()
+
+        if self.ttl > 0:
+
+            with self.lock:
+                entry = self.cache.get(key)
+
+            if entry is not None and entry[0] > t_start:
+                self.add_lookup(host, time.time() - t_start, cached=True)
+                return list(entry[1])
+
+        try:
+            addresses = self.system_getaddrinfo(host, port, *args, **kwargs)
+
+        except socket.error, e:
+            self.add_lookup(host, time.time() - t_start, error=e)
+            raise
+
+        t_end = time.time()
+        self.add_lookup(host, t_end - t_start)
+
+        if self.ttl > 0:
+
+            with self.lock:
+                self.cache[key] = (t_end + self.ttl, addresses)
+
+        return addresses
+
+    def add_lookup(self, host, seconds, cached=False, error=None):
+        """Add lookup to record of current request of thread, if any."""
+
+        target = getattr(self.local, 'target', None)
+
+        if target is None:
+            return
+
+        target['host'] = host
+        target['time'] = target.get('time', 0.0) + seconds
+        target['lookups'] = target.get('lookups', 0) + 1
+        target['cached'] = target.get('cached', 0) + int(cached)
+
+        if error is not None:
+            target['error'] = error.__class__.__name__
+
+    @contextlib.contextmanager
+    def record(self, target):
+
+        self.local.target = target
+
+        try:
+            yield target
+
+        finally:
+            self.local.target = None
+
+    def clear(self):
+
+        with self.lock:
+            self.cache.clear()
+
+
+# process-wide resolver, set by install()
+RESOLVER = None
+
+
+def install(ttl=0.0):
+    """
+    Replace socket.getaddrinfo with a resolver that caches for ttl seconds
+    (0: no cache), return the resolver.
+
+    """
+
+    global RESOLVER
+
+    if RESOLVER is None:
+        RESOLVER = Resolver(ttl)
+        socket.getaddrinfo = RESOLVER.getaddrinfo
+
+    else:
+        RESOLVER.ttl = ttl
+
+    return RESOLVER
+
+
+@contextlib.contextmanager
+def record(target):
+    """
+    Record host name lookups of block into dict target: host (last looked
+    up), time (seconds spent resolving), lookups, cached (lookups served
+    from cache), and error (exception class of failed lookup). No-op if
+    target is None or no resolver is installed.
+
+    """
+
+    if target is None or RESOLVER is None:
+        yield target
+        return
+
+    with RESOLVER.record(target):
+        yield target
+
+
+def summarize(records):
+    """
+    Return summary of lookup records of requests: number of requests with
+    lookups, lookups, cached lookups, failed lookups, and median, 90th
+    percentile and maximum of resolution time per request (seconds).
+
+    """
+
+    records = [x for x in records if x.get('lookups')]
+
+    summary = dict(
+        requests=len(records), lookups=sum(x['lookups'] for x in records),
+        cached=sum(x['cached'] for x in records),
+        failed=len([x for x in records if x.get('error')]))
+
+    if records:
+        times = [x['time'] for x in records]
+
+        summary['median'] = float(numpy.median(times))
+        summary['p90'] = float(numpy.percentile(times, 90))
+        summary['max'] = max(times)
+
+    return summary
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Compact in-memory table of the samples of a test run.
+
+A result cell (node, response size, protocol, service, method) gets an
+integer id when the first sample or attempt of the cell is stored, so only
+cells that are actually measured take memory. The samples of a cell are kept
+in typed arrays (array.array) instead of lists of Python numbers. Summary
+statistics and quantile sketches are computed on the arrays; the nested
+result dict (see merging) is only built for serialization.
+
+Node level entries (e.g., preflight) and run info (utils.RUN_INFO_KEY) are
+kept in attribute info and copied into the result dict as they are.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import array
+
+from eidanodetest import utils
+
+
+# sample column, array type code (l: C long, d: C double)
+SAMPLE_COLUMNS = (
+    ('length', 'l'),
+    ('time', 'd'),
+    ('throughput', 'd'),
+    ('latency', 'd'),
+    ('count', 'l'))
+
+
+class SampleTable(object):
+
+    def __init__(self):
+
+        # cell id -> cell key (node, size, protocol, service, method), method
+        # is empty for ArcLink
+        self.cells = []
+        self.cell_ids = dict()
+
+        # cell id -> column -> array, cell id -> list of attempt records
+        self.samples = []
+        self.attempts = []
+
+        # cell id -> stats dict, serialized quantile sketches
+        self.stats = dict()
+        self.sketches = dict()
+
+        # (node, size, protocol, service) -> dict(params, length)
+        self.services = dict()
+
+        # node -> node level entries, RUN_INFO_KEY -> run info
+        self.info = dict()
+
+    def add_node(self, node):
+        """Add node (without cells), so that it is part of the result."""
+        self.info.setdefault(node, dict())
+
+    def get_cell_id(self, node, size, protocol, service, method=''):
+        """Return id of cell, add cell if it does not exist."""
+
+        key = (node, size, protocol, service, method)
+
+        try:
+            return self.cell_ids[key]
+        except KeyError:
+            pass
+
+        cell_id = len(self.cells)
+
+        self.cells.append(key)
+        self.cell_ids[key] = cell_id
+
+        self.samples.append(dict(
+            (column, array.array(typecode)) \
+                for column, typecode in SAMPLE_COLUMNS))
+        self.attempts.append([])
+
+        self.add_node(node)
+
+        return cell_id
+
+    def iter_cells(self):
+        """Iterate over (cell id, cell key) in order of creation."""
+        return enumerate(self.cells)
+
+    def add_sample(
+        self, cell_id, length, time, throughput, latency=None, count=None):
+
+        samples = self.samples[cell_id]
+
+        samples['length'].append(length)
+        samples['time'].append(time)
+        samples['throughput'].append(throughput)
+
+        if latency is not None:
+            samples['latency'].append(latency)
+
+        if count is not None:
+            samples['count'].append(count)
+
+    def add_attempt(self, cell_id, attempt):
+        self.attempts[cell_id].append(attempt)
+
+    def get_attempts(self, cell_id):
+        return self.attempts[cell_id]
+
+    def has_attempts(self):
+        return any(self.attempts)
+
+    def set_service_info(self, cell_id, params, length):
+        """Set request parameters and response size of service of cell."""
+
+        self.services[self.cells[cell_id][:4]] = dict(
+            params=params, length=length)
+
+    def get_service_info(self, cell_id):
+        return self.services.get(self.cells[cell_id][:4], dict())
+
+    def get_data(self, cell_id):
+        """
+        Return data dict of cell (sample arrays and attempts), as expected
+        by merging.compute_cell_stats.
+
+        """
+
+        data = dict(self.samples[cell_id])
+        data['attempts'] = self.attempts[cell_id]
+
+        return data
+
+    def set_stats(self, cell_id, stats, sketches):
+        self.stats[cell_id] = stats
+        self.sketches[cell_id] = sketches
+
+    def to_result(self):
+        """Return nested result dict (see merging) with sample lists."""
+
+        result = dict()
+
+        for node, entries in self.info.items():
+            result[node] = dict(entries)
+
+            if node != utils.RUN_INFO_KEY:
+                result[node]['result'] = dict()
+
+        for cell_id, (node, size, protocol, service, method) in \
+            self.iter_cells():
+
+            service_res = result[node]['result'].setdefault(
+                size, dict()).setdefault(protocol, dict()).setdefault(
+                    service, dict())
+
+            service_res.update(self.get_service_info(cell_id))
+
+            if method:
+                cell = service_res.setdefault(method, dict())
+            else:
+                cell = service_res
+
+            cell['data'] = dict(
+                (column, self.samples[cell_id][column].tolist()) \
+                    for column, _ in SAMPLE_COLUMNS)
+            cell['data']['attempts'] = self.attempts[cell_id]
+
+            if cell_id in self.stats:
+                cell['stats'] = self.stats[cell_id]
+                cell['sketch'] = self.sketches[cell_id]
+
+        return result
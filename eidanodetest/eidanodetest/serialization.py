@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Serialization of result dicts.
+
+Results are written as compact JSON (no indentation, no blanks after
+separators), compressed with a selectable codec:
+
+    gzip    deflate, level 1 (fast) to 9 (best)
+    lzma    xz container, preset 0 (fast) to 9 (best); needs Python 3 or
+            backports.lzma
+    none    plain JSON
+
+Optionally, the raw samples and attempt records ('data' of every result
+cell) are split off into a file of the same name in subdirectory raw, so
+that tools which only need statistics and sketches do not have to read
+them. The summary file refers to the raw file in run info entry 'raw' (path
+relative to the summary file). utils.load_json detects the codec by the
+magic bytes of the file, and joins the raw samples on request.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import gzip
+import io
+import json
+import os
+
+from eidanodetest import utils
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+
+CODECS = ('gzip', 'lzma', 'none')
+
+DEFAULT_CODEC = 'gzip'
+DEFAULT_LEVEL = 6
+
+CODEC_LEVELS = dict(gzip=(1, 9), lzma=(0, 9))
+
+CODEC_EXTENSIONS = dict(gzip='.json.gz', lzma='.json.xz', none='.json')
+
+RAW_SUBDIR = 'raw'
+
+
+def dumps(result):
+    """Return compact JSON of result."""
+    return json.dumps(result, sort_keys=True, separators=(',', ':'))
+
+
+def encode(content, codec=DEFAULT_CODEC, level=DEFAULT_LEVEL):
+    """Return content (str) compressed with codec at level."""
+
+    check_codec(codec, level)
+
+    if codec == 'gzip':
+        buf = io.BytesIO()
+
+        with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=level) as fp:
+            fp.write(content)
+
+        return buf.getvalue()
+
+    elif codec == 'lzma':
+        return lzma.compress(content, preset=level)
+
+    else:
+        return content
+
+
+def check_codec(codec, level=DEFAULT_LEVEL):
+    """Raise ValueError if codec or level is not supported."""
+
+    if codec not in CODECS:
+        raise ValueError("unknown codec {}".format(codec))
+
+    if codec == 'lzma' and lzma is None:
+        raise ValueError("codec lzma needs Python 3 or backports.lzma")
+
+    if codec in CODEC_LEVELS:
+        min_level, max_level = CODEC_LEVELS[codec]
+
+        if not min_level <= level <= max_level:
+            raise ValueError("level of codec {} must be {} to {}".format(
+                codec, min_level, max_level))
+
+
+def get_codec_from_filename(path):
+    """Return codec by file name extension (gz, xz), default gzip."""
+
+    if path.endswith('.json'):
+        return 'none'
+
+    elif path.endswith('xz'):
+        return 'lzma'
+
+    else:
+        return 'gzip'
+
+
+def split_raw(result):
+    """
+    Remove data (raw samples, attempts) of all cells from result (in place),
+    return it as result dict that contains only the data.
+
+    """
+
+    raw = dict()
+
+    for node, size, protocol, service, method, _, method_res in \
+        list(utils.iter_result_cells(result)):
+
+        if 'data' not in method_res:
+            continue
+
+        raw_service = raw.setdefault(node, dict(result=dict()))['result']\
+            .setdefault(size, dict()).setdefault(protocol, dict())\
+            .setdefault(service, dict())
+
+        if method:
+            raw_service[method] = dict(data=method_res.pop('data'))
+        else:
+            raw_service['data'] = method_res.pop('data')
+
+    return raw
+
+
+def write_result(
+    result, path, codec=DEFAULT_CODEC, level=DEFAULT_LEVEL, split=False):
+    """
+    Write result to file path (atomically). If split is set, the data of
+    all cells is moved from result to a raw file (see split_raw), which is
+    written first.
+
+    """
+
+    check_codec(codec, level)
+
+    if split:
+        raw_relpath = os.path.join(RAW_SUBDIR, os.path.basename(path))
+        raw_path = utils.get_outpath(raw_relpath, os.path.dirname(path))
+
+        raw = split_raw(result)
+        utils.write_atomic(raw_path, encode(dumps(raw), codec, level))
+
+        result.setdefault(utils.RUN_INFO_KEY, dict())[utils.RAW_INFO_KEY] = \
+            raw_relpath
+
+    utils.write_atomic(path, encode(dumps(result), codec, level))
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Mergeable quantile sketch for non-negative samples (throughput, latency,
+request time).
+
+Log-bucketed histogram (as in HDR histograms and DDSketch): bucket i holds
+values in (gamma^(i-1), gamma^i] with gamma = (1 + a) / (1 - a), so that
+every quantile is returned with relative error of at most a. Sketches with
+the same relative accuracy are merged by adding bucket counts, which gives
+percentiles over arbitrary sets of runs in constant memory.
+
+Serialized as dict (JSON):
+
+    {"accuracy": 0.01, "count": 10, "zero": 0, "min": 1.2, "max": 3.4,
+     "sum": 21.0, "offset": 9, "bins": [1, 0, 3, ...]}
+
+where bins[j] is the count of bucket offset + j.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import math
+
+
+DEFAULT_ACCURACY = 0.01
+
+# values below are counted as zero
+MIN_POSITIVE_VALUE = 1e-9
+
+
+class QuantileSketch(object):
+
+    def __init__(self, accuracy=DEFAULT_ACCURACY):
+
+        if not 0.0 < accuracy < 1.0:
+            raise ValueError("sketch accuracy must be in (0, 1)")
+
+        self.accuracy = accuracy
+        self.gamma = (1.0 + accuracy) / (1.0 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+
+        self.count = 0
+        self.zero = 0
+        self.min = None
+        self.max = None
+        self.sum = 0.0
+
+        # bucket index -> count
+        self.bins = dict()
+
+    def add(self, value, count=1):
+
+        if value < 0:
+            raise ValueError("sketch only takes non-negative values")
+
+        if value < MIN_POSITIVE_VALUE:
+            self.zero += count
+        else:
+            idx = int(math.ceil(math.log(value) / self._log_gamma))
+            self.bins[idx] = self.bins.get(idx, 0) + count
+
+        self.count += count
+        self.sum += value * count
+
+        if self.min is None or value < self.min:
+            self.min = value
+
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def extend(self, values):
+
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        """Add counts of other sketch (same accuracy) to this sketch."""
+
+        if other.accuracy != self.accuracy:
+            raise ValueError("cannot merge sketches of different accuracy")
+
+        if not other.count:
+            return self
+
+        for idx, count in other.bins.items():
+            self.bins[idx] = self.bins.get(idx, 0) + count
+
+        self.zero += other.zero
+        self.count += other.count
+        self.sum += other.sum
+
+        if self.min is None or other.min < self.min:
+            self.min = other.min
+
+        if self.max is None or other.max > self.max:
+            self.max = other.max
+
+        return self
+
+    def quantile(self, q):
+        """Return value at quantile q (0 <= q <= 1), None if empty."""
+
+        if not self.count:
+            return None
+
+        if q <= 0.0:
+            return self.min
+
+        if q >= 1.0:
+            return self.max
+
+        rank = q * (self.count - 1)
+
+        if rank < self.zero:
+            return 0.0
+
+        cumulative = self.zero
+
+        for idx in sorted(self.bins):
+
+            cumulative += self.bins[idx]
+
+            if cumulative > rank:
+
+                # value with minimal relative error in bucket
+                value = 2.0 * self.gamma ** idx / (self.gamma + 1.0)
+                return min(max(value, self.min), self.max)
+
+        return self.max
+
+    def mean(self):
+
+        if not self.count:
+            return None
+
+        return self.sum / self.count
+
+    def to_dict(self):
+
+        if self.bins:
+            offset = min(self.bins)
+            bins = [0] * (max(self.bins) - offset + 1)
+
+            for idx, count in self.bins.items():
+                bins[idx - offset] = count
+        else:
+            offset = 0
+            bins = []
+
+        return dict(
+            accuracy=self.accuracy, count=self.count, zero=self.zero,
+            min=self.min, max=self.max, sum=self.sum, offset=offset,
+            bins=bins)
+
+    @classmethod
+    def from_dict(cls, d):
+
+        sketch = cls(d['accuracy'])
+
+        sketch.count = d['count']
+        sketch.zero = d['zero']
+        sketch.min = d['min']
+        sketch.max = d['max']
+        sketch.sum = d['sum']
+
+        for j, count in enumerate(d['bins']):
+            if count:
+                sketch.bins[d['offset'] + j] = count
+
+        return sketch
+
+
+def from_samples(values, accuracy=DEFAULT_ACCURACY):
+
+    sketch = QuantileSketch(accuracy)
+    sketch.extend(values)
+
+    return sketch
+
+
+def merge_dicts(sketch_dicts):
+    """Merge serialized sketches, return QuantileSketch (None if none)."""
+
+    merged = None
+
+    for d in sketch_dicts:
+
+        sketch = QuantileSketch.from_dict(d)
+
+        if merged is None:
+            merged = sketch
+        else:
+            merged.merge(sketch)
+
+    return merged
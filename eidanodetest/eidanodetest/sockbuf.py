@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Receive buffer (SO_RCVBUF) experiment.
+
+The throughput of a single TCP connection is limited to receive window / RTT.
+On paths with a high bandwidth-delay product, a receive buffer that is too
+small limits the window the client can advertise. The HTTP session of the
+experiment uses a transport adapter that sets SO_RCVBUF on its sockets
+before connecting (the window scale is negotiated in the handshake), so the
+same requests can be repeated with several buffer sizes.
+
+Buffer size 0 keeps the system default (on Linux, receive buffer
+autotuning between the limits of net.ipv4.tcp_rmem). Setting SO_RCVBUF
+disables autotuning; Linux doubles the requested size (bookkeeping
+overhead) and caps it at net.core.rmem_max, so the effective size is
+recorded as well.
+
+The recommended setting of a node is the smallest buffer size whose median
+throughput reaches a fraction of the best median throughput; the system
+default is preferred if it reaches it.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import socket
+
+import numpy
+import requests
+
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.connection import HTTPConnection
+
+
+# receive buffer sizes (KiB) of the experiment, 0: system default
+BUFFER_SIZES_KIB = (0, 64, 256, 1024, 4096)
+
+# response size category repeated with every buffer size
+BUFFER_EXPERIMENT_SIZE = 'large'
+
+# fraction of best median throughput that recommended buffer must reach
+RECOMMEND_FRACTION = 0.9
+
+
+class SocketOptionsAdapter(HTTPAdapter):
+    """HTTP adapter that sets additional socket options before connecting."""
+
+    def __init__(self, socket_options=(), **kwargs):
+
+        # used by init_poolmanager, which is called by HTTPAdapter.__init__
+        self.socket_options = list(socket_options)
+
+        super(SocketOptionsAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+
+        kwargs['socket_options'] = \
+            HTTPConnection.default_socket_options + self.socket_options
+
+        super(SocketOptionsAdapter, self).init_poolmanager(*args, **kwargs)
+
+
+def make_session(rcvbuf=0):
+    """
+    Return requests session whose connections use receive buffer of rcvbuf
+    bytes (0: system default).
+
+    """
+
+    session = requests.Session()
+
+    if rcvbuf:
+        adapter = SocketOptionsAdapter(
+            [(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)])
+
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+    return session
+
+
+def get_effective_rcvbuf(rcvbuf=0):
+    """
+    Return receive buffer size (bytes) that the system grants a TCP socket
+    if rcvbuf bytes are requested (0: system default, initial size).
+
+    """
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+    try:
+        if rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+
+        return sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+
+    finally:
+        sock.close()
+
+
+def get_buffer_curve(throughput_by_buffer):
+    """
+    Return throughput vs. buffer size curve from dict buffer size (KiB) ->
+    list of throughput samples: list of dict(rcvbuf, effective, throughput,
+    count) in order of buffer size, throughput is the median (None if there
+    are no samples), effective the granted buffer size (bytes).
+
+    """
+
+    curve = []
+
+    for rcvbuf in sorted(throughput_by_buffer):
+
+        samples = throughput_by_buffer[rcvbuf]
+
+        curve.append(dict(
+            rcvbuf=rcvbuf,
+            effective=get_effective_rcvbuf(rcvbuf * 1024),
+            throughput=float(numpy.median(samples)) if len(samples) else None,
+            count=len(samples)))
+
+    return curve
+
+
+def recommend_buffer(curve, fraction=RECOMMEND_FRACTION):
+    """
+    Return recommended buffer size (KiB) of curve (see get_buffer_curve): 0
+    if the system default reaches fraction of the best median throughput,
+    else the smallest buffer size that does. None if curve has no samples.
+
+    """
+
+    measured = [x for x in curve if x['throughput'] is not None]
+
+    if not measured:
+        return None
+
+    best = max(x['throughput'] for x in measured)
+
+    for point in measured:
+
+        if point['throughput'] >= fraction * best:
+            return point['rcvbuf']
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Split-window download strategy.
+
+A long time window can be fetched in one request, or split into K
+contiguous sub-windows that are fetched concurrently. A split run is
+compared with the single request of the same window by time to complete
+(first request sent to last byte received), aggregate throughput, and by
+content: the miniSEED records of all sub-windows (see
+streaming.MiniSeedRecordCounter) must be those of the single request.
+Records that overlap a sub-window boundary are returned for both
+sub-windows (extra), records that are not returned at all are missing.
+
+The recommended number of sub-windows of a node is the smallest K whose
+median time to complete is within SPLIT_TOLERANCE of the best K, among
+those whose runs returned all records of the single request.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import collections
+import datetime
+
+import numpy
+
+
+SPLITS = (1, 2, 4, 8)
+
+SPLIT_TOLERANCE = 0.1
+
+
+def split_window(start, end, splits):
+    """
+    Return list of splits contiguous (start, end) datetimes covering start
+    to end, boundaries at full seconds.
+
+    """
+
+    seconds = int((end - start).total_seconds())
+
+    if splits < 1 or splits > seconds:
+        raise ValueError("cannot split window into {} parts".format(splits))
+
+    boundaries = [
+        start + datetime.timedelta(seconds=seconds * i // splits) \
+            for i in xrange(splits)] + [end]
+
+    return zip(boundaries[:-1], boundaries[1:])
+
+
+def compare_records(reference, digests):
+    """
+    Return comparison of record digests of a split run with those of the
+    single request (reference): equal (same records, also if in another
+    order), missing (records of reference not in run), extra (records of
+    run not in reference, or returned more often).
+
+    """
+
+    reference = collections.Counter(reference)
+    digests = collections.Counter(digests)
+
+    missing = sum((reference - digests).values())
+    extra = sum((digests - reference).values())
+
+    return dict(equal=missing == 0 and extra == 0, missing=missing, extra=extra)
+
+
+def summarize_runs(runs):
+    """
+    Return summary of runs (dicts with splits, time, bytes, throughput,
+    failed, and comparison with the single request) per number of splits:
+    dict splits -> dict(runs, failed, time, throughput (medians of complete
+    runs), complete (fraction of runs with all records of the single
+    request, None if not compared), speedup (median time of single request
+    over median time)).
+
+    """
+
+    summary = dict()
+
+    for splits in sorted(set(x['splits'] for x in runs)):
+
+        split_runs = [x for x in runs if x['splits'] == splits]
+        complete = [x for x in split_runs if not x['failed']]
+        compared = [x for x in complete if x.get('missing') is not None]
+
+        summary[splits] = dict(
+            runs=len(split_runs), failed=len(split_runs) - len(complete),
+            time=float(numpy.median([x['time'] for x in complete])) \
+                if complete else None,
+            throughput=float(numpy.median(
+                [x['throughput'] for x in complete])) if complete else None,
+            complete=float(len([x for x in compared if not x['missing']])) / \
+                len(compared) if compared else None,
+            speedup=None)
+
+    if 1 in summary and summary[1]['time']:
+
+        for splits_summary in summary.values():
+
+            if splits_summary['time']:
+                splits_summary['speedup'] = \
+                    summary[1]['time'] / splits_summary['time']
+
+    return summary
+
+
+def recommend_splits(summary, tolerance=SPLIT_TOLERANCE):
+    """
+    Return recommended number of splits of summary (see summarize_runs),
+    None if no run was complete.
+
+    """
+
+    candidates = [
+        (splits, x['time']) for splits, x in sorted(summary.items()) \
+            if x['time'] is not None and x['complete'] in (None, 1.0)]
+
+    if not candidates:
+        return None
+
+    best = min(x[1] for x in candidates)
+
+    for splits, t in candidates:
+        if t <= (1.0 + tolerance) * best:
+            return splits
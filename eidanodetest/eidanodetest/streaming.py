@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming consumption of web service responses.
+
+Response bodies are read chunk by chunk and handed to an optional counter
+that inspects the content on the fly (e.g., counts StationXML elements,
+digests miniSEED records), so that no response is kept in memory as a 
+whole.
+
+Optionally, the bytes received are recorded as time series (bytes per 
+fixed interval since the start of the request, i.e. the delta-encoded
+cumulative byte count), from which ramp-up (TCP slow start), steady-state
+rate and stalls of the transfer are derived. The series is sampled on the
+clock from the reads of the measurement (RESPONSE_CHUNK_SIZE), so that 
+recording it does not change the measured throughput; its resolution is one
+chunk.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import hashlib
+import struct
+import time
+import xml.parsers.expat
+
+from eidanodetest import deadlines
+from eidanodetest import memory
+
+
+# bytes per chunk when iterating over a streamed HTTP response
+RESPONSE_CHUNK_SIZE = 64 * 1024
+
+# transfer time series: interval (seconds); below RESPONSE_CHUNK_SIZE per
+# interval (about 5 Mbits/s), intervals while a chunk fills count as stall
+SERIES_INTERVAL = 0.1
+
+# ramp-up ends when the mean rate over RAMPUP_BINS intervals reaches
+# RAMPUP_FRACTION of the steady-state rate (rate of the second half)
+RAMPUP_BINS = 5
+RAMPUP_FRACTION = 0.9
+
+TRANSFER_METRICS = ('steady_rate', 'rampup_time', 'longest_stall')
+
+STATIONXML_ELEMENTS = ('Network', 'Station', 'Channel', 'Response')
+
+TEXT_COMMENT_CHAR = b'#'
+
+# miniSEED fixed header: length, offsets of start time year, number of
+# blockettes and first blockette; blockette type of record length
+MINISEED_HEADER_LENGTH = 48
+MINISEED_YEAR_OFFSET = 20
+MINISEED_BLOCKETTE_OFFSET = 46
+MINISEED_RECORD_LENGTH_BLOCKETTE = 1000
+
+
+class StationXMLCounter(object):
+    """
+    Counts StationXML elements incrementally with an expat parser. No
+    element tree is built, only the start tags of STATIONXML_ELEMENTS are
+    counted.
+
+    """
+
+    def __init__(self, elements=STATIONXML_ELEMENTS):
+
+        self.counts = dict((element, 0) for element in elements)
+
+        # namespace separator: tag names arrive as "uri tagname"
+        self._parser = xml.parsers.expat.ParserCreate(namespace_separator=' ')
+        self._parser.StartElementHandler = self._start_element
+        self._failed = False
+
+    def _start_element(self, name, attrs):
+
+        tag = name.rsplit(' ', 1)[-1]
+
+        if tag in self.counts:
+            self.counts[tag] += 1
+
+    def feed(self, chunk):
+
+        if self._failed:
+            return
+
+        try:
+            self._parser.Parse(chunk, False)
+        except xml.parsers.expat.ExpatError:
+
+            # keep the counts up to here, ignore the rest of the document
+            self._failed = True
+
+    def close(self):
+
+        if not self._failed:
+            try:
+                self._parser.Parse(b'', True)
+            except xml.parsers.expat.ExpatError:
+                self._failed = True
+
+    def count(self, element):
+        return self.counts.get(element, 0)
+
+
+class TextLineCounter(object):
+    """
+    Counts non-empty, non-comment lines of a text response (e.g.,
+    fdsnws-availability format=text), chunk boundaries may split lines.
+
+    """
+
+    def __init__(self):
+
+        self.lines = 0
+        self._tail = b''
+
+    def feed(self, chunk):
+
+        lines = (self._tail + chunk).split(b'\n')
+        self._tail = lines.pop()
+
+        for line in lines:
+            self._add_line(line)
+
+    def close(self):
+
+        self._add_line(self._tail)
+        self._tail = b''
+
+    def count(self, element=None):
+        return self.lines
+
+    def _add_line(self, line):
+
+        line = line.strip()
+        if line and not line.startswith(TEXT_COMMENT_CHAR):
+            self.lines += 1
+
+
+class MiniSeedRecordCounter(object):
+    """
+    Splits a miniSEED response into records (record length from blockette
+    1000), counts them and keeps the SHA-1 digest of every record, so that
+    responses can be compared record by record. Chunk boundaries may split
+    records. If the record length cannot be determined, the rest of the
+    response is digested as one block.
+
+    """
+
+    def __init__(self):
+
+        self.digests = []
+        self._buffer = bytearray()
+
+        # digest of the rest of the response, once the record length cannot
+        # be determined; the rest is not buffered
+        self._unparsed = None
+
+    def feed(self, chunk):
+
+        if self._unparsed is not None:
+            self._unparsed.update(chunk)
+            return
+
+        self._buffer.extend(chunk)
+
+        offset = 0
+
+        while True:
+
+            length = get_miniseed_record_length(self._buffer, offset)
+
+            if length is None:
+                break
+
+            elif length == 0:
+                self._unparsed = hashlib.sha1(self._buffer[offset:])
+                offset = len(self._buffer)
+                break
+
+            if offset + length > len(self._buffer):
+                break
+
+            self.digests.append(hashlib.sha1(
+                self._buffer[offset:offset + length]).hexdigest())
+            offset += length
+
+        del self._buffer[:offset]
+
+    def close(self):
+
+        if self._unparsed is not None:
+            self.digests.append(self._unparsed.hexdigest())
+            self._unparsed = None
+
+        elif self._buffer:
+            self.digests.append(hashlib.sha1(self._buffer).hexdigest())
+            self._buffer = bytearray()
+
+    def count(self, element=None):
+        return len(self.digests)
+
+
+def get_miniseed_record_length(buf, offset=0):
+    """
+    Return length of miniSEED record at offset of buf (bytearray), None if
+    more bytes are needed, 0 if the record has no blockette 1000.
+
+    """
+
+    if len(buf) < offset + MINISEED_HEADER_LENGTH:
+        return None
+
+    # byte order of header: the one with a plausible start time year
+    year = struct.unpack_from('>H', buf, offset + MINISEED_YEAR_OFFSET)[0]
+    byte_order = '>' if 1900 <= year <= 2100 else '<'
+
+    blockette = struct.unpack_from(
+        byte_order + 'H', buf, offset + MINISEED_BLOCKETTE_OFFSET)[0]
+
+    # blockettes follow the fixed header, each starts with type and offset
+    # of the next one (0: last)
+    while blockette:
+
+        if blockette < MINISEED_HEADER_LENGTH:
+            return 0
+
+        if len(buf) < offset + blockette + 8:
+            return None
+
+        blockette_type, next_blockette = struct.unpack_from(
+            byte_order + 'HH', buf, offset + blockette)
+
+        if blockette_type == MINISEED_RECORD_LENGTH_BLOCKETTE:
+            return 2 ** buf[offset + blockette + 6]
+
+        if next_blockette <= blockette:
+            return 0
+
+        blockette = next_blockette
+
+    return 0
+
+
+class TransferSeries(object):
+    """Bytes received per interval since t_start."""
+
+    def __init__(self, interval=SERIES_INTERVAL, t_start=None):
+
+        self.interval = interval
+
+        if t_start is None:
+            t_start = time.time()
+
+        self.t_start = t_start
+        self.bins = []
+
+    def add(self, length_bytes, t=None):
+
+        if t is None:
+            t = time.time()
+
+        idx = max(0, int((t - self.t_start) / self.interval))
+
+        if idx >= len(self.bins):
+            self.bins.extend([0] * (idx + 1 - len(self.bins)))
+
+        self.bins[idx] += length_bytes
+
+    def to_dict(self):
+        return dict(interval=self.interval, bytes=self.bins)
+
+
+def get_transfer_metrics(bins, interval):
+    """
+    Return dict of metrics of transfer time series (bytes per interval):
+    steady-state rate (Mbits / s over the second half of the transfer),
+    ramp-up time (seconds from first byte until the rate reaches 
+    RAMPUP_FRACTION of the steady-state rate), longest stall (seconds 
+    without bytes between first and last byte). None if no bytes.
+
+    """
+
+    received = [idx for idx, x in enumerate(bins) if x > 0]
+
+    if not received:
+        return None
+
+    active = bins[received[0]:received[-1] + 1]
+
+    second_half = active[len(active) // 2:]
+    steady_bytes = float(sum(second_half)) / len(second_half)
+
+    rampup_bins = len(active) - 1
+    window_bytes = 0
+
+    for idx, length_bytes in enumerate(active):
+
+        window_bytes += length_bytes
+        if idx >= RAMPUP_BINS:
+            window_bytes -= active[idx - RAMPUP_BINS]
+
+        if window_bytes >= RAMPUP_FRACTION * steady_bytes * min(
+            idx + 1, RAMPUP_BINS):
+
+            rampup_bins = idx
+            break
+
+    longest_stall = 0
+    stall = 0
+
+    for length_bytes in active:
+
+        if length_bytes:
+            stall = 0
+        else:
+            stall += 1
+            longest_stall = max(longest_stall, stall)
+
+    return dict(
+        steady_rate=8 * steady_bytes / (interval * 1000 * 1000),
+        rampup_time=rampup_bins * interval,
+        longest_stall=longest_stall * interval)
+
+
+def get_response_counter(response_format):
+    """
+    Return counter for response format ('stationxml', 'text', 'miniseed'),
+    or None.
+
+    """
+
+    if response_format == 'stationxml':
+        return StationXMLCounter()
+
+    elif response_format == 'text':
+        return TextLineCounter()
+
+    elif response_format == 'miniseed':
+        return MiniSeedRecordCounter()
+
+    return None
+
+
+def consume_response(
+    response, counter=None, deadline=None, series=None, tcp_sampler=None):
+    """
+    Read streamed requests response to the end, return number of bytes
+    received. Chunks are passed to counter (if given), RSS is sampled per
+    chunk for memory records (see memory.record), and chunks are discarded. If
+    deadline (absolute time) is given, DeadlineExceeded is raised when it
+    has passed before the response is complete. If series (TransferSeries)
+    is given, the bytes received are added to it, and tcp_sampler 
+    (tcpinfo.TcpInfoSampler, if given) samples the connection while 
+    reading; the snapshot at the end of the transfer is left to the caller,
+    outside the timed interval. Exceptions raised while reading carry the 
+    number of bytes received so far in attribute bytes_received.
+
+    """
+
+    length_bytes = 0
+
+    try:
+        for chunk in response.iter_content(chunk_size=RESPONSE_CHUNK_SIZE):
+
+            deadlines.check_deadline(deadline)
+
+            length_bytes += len(chunk)
+
+            if counter is not None:
+                counter.feed(chunk)
+
+            memory.sample()
+
+            if series is not None:
+                series.add(len(chunk))
+
+                if tcp_sampler is not None:
+                    tcp_sampler.sample()
+
+    except Exception, e:
+        e.bytes_received = length_bytes
+
+        # time series up to failure (e.g., stall until read timeout)
+        if series is not None:
+            series.add(0)
+
+        raise
+
+    if counter is not None:
+        counter.close()
+
+    return length_bytes
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Linux TCP_INFO of measurement connections.
+
+getsockopt(TCP_INFO) returns the kernel's struct tcp_info of a TCP socket.
+The fields used here are read by their offsets in the struct (see
+linux/tcp.h); fields that the running kernel does not provide are left out.
+On other platforms, no TCP_INFO is recorded.
+
+The test client is the receiving side of the transfer. Round trip time,
+congestion window, retransmissions and delivery rate describe the client's
+sending direction (requests and ACKs). Loss on the path from the node shows
+as out-of-order packets (rcv_ooopack), a small receive window as small
+rcv_space; rcv_rtt is the RTT estimated by the receiver.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import socket
+import struct
+import sys
+import time
+
+
+# Linux value, not exported by Python 2 on every platform
+TCP_INFO = getattr(socket, 'TCP_INFO', 11)
+
+TCP_INFO_BUFFER_SIZE = 256
+
+# field, offset in struct tcp_info, struct format, scale to unit of record
+# (us -> s, bytes/s -> Mbits/s)
+TCP_INFO_FIELDS = (
+    ('rtt', 68, 'I', 1e-6),
+    ('rttvar', 72, 'I', 1e-6),
+    ('snd_cwnd', 80, 'I', 1),
+    ('rcv_rtt', 92, 'I', 1e-6),
+    ('rcv_space', 96, 'I', 1),
+    ('total_retrans', 100, 'I', 1),
+    ('bytes_received', 128, 'Q', 1),
+    ('segs_in', 140, 'I', 1),
+    ('delivery_rate', 160, 'Q', 8e-6),
+    ('rcv_ooopack', 224, 'I', 1))
+
+# fields with medians in stats, fields sampled while streaming
+TCP_INFO_STATS = (
+    'rtt', 'rttvar', 'snd_cwnd', 'total_retrans', 'delivery_rate', 'rcv_rtt',
+    'rcv_space', 'rcv_ooopack')
+TCP_INFO_SERIES = ('rtt', 'rcv_rtt', 'rcv_space', 'rcv_ooopack')
+
+# seconds between samples while streaming
+TCP_INFO_INTERVAL = 1.0
+
+
+def read_tcp_info(sock):
+    """Return dict of TCP_INFO fields of socket, None if not available."""
+
+    if sock is None or not sys.platform.startswith('linux'):
+        return None
+
+    try:
+        buf = sock.getsockopt(
+            socket.IPPROTO_TCP, TCP_INFO, TCP_INFO_BUFFER_SIZE)
+
+    except (socket.error, AttributeError):
+        return None
+
+    info = dict()
+
+    for field, offset, fmt, scale in TCP_INFO_FIELDS:
+
+        if offset + struct.calcsize(fmt) <= len(buf):
+            info[field] = struct.unpack_from('=' + fmt, buf, offset)[0] * scale
+
+    return info
+
+
+def get_response_socket(response):
+    """Return socket of streamed requests response, None if not found."""
+
+    try:
+        fp = response.raw._fp.fp
+
+    except AttributeError:
+        return None
+
+    # Python 2: socket._fileobject, Python 3: SocketIO in BufferedReader
+    for path in (('_sock',), ('raw', '_sock')):
+
+        obj = fp
+
+        try:
+            for attr in path:
+                obj = getattr(obj, attr)
+
+        except AttributeError:
+            continue
+
+        if isinstance(obj, socket.socket) or hasattr(obj, 'getsockopt'):
+            return obj
+
+    return None
+
+
+class TcpInfoSampler(object):
+    """
+    Samples TCP_INFO of socket every interval seconds while streaming (if
+    sample is called), and once at the end of the transfer (finish).
+
+    """
+
+    def __init__(self, sock, interval=TCP_INFO_INTERVAL, t_start=None):
+
+        self.sock = sock
+        self.interval = interval
+
+        if t_start is None:
+            t_start = time.time()
+
+        self.t_start = t_start
+        self.t_last = None
+
+        self.series = dict((field, []) for field in TCP_INFO_SERIES)
+        self.series['t'] = []
+
+        self.final = None
+
+    def sample(self, t=None):
+
+        if t is None:
+            t = time.time()
+
+        if self.t_last is not None and t - self.t_last < self.interval:
+            return
+
+        self.t_last = t
+
+        info = read_tcp_info(self.sock)
+
+        if info is None:
+            return
+
+        self.series['t'].append(round(t - self.t_start, 3))
+
+        for field in TCP_INFO_SERIES:
+            self.series[field].append(info.get(field))
+
+    def finish(self):
+        self.final = read_tcp_info(self.sock)
+
+    def to_dict(self):
+        """
+        Return final TCP_INFO and series (if sampled), None if not
+        available.
+
+        """
+
+        if self.final is None:
+            return None
+
+        if not self.series['t']:
+            return dict(self.final)
+
+        return dict(self.final, series=self.series)
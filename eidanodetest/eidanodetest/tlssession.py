@@ -0,0 +1,454 @@
+# -*- coding: utf-8 -*-
+"""
+TLS handshake cost and session resumption.
+
+With a new connection per request, the TLS handshake of https endpoints is
+part of the latency of every request. The handshake probe opens a TCP
+connection, runs the TLS handshake and sends a HEAD request of a small
+document, timing connect, handshake and time to first response byte
+separately. A full handshake is followed by one that resumes its session
+(session ID or ticket), so that the cost of a full handshake and the saving
+of resumption can be told apart per node.
+
+Measurement requests can resume TLS sessions as well, as a well-behaved
+client does: their SSL context offers the last session of a host on the
+next connection to it. Each request still opens a new TCP connection.
+
+The ssl module of Python 2 cannot resume sessions, so both use pyOpenSSL
+(optional, needed by the TLS handshake mode and session resumption only).
+Certificate chains are verified with the CA bundle of requests, host names
+against the subject alternative names of the server certificate.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import select
+import socket
+import ssl
+import time
+
+import numpy
+import requests
+
+from requests.compat import urlparse
+
+from requests.adapters import HTTPAdapter
+
+from eidanodetest import preflight
+
+try:
+    from OpenSSL import SSL
+    from urllib3.contrib.pyopenssl import PyOpenSSLContext
+    from urllib3.contrib.pyopenssl import WrappedSocket
+    from urllib3.contrib.pyopenssl import get_subj_alt_name
+except ImportError:
+    SSL = None
+    PyOpenSSLContext = object
+    WrappedSocket = object
+
+# session reuse is not part of the public API of pyOpenSSL
+try:
+    from OpenSSL._util import lib as openssl_lib
+except ImportError:
+    openssl_lib = None
+
+
+HAS_SESSION = SSL is not None
+
+HANDSHAKE_TIMEOUT = 10.0
+
+HTTPS_PORT = 443
+
+HEAD_REQUEST = "HEAD /{path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: "\
+    "eidanodetest\r\nConnection: close\r\n\r\n"
+
+# record fields with medians in summary
+HANDSHAKE_TIMINGS = ('connect', 'handshake', 'first_byte')
+
+
+def make_context(cafile=None):
+    """
+    Return pyOpenSSL context that verifies certificate chains (default CA
+    bundle of requests) and caches sessions for resumption.
+
+    """
+
+    if SSL is None:
+        raise ValueError("TLS session resumption needs pyOpenSSL")
+
+    context = SSL.Context(SSL.SSLv23_METHOD)
+
+    context.set_options(
+        SSL.OP_NO_SSLv2 | SSL.OP_NO_SSLv3 | SSL.OP_NO_COMPRESSION)
+    context.set_session_cache_mode(SSL.SESS_CACHE_CLIENT)
+    context.set_verify(SSL.VERIFY_PEER, lambda conn, cert, errno, depth, ok: ok)
+    context.load_verify_locations(cafile or requests.certs.where())
+
+    return context
+
+
+def run_blocking(conn, sock, func, deadline, *args):
+    """
+    Call func(*args) of pyOpenSSL connection conn until it does not want to
+    read or write any more, waiting for socket sock until deadline
+    (absolute time). Raise socket.timeout when the deadline has passed.
+
+    """
+
+    while True:
+
+        try:
+            return func(*args)
+
+        except SSL.WantReadError:
+            readable, writable = [sock], []
+
+        except SSL.WantWriteError:
+            readable, writable = [], [sock]
+
+        remaining = deadline - time.time()
+
+        if remaining <= 0 or not any(
+            select.select(readable, writable, [], remaining)[:2]):
+            raise socket.timeout("TLS handshake probe timed out")
+
+
+def check_hostname(conn, host):
+    """Raise ssl.CertificateError if certificate of conn does not match."""
+
+    names = get_subj_alt_name(conn.get_peer_certificate())
+
+    ssl.match_hostname(dict(subjectAltName=tuple(names)), host)
+
+
+def is_session_reused(conn):
+    """
+    True if pyOpenSSL connection conn resumed its session, None if the 
+    installed pyOpenSSL does not tell.
+
+    """
+
+    session_reused = getattr(openssl_lib, 'SSL_session_reused', None)
+    ssl_handle = getattr(conn, '_ssl', None)
+
+    if session_reused is None or ssl_handle is None:
+        return None
+
+    try:
+        return bool(session_reused(ssl_handle))
+    except Exception:
+        return None
+
+
+def quiet_shutdown(conn):
+    """
+    Mark pyOpenSSL connection conn as shut down without sending or waiting
+    for close_notify, so that its session stays resumable when the 
+    connection is freed.
+
+    """
+
+    conn.set_shutdown(SSL.SENT_SHUTDOWN | SSL.RECEIVED_SHUTDOWN)
+
+
+class ResumingContext(PyOpenSSLContext):
+    """
+    urllib3 SSL context (pyOpenSSL) that offers the last TLS session of a 
+    host on the next connection to it. The session of a connection is kept
+    when the connection is closed, i.e. after its response (TLS 1.3 session 
+    tickets arrive after the handshake). Counts handshakes and resumed 
+    handshakes (None if reuse cannot be told, see is_session_reused).
+
+    """
+
+    def __init__(self):
+
+        if SSL is None:
+            raise ValueError("TLS session resumption needs pyOpenSSL")
+
+        super(ResumingContext, self).__init__(ssl.PROTOCOL_SSLv23)
+
+        self._ctx.set_options(
+            SSL.OP_NO_SSLv2 | SSL.OP_NO_SSLv3 | SSL.OP_NO_COMPRESSION)
+        self._ctx.set_session_cache_mode(SSL.SESS_CACHE_CLIENT)
+
+        # host -> last session
+        self.sessions = dict()
+
+        self.handshakes = 0
+        self.resumed = 0
+
+    def wrap_socket(
+        self, sock, server_side=False, do_handshake_on_connect=True,
+        suppress_ragged_eofs=True, server_hostname=None):
+
+        conn = SSL.Connection(self._ctx, sock)
+
+        if server_hostname is not None:
+            conn.set_tlsext_host_name(server_hostname.encode('idna'))
+
+        conn.set_connect_state()
+
+        session = self.sessions.get(server_hostname)
+
+        if session is not None:
+            conn.set_session(session)
+
+        # connect timeout of the request
+        deadline = time.time() + (sock.gettimeout() or HANDSHAKE_TIMEOUT)
+
+        try:
+            run_blocking(conn, sock, conn.do_handshake, deadline)
+
+        except SSL.Error, e:
+            raise ssl.SSLError("bad handshake: %r" % e)
+
+        self.handshakes += 1
+
+        if session is not None and self.resumed is not None:
+            reused = is_session_reused(conn)
+
+            if reused is None:
+                self.resumed = None
+            elif reused:
+                self.resumed += 1
+
+        return ResumableSocket(conn, sock, self, server_hostname)
+
+    def keep_session(self, host, conn):
+
+        session = conn.get_session()
+
+        if session is not None:
+            self.sessions[host] = session
+
+
+class ResumableSocket(WrappedSocket):
+    """
+    Socket of ResumingContext: hands its session to the context and shuts
+    down quietly when closed.
+
+    """
+
+    def __init__(self, connection, sock, context, host):
+
+        super(ResumableSocket, self).__init__(connection, sock)
+
+        self._context = context
+        self._host = host
+
+    def close(self):
+
+        # last reference (see WrappedSocket.close)
+        if self._makefile_refs < 1 and not self._closed:
+            self._context.keep_session(self._host, self.connection)
+            quiet_shutdown(self.connection)
+
+        return super(ResumableSocket, self).close()
+
+
+class ResumptionAdapter(HTTPAdapter):
+    """HTTP adapter whose https connections use a ResumingContext."""
+
+    def __init__(self, context, **kwargs):
+
+        # used by init_poolmanager, which is called by HTTPAdapter.__init__
+        self.context = context
+
+        super(ResumptionAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+
+        kwargs['ssl_context'] = self.context
+
+        super(ResumptionAdapter, self).init_poolmanager(*args, **kwargs)
+
+
+def make_session(context):
+    """
+    Return requests session whose https connections resume TLS sessions of
+    context (ResumingContext). Sessions can only be resumed within the 
+    context that created them, so all requests share one context.
+
+    """
+
+    session = requests.Session()
+    session.mount('https://', ResumptionAdapter(context))
+
+    return session
+
+
+class ResumingRequests(object):
+    """
+    Request functions (get, post) as those of the requests module, i.e. one
+    session and connection per request, whose https connections resume TLS
+    sessions of context (ResumingContext).
+
+    """
+
+    def __init__(self, context):
+        self.context = context
+
+    def request(self, method, url, **kwargs):
+
+        with make_session(self.context) as session:
+            return session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('get', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('post', url, **kwargs)
+
+
+def get_tls_address(server):
+    """Return (host, port) of https server URL, None if not https."""
+
+    url = urlparse(server)
+
+    if url.scheme != 'https':
+        return None
+
+    return url.hostname, url.port or HTTPS_PORT
+
+
+def measure_handshake(
+    host, port, context, session=None, timeout=HANDSHAKE_TIMEOUT,
+    path=preflight.FDSNWS_VERSION_PATH):
+    """
+    Connect to host and port, run TLS handshake (offering session, if
+    given), send HEAD request of path and wait for the first response byte.
+    Return tuple (record, session), record is the handshake record (see
+    make_handshake_record), session the TLS session of the connection (None
+    if the probe failed). context is a pyOpenSSL context (see make_context).
+
+    """
+
+    t_start = time.time()
+    deadline = t_start + timeout
+
+    try:
+        sock = socket.create_connection((host, port), timeout)
+
+    except (socket.error, socket.timeout), e:
+        return make_handshake_record(t_start, error=e), None
+
+    t_connected = time.time()
+
+    conn = SSL.Connection(context, sock)
+    conn.set_tlsext_host_name(host.encode('idna'))
+    conn.set_connect_state()
+
+    if session is not None:
+        conn.set_session(session)
+
+    try:
+        run_blocking(conn, sock, conn.do_handshake, deadline)
+        t_handshake = time.time()
+
+        check_hostname(conn, host)
+
+        run_blocking(
+            conn, sock, conn.sendall, deadline, 
+            HEAD_REQUEST.format(path=path, host=host))
+        run_blocking(conn, sock, conn.recv, deadline, 1)
+        t_first_byte = time.time()
+
+        record = make_handshake_record(
+            t_start, t_connected, t_handshake, t_first_byte,
+            resumed=is_session_reused(conn),
+            version=conn.get_protocol_version_name(),
+            cipher=conn.get_cipher_name())
+
+        # after the first response byte, also with TLS 1.3 session tickets
+        new_session = conn.get_session()
+
+    except (
+        SSL.Error, ssl.CertificateError, socket.error, socket.timeout), e:
+        return make_handshake_record(t_start, t_connected, error=e), None
+
+    finally:
+        quiet_shutdown(conn)
+        sock.close()
+
+    return record, new_session
+
+
+def make_handshake_record(
+    t_start, t_connected=None, t_handshake=None, t_first_byte=None,
+    resumed=False, version=None, cipher=None, error=None):
+    """
+    Return record of handshake probe: start time (epoch seconds), connect,
+    handshake and first_byte (time to first response byte after handshake)
+    in seconds, whether the session was resumed (None: unknown), TLS 
+    version, cipher, and exception class if the probe failed (None 
+    otherwise).
+
+    """
+
+    record = dict(
+        start=t_start, connect=None, handshake=None, first_byte=None,
+        resumed=resumed, version=version, cipher=cipher, error=None)
+
+    if t_connected is not None:
+        record['connect'] = t_connected - t_start
+
+    if t_handshake is not None:
+        record['handshake'] = t_handshake - t_connected
+
+    if t_first_byte is not None:
+        record['first_byte'] = t_first_byte - t_handshake
+
+    if error is not None:
+        record['error'] = error.__class__.__name__
+
+    return record
+
+
+def summarize_handshakes(full, resumed):
+    """
+    Return summary of full and resumed handshake records: medians of
+    connect, handshake and first_byte of successful full handshakes (full)
+    and of resumed handshakes that were actually resumed (resumed; all 
+    successful ones if reuse is unknown), handshake time saved by 
+    resumption (saving, seconds), fraction of resumption attempts that 
+    resumed (resumption, None if there were none or reuse is unknown, see 
+    is_session_reused), number of failed probes, and TLS version and cipher 
+    of the last full handshake.
+
+    """
+
+    full_ok = [x for x in full if x['error'] is None]
+    resumed_ok = [
+        x for x in resumed if x['error'] is None and x['resumed'] is not False]
+
+    summary = dict(
+        full=get_medians(full_ok), resumed=get_medians(resumed_ok),
+        saving=None, resumption=None,
+        failed=len([x for x in full + resumed if x['error'] is not None]),
+        version=full_ok[-1]['version'] if full_ok else None,
+        cipher=full_ok[-1]['cipher'] if full_ok else None)
+
+    if summary['full'] is not None and summary['resumed'] is not None:
+        summary['saving'] = \
+            summary['full']['handshake'] - summary['resumed']['handshake']
+
+    if resumed and all(x['resumed'] is not None for x in resumed_ok):
+        summary['resumption'] = float(len(resumed_ok)) / len(resumed)
+
+    return summary
+
+
+def get_medians(records):
+    """Return dict of medians of HANDSHAKE_TIMINGS, None if no records."""
+
+    if not records:
+        return None
+
+    medians = dict(
+        (field, float(numpy.median([x[field] for x in records]))) \
+            for field in HANDSHAKE_TIMINGS)
+    medians['count'] = len(records)
+
+    return medians
@@ -7,12 +7,22 @@ This file is part of the EIDA webservice performance tests.
 
 import datetime
 import gzip
+import io
 import json
 import os
 import re
+import tempfile
 
 from mediator import settings
 
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
 FILETAIL_DATETIME_PATTERN = re.compile(r'^.+(\d{8}-\d{6}).*$')
 
 FILENAME_DATETIME_PATTERN = re.compile(
@@ -20,25 +30,93 @@ FILENAME_DATETIME_PATTERN = re.compile(
 FILENAME_DATETIME_PATTERN_GLOB = '*[0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9]-'\
     '[0-9][0-9][0-9][0-9][0-9][0-9]*'
 
+# top level entry of result dict with information on the whole run (not a 
+# node)
+RUN_INFO_KEY = '_run'
+
+# run info entry with path of file with raw samples, relative to result file
+# (see serialization)
+RAW_INFO_KEY = 'raw'
+
+# run info entries: run mode of the driver (--mode), and whether HTTP 
+# connections are opened per request (new; resumed: with resumed TLS 
+# sessions, --tlsresume) or kept open between requests (reused, daemon 
+# mode). Result files without them are suite runs.
+RUN_MODE_KEY = 'mode'
+RUN_CONNECTIONS_KEY = 'connections'
+
+CONNECTION_REUSE = ('new', 'resumed', 'reused')
+
+# run modes whose result files make up the history of node performance;
+# the experiment modes (cache study, receive buffers, replay, ...) measure
+# under other conditions
+HISTORY_MODES = ('suite', 'daemon')
+
+# entries of a measurement cell (see merging)
+RESULT_CELL_KEYS = ('data', 'stats', 'sketch')
+
+GZIP_MAGIC = b'\x1f\x8b'
+XZ_MAGIC = b'\xfd7zXZ\x00'
 
 EIDA_TEXT_COLOR_LINESTYLE = ('b', '-')
 NON_EIDA_TEXT_COLOR_LINESTYLE = ('c', '--')
 UNKNOWN_TEXT_COLOR_LINESTYLE = ('k', '..')
 
 
-def load_json(source_path):
+def load_json(source_path, raw=False):
+    """
+    Load JSON file, plain or compressed (gzip, xz), detected by the magic
+    bytes of the file. If raw is set and the raw samples of a result file 
+    have been written to a separate file, they are joined into the result.
+    
+    """
+    
+    with open(source_path, 'rb') as fh:
+        d = json.loads(decode_content(fh.read()).decode("utf-8"))
+    
+    if raw and isinstance(d, dict) and \
+        RAW_INFO_KEY in d.get(RUN_INFO_KEY, {}):
+        
+        raw_path = os.path.join(
+            os.path.dirname(source_path), d[RUN_INFO_KEY].pop(RAW_INFO_KEY))
+        join_raw(d, load_json(raw_path))
+    
+    return d
+
 
-    # detect gzipped JSON by extension gz
-    if source_path.endswith('gz'):
+def decode_content(content):
+    """Return decompressed content of gzip or xz file, other content as is."""
+    
+    if content.startswith(GZIP_MAGIC):
+        with gzip.GzipFile(fileobj=io.BytesIO(content), mode='rb') as fh:
+            return fh.read()
+    
+    elif content.startswith(XZ_MAGIC):
         
-        with gzip.open(source_path, "rb") as fh:
-            d = json.loads(fh.read().decode("utf-8"))
-    else:
+        if lzma is None:
+            raise ValueError("xz file needs Python 3 or backports.lzma")
         
-        with open(source_path, 'r') as fh:
-            d = json.load(fh)
+        return lzma.decompress(content)
     
-    return d
+    else:
+        return content
+
+
+def join_raw(result, raw):
+    """Add data of cells of raw result dict to cells of result (in place)."""
+    
+    for node, size, protocol, service, method, _, method_res in \
+        iter_result_cells(raw):
+        
+        try:
+            size_result = result[node]['result'][size]
+        except KeyError:
+            continue
+        
+        _, cell = get_result_cell(size_result, protocol, service, method)
+        
+        if cell is not None:
+            cell['data'] = method_res['data']
 
 
 def get_outpath(outfile, dir=''):
@@ -56,6 +134,35 @@ def get_outpath(outfile, dir=''):
     return outpath
 
 
+def write_atomic(path, content):
+    """
+    Write content to temporary file in target directory, then rename, so 
+    that readers never see a partially written file.
+    
+    """
+    
+    outdir = os.path.dirname(os.path.abspath(path))
+    
+    fd, tmppath = tempfile.mkstemp(
+        prefix=".{}.".format(os.path.basename(path)), suffix='.tmp', 
+        dir=outdir)
+    
+    try:
+        with os.fdopen(fd, 'w') as fh:
+            fh.write(content)
+            fh.flush()
+            os.fsync(fh.fileno())
+        
+        # mkstemp creates with mode 0600, readers may run as other user
+        os.chmod(tmppath, 0o644)
+        os.rename(tmppath, path)
+    
+    except Exception:
+        if os.path.exists(tmppath):
+            os.unlink(tmppath)
+        raise
+
+
 def get_node_name(node):
     """Return node name"""
     
@@ -116,6 +223,104 @@ def get_timestamp_from_filename(path):
     return timestamp
 
 
+def get_result_cell(size_result, protocol, service, method=''):
+    """
+    Return tuple (service result, method result) of protocol/service/method
+    for result dict of one response size category, (None, None) if it does 
+    not exist. ArcLink has no methods, both results are the same dict.
+    
+    """
+    
+    try:
+        service_result = size_result[protocol][service]
+    
+        if method:
+            method_result = service_result[method]
+        else:
+            method_result = service_result
+    
+    except (KeyError, TypeError):
+        return None, None
+    
+    return service_result, method_result
+
+
+def iter_node_results(result):
+    """Iterate over (node, node result) of result dict, without run info."""
+    
+    for node, node_res in result.items():
+        if node != RUN_INFO_KEY:
+            yield node, node_res
+
+
+def get_run_info(result):
+    """Return dict(mode, connections) of run of result dict."""
+    
+    run_info = result.get(RUN_INFO_KEY, {})
+    
+    return dict(
+        mode=run_info.get(RUN_MODE_KEY, 'suite'), 
+        connections=run_info.get(RUN_CONNECTIONS_KEY, 'new'))
+
+
+def is_history_result(result, connections='new'):
+    """
+    True if result dict belongs to the history of runs with HTTP connections
+    (new, resumed, reused), see is_history_run.
+    
+    """
+    
+    return is_history_run(get_run_info(result), connections)
+
+
+def is_history_run(run_info, connections='new'):
+    """
+    True if run (see get_run_info) is of a history mode (see HISTORY_MODES)
+    and belongs to the history of runs with HTTP connections (new, resumed,
+    reused). Reused connections save connect and TLS handshake, resumed TLS
+    sessions a part of the handshake, so their latency and throughput are 
+    not comparable with those of new connections, and the histories are not
+    mixed.
+    
+    """
+    
+    if connections not in CONNECTION_REUSE:
+        raise ValueError("connection reuse {} unknown".format(connections))
+    
+    return run_info['mode'] in HISTORY_MODES and \
+        run_info['connections'] == connections
+
+
+def iter_result_cells(result):
+    """
+    Iterate over all measurement cells of a result dict. Yields tuples
+    (node, size, protocol, service, method, service result, method result).
+    For ArcLink, method is empty and both results are the same dict.
+    
+    """
+    
+    for node, node_res in iter_node_results(result):
+        for size, size_res in node_res.get('result', {}).items():
+            for protocol, protocol_res in size_res.items():
+                for service, service_res in protocol_res.items():
+                    
+                    if is_result_cell(service_res):
+                        yield (
+                            node, size, protocol, service, '', service_res, 
+                            service_res)
+                        continue
+                    
+                    for method, method_res in service_res.items():
+                        if is_result_cell(method_res):
+                            yield (
+                                node, size, protocol, service, method, 
+                                service_res, method_res)
+
+
+def is_result_cell(d):
+    return isinstance(d, dict) and any(key in d for key in RESULT_CELL_KEYS)
+
+
 def is_valid_timestamp(timestamp, first, last):
     return (timestamp >= first and timestamp <= last)
 
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Randomized request time windows.
+
+Repeated requests of the same time window are likely served from the page
+cache or an HTTP cache of the node, not from its archive. The window
+generator draws a random start time within an archive range for every
+request, so that the windows of a key (e.g., a node) do not overlap. If no
+free window can be found (archive range exhausted), the generator forgets
+the windows of the key and starts over.
+
+Cache speed-up is the ratio of the median throughput of requests of an
+identical window to that of randomized windows.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import datetime
+import random
+
+import numpy
+
+
+# attempts to find a window that does not overlap with the drawn ones
+MAX_TRIES = 100
+
+
+class WindowGenerator(object):
+
+    def __init__(self, start, end, max_tries=MAX_TRIES, rng=None):
+        """Archive range start and end (datetime)."""
+
+        if end <= start:
+            raise ValueError("archive range end must be after start")
+
+        self.start = start
+        self.end = end
+        self.max_tries = max_tries
+
+        self.random = rng or random.Random()
+
+        # key -> list of (start, end) of drawn windows
+        self.used = dict()
+
+    def draw(self, key, duration):
+        """
+        Return (start, end) datetimes of random window of duration (seconds)
+        that does not overlap with the windows drawn for key before.
+
+        """
+
+        span = int(get_seconds(self.end - self.start)) - duration
+
+        if span < 0:
+            raise ValueError(
+                "window of {} seconds does not fit into archive range".format(
+                    duration))
+
+        used = self.used.setdefault(key, [])
+
+        for _ in xrange(self.max_tries):
+
+            window = self._make_window(span, duration)
+
+            if not any(overlaps(window, x) for x in used):
+                used.append(window)
+                return window
+
+        # archive range exhausted: start over
+        window = self._make_window(span, duration)
+        self.used[key] = [window]
+
+        return window
+
+    def _make_window(self, span, duration):
+
+        start = self.start + datetime.timedelta(
+            seconds=self.random.randint(0, span))
+
+        return start, start + datetime.timedelta(seconds=duration)
+
+
+def overlaps(window, other):
+    return window[0] < other[1] and other[0] < window[1]
+
+
+def get_seconds(timedelta):
+    return timedelta.days * 86400 + timedelta.seconds
+
+
+def get_cache_speedup(identical_throughput, random_throughput):
+    """
+    Return median throughput of identical and randomized windows and their
+    ratio (None if there are no randomized samples).
+
+    """
+
+    speedup = dict(
+        identical=float(numpy.median(identical_throughput)) \
+            if len(identical_throughput) else None,
+        randomized=float(numpy.median(random_throughput)) \
+            if len(random_throughput) else None)
+
+    if speedup['identical'] is not None and speedup['randomized']:
+        speedup['speedup'] = speedup['identical'] / speedup['randomized']
+    else:
+        speedup['speedup'] = None
+
+    return speedup
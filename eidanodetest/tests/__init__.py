@@ -0,0 +1 @@
+"""Required for imports."""
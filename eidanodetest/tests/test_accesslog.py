@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of request templates from access logs.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from eidanodetest import accesslog
+
+
+COMBINED_LINE = '1.2.3.4 - - [10/Oct/2016:13:55:36 +0200] "GET '\
+    '/fdsnws/dataselect/1/query?net=GE&sta=APE,WLF&cha=BH?&'\
+    'start=2016-01-01T00:00:00Z&end=2016-01-01T01:00:00 HTTP/1.1" 200 '\
+    '12345 "-" "ObsPy"'
+
+POST_BODY = "quality=B\nminimumlength=0.0\n"\
+    "GE APE * BHZ 2016-01-01T00:00:00 2016-01-01T00:10:00\n"\
+    "GE WLF * BHZ 2016-01-01 2016-01-02\n"
+
+CATEGORIES = [('small', 600), ('medium', 3600), ('large', 86400)]
+
+
+class ParseLineTestCase(unittest.TestCase):
+
+    def test_combined(self):
+
+        entry = accesslog.parse_line(COMBINED_LINE)
+
+        self.assertEqual(entry['method'], 'get')
+        self.assertIsNone(entry['body'])
+        self.assertTrue(entry['query'].startswith('net=GE&'))
+
+        # 13:55:36 at UTC+2
+        self.assertEqual(
+            entry['time'], accesslog.to_epoch(
+                accesslog.parse_time('2016-10-10T11:55:36')))
+
+    def test_combined_skipped(self):
+
+        for line in (
+            COMBINED_LINE.replace(' 200 ', ' 404 '),
+            COMBINED_LINE.replace('dataselect', 'station'),
+            COMBINED_LINE.replace('"GET', '"HEAD'),
+            'not a log line'):
+
+            self.assertRaises(ValueError, accesslog.parse_line, line)
+
+    def test_json(self):
+
+        entry = accesslog.parse_line(json.dumps(dict(
+            time='2016-10-10T11:55:36.5Z', method='POST', body=POST_BODY)))
+
+        self.assertEqual(entry['method'], 'post')
+        self.assertEqual(entry['body'], POST_BODY)
+        self.assertEqual(
+            entry['time'], accesslog.to_epoch(
+                accesslog.parse_time('2016-10-10T11:55:36')) + 0.5)
+
+        entry = accesslog.parse_line(json.dumps(dict(
+            time=1476100536, query='net=GE')))
+
+        self.assertEqual(entry['method'], 'get')
+        self.assertEqual(entry['time'], 1476100536.0)
+
+    def test_json_skipped(self):
+
+        for record in (
+            dict(time=0, method='POST'),
+            dict(query='net=GE'),
+            dict(time=0, path='/fdsnws/station/1/query', query='net=GE')):
+
+            self.assertRaises(
+                ValueError, accesslog.parse_line, json.dumps(record))
+
+        self.assertRaises(ValueError, accesslog.parse_line, '{"time": ')
+
+
+class TemplateTestCase(unittest.TestCase):
+
+    def test_get(self):
+
+        template = accesslog.make_template(
+            accesslog.parse_line(COMBINED_LINE))
+
+        self.assertEqual(template['params'], dict(
+            network='GE', station='APE,WLF', channel='BH?',
+            starttime='2016-01-01T00:00:00', endtime='2016-01-01T01:00:00'))
+
+        self.assertIsNone(template['body'])
+        self.assertEqual(template['duration'], 3600)
+        self.assertEqual(template['streams'], 2)
+
+    def test_get_without_window(self):
+
+        self.assertRaises(
+            ValueError, accesslog.make_template,
+            dict(method='get', query='net=GE&start=2016-01-01', body=None))
+
+    def test_post(self):
+
+        template = accesslog.make_template(
+            dict(method='post', query=None, body=POST_BODY))
+
+        self.assertIsNone(template['params'])
+        self.assertEqual(
+            template['body'],
+            "minimumlength=0.0\nquality=B\n"
+            "GE APE * BHZ 2016-01-01T00:00:00 2016-01-01T00:10:00\n"
+            "GE WLF * BHZ 2016-01-01T00:00:00 2016-01-02T00:00:00\n")
+
+        self.assertEqual(template['duration'], 86400)
+        self.assertEqual(template['streams'], 2)
+
+    def test_invalid_body(self):
+
+        for body in (
+            "quality=B\n",
+            "GE APE * BHZ 2016-01-01\n",
+            "GE APE * BHZ 2016-01-02 2016-01-01\n"):
+
+            self.assertRaises(ValueError, accesslog.normalize_body, body)
+
+    def test_classify(self):
+
+        self.assertEqual(accesslog.classify(60, CATEGORIES), 'small')
+        self.assertEqual(accesslog.classify(3600, CATEGORIES), 'medium')
+        self.assertEqual(accesslog.classify(10 * 86400, CATEGORIES), 'large')
+
+
+class ReadScheduleTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def write_log(self, lines):
+
+        path = os.path.join(self.tempdir, 'access.log')
+
+        with open(path, 'w') as fh:
+            fh.write("\n".join(lines) + "\n")
+
+        return path
+
+    def test_schedule(self):
+
+        later = COMBINED_LINE.replace('13:55:36', '13:57:36')
+
+        path = self.write_log(
+            [later, '', 'garbage', COMBINED_LINE, json.dumps(dict(
+                time='2016-10-10T11:56:36', method='POST', body=POST_BODY))])
+
+        schedule, skipped = accesslog.read_schedule([path], compression=2.0)
+
+        self.assertEqual(skipped, 1)
+        self.assertEqual(
+            [(offset, template['method']) for offset, template in schedule],
+            [(0.0, 'get'), (30.0, 'post'), (60.0, 'get')])
+
+        schedule, _ = accesslog.read_schedule([path], limit=2)
+        self.assertEqual(len(schedule), 2)
+
+    def test_invalid_compression(self):
+
+        self.assertRaises(
+            ValueError, accesslog.read_schedule, [], compression=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
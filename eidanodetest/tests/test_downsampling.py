@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of downsampling of long time series.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import unittest
+
+import numpy
+
+from eidanodetest import downsampling
+
+
+class PaddedGroupsTestCase(unittest.TestCase):
+
+    def test_groups(self):
+
+        groups, padded = downsampling.to_padded_groups(
+            numpy.array([0, 0, 2, 2, 2, 5]),
+            numpy.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0]))
+
+        numpy.testing.assert_array_equal(groups, [0, 2, 5])
+        numpy.testing.assert_array_equal(
+            padded, [
+                [1.0, 2.0, numpy.nan],
+                [3.0, 4.0, 5.0],
+                [6.0, numpy.nan, numpy.nan]])
+
+
+class BinPercentilesTestCase(unittest.TestCase):
+
+    def test_bins(self):
+
+        x = numpy.arange(10, dtype=float)
+        y = numpy.arange(10, dtype=float)
+        y[3] = numpy.nan
+
+        centers, band = downsampling.bin_percentiles(
+            x, y, 5.0, percentiles=(0, 50, 100))
+
+        numpy.testing.assert_array_equal(centers, [2.5, 7.5])
+        numpy.testing.assert_array_equal(
+            band, [[0.0, 5.0], [1.5, 7.0], [4.0, 9.0]])
+
+    def test_empty_bins(self):
+
+        x = [0.0, 1.0, 2.0, 11.0, 12.0, 25.0]
+        y = [1.0, 2.0, 3.0, 4.0, numpy.nan, 6.0]
+
+        centers, band = downsampling.bin_percentiles(
+            x, y, 5.0, percentiles=(50,))
+
+        numpy.testing.assert_array_equal(
+            centers, [2.5, 7.5, 12.5, 17.5, 22.5, 27.5])
+        numpy.testing.assert_array_equal(
+            band, [[2.0, numpy.nan, 4.0, numpy.nan, numpy.nan, 6.0]])
+
+    def test_unsorted_equals_sorted(self):
+
+        rng = numpy.random.RandomState(1)
+        x = rng.uniform(0, 100, 500)
+        y = rng.normal(size=500)
+        order = numpy.argsort(x)
+
+        for result, expected in zip(
+            downsampling.bin_percentiles(x, y, 7.0),
+            downsampling.bin_percentiles(x[order], y[order], 7.0)):
+
+            numpy.testing.assert_array_equal(result, expected)
+
+    def test_empty(self):
+
+        centers, band = downsampling.bin_percentiles(
+            [1.0, 2.0], [numpy.nan, numpy.nan], 1.0)
+
+        self.assertEqual(len(centers), 0)
+        self.assertEqual(band.shape, (len(downsampling.BAND_PERCENTILES), 0))
+
+
+class MinMaxDecimateTestCase(unittest.TestCase):
+
+    def test_short_series_unchanged(self):
+
+        x, y = downsampling.minmax_decimate(
+            [0, 1, 2], [1.0, numpy.nan, 3.0], 10)
+
+        numpy.testing.assert_array_equal(x, [0, 1, 2])
+        numpy.testing.assert_array_equal(y, [1.0, numpy.nan, 3.0])
+
+    def test_gap_kept(self):
+
+        x = numpy.arange(10000, dtype=float)
+        y = numpy.random.RandomState(1).normal(size=10000)
+
+        # outage
+        y[5000:5500] = numpy.nan
+
+        xd, yd = downsampling.minmax_decimate(x, y, 100)
+
+        self.assertLessEqual(len(yd), 100)
+
+        gaps = xd[numpy.isnan(yd)]
+
+        self.assertTrue(len(gaps))
+        self.assertTrue(numpy.all((gaps >= 5000) & (gaps < 5500)))
+
+        # no line across the outage: a NaN between the last point before 
+        # and the first point after it
+        before = numpy.flatnonzero(xd < 5000)[-1]
+        after = numpy.flatnonzero(xd >= 5500)[0]
+
+        self.assertTrue(numpy.isnan(yd[before + 1:after]).any())
+
+    def test_peaks_preserved(self):
+
+        rng = numpy.random.RandomState(1)
+        x = numpy.arange(10000, dtype=float)
+        y = rng.normal(size=10000)
+        y[1234] = 100.0
+        y[8765] = -100.0
+
+        xd, yd = downsampling.minmax_decimate(x, y, 100)
+
+        self.assertLessEqual(len(yd), 100)
+        self.assertIn(1234.0, xd)
+        self.assertIn(8765.0, xd)
+
+        # time order kept, points taken from series
+        self.assertTrue(numpy.all(numpy.diff(xd) > 0))
+        numpy.testing.assert_array_equal(yd, y[xd.astype(int)])
+
+
+if __name__ == '__main__':
+    unittest.main()
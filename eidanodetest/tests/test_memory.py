@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the memory instrumentation of the test harness.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import unittest
+
+from eidanodetest import memory
+
+
+@unittest.skipIf(memory.get_rss_bytes() is None, "RSS not available")
+class RecordTestCase(unittest.TestCase):
+
+    def test_peak_sampled(self):
+
+        target = dict()
+
+        with memory.record(target):
+
+            blocks = []
+
+            for _ in xrange(10):
+                blocks.append(bytearray(4 * 1024 * 1024))
+                memory.sample()
+
+            del blocks
+
+        # peak inside the block, not only at its end
+        self.assertGreater(target['peak_increase'], 30 * 1024 * 1024)
+        self.assertLess(target['retained'], target['peak_increase'])
+
+    def test_no_samples(self):
+
+        target = dict()
+
+        with memory.record(target):
+            pass
+
+        self.assertIsNone(target['peak_increase'])
+        self.assertIsNotNone(target['retained'])
+
+    def test_nested_and_writes(self):
+
+        outer = dict()
+        inner = dict()
+
+        with memory.record(outer):
+            with memory.record(inner):
+                memory.SamplingBytesIO().write(b'\x00' * 1024)
+
+        self.assertIsNotNone(inner['peak_increase'])
+        self.assertIsNotNone(outer['peak_increase'])
+
+        # outside recorded blocks
+        memory.sample()
+        self.assertEqual(memory.LOCAL.active, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of per-node locks of test runs.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from eidanodetest import nodelock
+
+
+class NodeLocksTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def make_locks(self, names=('odc', 'gfz')):
+        return nodelock.NodeLocks(names, self.tempdir)
+
+    def write_holder(self, locks, name, pid):
+
+        with open(locks.get_lockfile(name), 'w') as fh:
+            fh.write(str(pid))
+
+    def test_acquire_and_release(self):
+
+        locks = self.make_locks()
+        other = self.make_locks(['odc'])
+
+        locks.acquire()
+
+        self.assertEqual(locks.get_holder('odc'), os.getpid())
+        self.assertRaises(nodelock.LockUnavailable, other.acquire)
+
+        locks.release()
+
+        self.assertIsNone(locks.get_holder('odc'))
+
+        other.acquire()
+        other.release()
+
+    def test_get_locked_takes_no_lock(self):
+
+        locks = self.make_locks()
+
+        # holder reported from the lock file, the lock itself is free
+        self.write_holder(locks, 'odc', os.getppid())
+
+        self.assertEqual(locks.get_locked(), ['odc'])
+        self.assertIn(str(os.getppid()), locks.format_holders())
+
+        locks.acquire()
+
+        self.assertEqual(locks.get_locked(), [])
+        locks.release()
+
+    def test_dead_holder(self):
+
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+
+        locks = self.make_locks()
+        self.write_holder(locks, 'gfz', process.pid)
+
+        self.assertFalse(nodelock.is_running(process.pid))
+        self.assertEqual(locks.get_locked(), [])
+        self.assertEqual(locks.format_holders(), 'none')
+
+        # no lock files created by the probe
+        self.assertFalse(os.path.exists(locks.get_lockfile('odc')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of open-loop load generation and load step summaries.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import random
+import time
+import unittest
+
+from eidanodetest import openloop
+
+
+def make_step(rate, latency_p90, requests=10, failed=0):
+
+    return dict(
+        rate=rate, requests=requests, failed=failed,
+        percentiles=openloop.LOAD_PERCENTILES,
+        latency=[latency_p90 / 2.0, latency_p90, latency_p90 * 2.0])
+
+
+class ArrivalsTestCase(unittest.TestCase):
+
+    def test_fixed(self):
+
+        self.assertEqual(
+            openloop.make_arrivals(4, 1.0, 'fixed'), [0.0, 0.25, 0.5, 0.75])
+
+    def test_poisson(self):
+
+        arrivals = openloop.make_arrivals(
+            50, 100.0, rng=random.Random(1))
+
+        self.assertEqual(arrivals, sorted(arrivals))
+        self.assertTrue(0.0 < arrivals[0] and arrivals[-1] < 100.0)
+
+        # 5000 expected, standard deviation about 71
+        self.assertLess(abs(len(arrivals) - 5000), 300)
+
+        self.assertEqual(
+            arrivals,
+            openloop.make_arrivals(50, 100.0, rng=random.Random(1)))
+
+    def test_invalid(self):
+
+        self.assertRaises(ValueError, openloop.make_arrivals, 0, 1.0)
+        self.assertRaises(
+            ValueError, openloop.make_arrivals, 1, 1.0, 'bursty')
+
+
+class RunScheduleTestCase(unittest.TestCase):
+
+    def test_open_loop(self):
+
+        def job(t_scheduled, idx):
+            time.sleep(0.2)
+            return idx, time.time() - t_scheduled
+
+        t_start = time.time()
+
+        results = openloop.run_schedule(
+            [(0.0, (0,)), (0.0, (1,)), (0.05, (2,))], job, 3)
+
+        # calls do not wait for earlier ones
+        self.assertLess(time.time() - t_start, 0.5)
+
+        self.assertEqual([x[1][0] for x in results], [0, 1, 2])
+        self.assertAlmostEqual(
+            results[2][0] - results[0][0], 0.05, delta=0.01)
+
+    def test_queue_counted(self):
+
+        def job(t_scheduled):
+            time.sleep(0.1)
+            return time.time() - t_scheduled
+
+        # one worker: the second call waits for the first
+        results = openloop.run_schedule([(0.0, ()), (0.0, ())], job, 1)
+
+        self.assertGreaterEqual(results[1][1], 0.19)
+
+
+class SummaryTestCase(unittest.TestCase):
+
+    def test_make_record(self):
+
+        attempt = dict(start=10.5, elapsed=2.0, outcome='ok')
+        record = openloop.make_record(10.0, attempt, latency=0.25)
+
+        self.assertEqual(record, dict(
+            queue=0.5, latency=0.75, time=2.5, ok=True, censored=False))
+
+        # failed request counted in at the time it failed
+        attempt['outcome'] = 'timeout'
+        record = openloop.make_record(10.0, attempt)
+
+        self.assertEqual(record['latency'], 2.5)
+        self.assertTrue(record['censored'])
+        self.assertFalse(record['ok'])
+
+    def test_summarize_step(self):
+
+        records = [
+            dict(queue=0.0, latency=float(x), time=float(x), ok=True) \
+                for x in xrange(1, 101)]
+        records.append(dict(queue=0.0, latency=None, time=5.0, ok=False))
+
+        summary = openloop.summarize_step(records, 2.0, 50.0)
+
+        self.assertEqual(summary['requests'], 101)
+        self.assertEqual(summary['failed'], 1)
+        self.assertEqual(summary['achieved'], 2.0)
+        self.assertEqual(summary['queue'], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(summary['latency'][0], 50.5)
+        self.assertAlmostEqual(summary['latency'][1], 90.1)
+
+    def test_summarize_failed_step(self):
+
+        # slowest requests time out: censored latencies keep them in
+        attempts = [
+            dict(start=0.0, elapsed=0.1, outcome='ok'),
+            dict(start=0.0, elapsed=30.0, outcome='timeout')]
+
+        summary = openloop.summarize_step(
+            [openloop.make_record(0.0, x, latency=0.1 if x['outcome'] == 'ok'
+                else None) for x in attempts], 1.0, 10.0)
+
+        self.assertEqual(summary['achieved'], 0.1)
+        self.assertGreater(summary['latency'][1], 20.0)
+
+
+class FindKneeTestCase(unittest.TestCase):
+
+    def test_knee(self):
+
+        steps = [
+            make_step(1, 0.2), make_step(2, 0.3), make_step(4, 0.41),
+            make_step(8, 2.0)]
+
+        self.assertEqual(openloop.find_knee(steps), 4)
+        self.assertEqual(openloop.find_knee(steps, factor=5.0), 8)
+        self.assertIsNone(openloop.find_knee(steps, factor=20.0))
+
+    def test_failures(self):
+
+        # fast failures (e.g. refused connections) do not raise latency
+        steps = [
+            make_step(1, 0.2), make_step(2, 0.2, failed=1),
+            make_step(4, 0.1, failed=5)]
+
+        self.assertEqual(openloop.find_knee(steps), 4)
+        self.assertEqual(
+            openloop.find_knee(steps, failure_fraction=0.05), 2)
+
+        # steps without requests are skipped
+        self.assertIsNone(openloop.find_knee(
+            [make_step(4, 0.2, requests=0), make_step(8, 1.0)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of rolling baselines and regression detection.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import unittest
+
+import numpy
+
+from eidanodetest import regression
+
+
+PARAMS = dict(regression.DEFAULT_PARAMS)
+
+
+def ewma_recursive(values, alpha, initial=None):
+
+    out = []
+    previous = initial
+
+    for value in values:
+
+        if previous is None:
+            previous = value
+        else:
+            previous = alpha * value + (1.0 - alpha) * previous
+
+        out.append(previous)
+
+    return numpy.array(out)
+
+
+def make_series(count, level=50.0, drop_at=None, drop=0.5, seed=1):
+    """Throughput around level, dropping by factor drop from drop_at on."""
+
+    values = numpy.random.RandomState(seed).normal(level, 1.0, count)
+
+    if drop_at is not None:
+        values[drop_at:] *= drop
+
+    return list(values)
+
+
+def get_alerts(series, res):
+
+    return [
+        (alert_type, series['timestamps'][idx]) \
+            for idx in xrange(series['first_new'], len(series['values'])) \
+                for alert_type in ('degradation', 'levelshift') \
+                    if res[alert_type][idx]]
+
+
+class EwmaTestCase(unittest.TestCase):
+
+    def test_closed_form_equals_recursion(self):
+
+        values = make_series(1000)
+
+        # several blocks of the closed form
+        for alpha in (0.05, 0.2, 0.9):
+            numpy.testing.assert_allclose(
+                regression.ewma(values, alpha),
+                ewma_recursive(values, alpha), rtol=1e-10)
+
+    def test_initial(self):
+
+        values = make_series(50)
+
+        numpy.testing.assert_allclose(
+            regression.ewma(values, 0.2, initial=40.0),
+            ewma_recursive(values, 0.2, initial=40.0), rtol=1e-10)
+
+    def test_alpha_one(self):
+
+        numpy.testing.assert_array_equal(
+            regression.ewma([1.0, 5.0, 2.0], 1.0), [1.0, 5.0, 2.0])
+
+    def test_invalid_alpha(self):
+
+        for alpha in (0.0, 1.5):
+            self.assertRaises(ValueError, regression.ewma, [1.0], alpha)
+
+
+class RollingMedianMadTestCase(unittest.TestCase):
+
+    def test_preceding_window(self):
+
+        values = numpy.array([1.0, 2.0, 3.0, 4.0, 100.0, 5.0])
+        median, mad = regression.rolling_median_mad(values, 4, 3)
+
+        # baselines need min_periods preceding points
+        self.assertTrue(numpy.all(numpy.isnan(median[:3])))
+
+        # point 4 (outlier) is not part of its own baseline
+        self.assertEqual(median[4], 2.5)
+        self.assertAlmostEqual(mad[4], regression.MAD_SCALE * 1.0)
+
+        # the outlier does not move the median of the next point
+        self.assertEqual(median[5], 3.5)
+
+    def test_mad_floor(self):
+
+        median, mad = regression.rolling_median_mad(numpy.full(5, 10.0), 3, 3)
+
+        self.assertEqual(median[4], 10.0)
+        self.assertAlmostEqual(mad[4], regression.MAD_FLOOR_FRACTION * 10.0)
+
+
+class AnalyseSeriesTestCase(unittest.TestCase):
+
+    def test_run_lengths(self):
+
+        numpy.testing.assert_array_equal(
+            regression.run_lengths(
+                numpy.array([False, True, True, False, True])),
+            [0, 1, 2, 0, 1])
+
+    def test_stable_series(self):
+
+        res = regression.analyse_series(make_series(100), PARAMS, False)
+
+        self.assertFalse(res['degradation'].any())
+        self.assertFalse(res['levelshift'].any())
+
+    def test_degradation_flagged_once(self):
+
+        res = regression.analyse_series(
+            make_series(100, drop_at=60), PARAMS, False)
+
+        # when the run of degraded points reaches persist
+        self.assertEqual(
+            list(numpy.flatnonzero(res['degradation'])),
+            [60 + PARAMS['persist'] - 1])
+
+        self.assertGreater(res['zscore'][60], PARAMS['threshold'])
+
+    def test_direction(self):
+
+        # lower latency is no degradation
+        res = regression.analyse_series(
+            make_series(100, drop_at=60), PARAMS, True)
+
+        self.assertFalse(res['degradation'].any())
+        self.assertFalse(res['levelshift'].any())
+
+    def test_levelshift_onset(self):
+
+        res = regression.analyse_series(
+            make_series(100, drop_at=60), PARAMS, False)
+
+        onsets = numpy.flatnonzero(res['levelshift'])
+
+        self.assertEqual(len(onsets), 1)
+        self.assertGreaterEqual(onsets[0], 60)
+
+
+class AnalyseTailTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.values = make_series(200, drop_at=150)
+        self.timestamps = ["t{:03d}".format(idx) for idx in xrange(200)]
+
+    def analyse_in_runs(self, bounds):
+
+        tail = regression.new_tail()
+        alerts = []
+
+        for start, end in zip(bounds[:-1], bounds[1:]):
+
+            series, res, tail = regression.analyse_tail(
+                tail, self.timestamps[start:end], self.values[start:end],
+                PARAMS, False)
+
+            alerts.extend(get_alerts(series, res))
+
+        return alerts, tail
+
+    def test_runs_equal_single_run(self):
+
+        alerts, _ = self.analyse_in_runs([0, 200])
+
+        self.assertTrue(alerts)
+
+        for bounds in ([0, 120, 200], [0, 70, 151, 152, 200]):
+            self.assertEqual(self.analyse_in_runs(bounds)[0], alerts)
+
+    def test_tail_length(self):
+
+        _, tail = self.analyse_in_runs([0, 120, 200])
+
+        count = regression.STATE_TAIL_WINDOWS * PARAMS['window']
+
+        self.assertEqual(tail['values'], self.values[-count:])
+        self.assertEqual(tail['timestamps'], self.timestamps[-count:])
+        self.assertIsNotNone(tail['ewma_before_tail'])
+
+
+if __name__ == '__main__':
+    unittest.main()
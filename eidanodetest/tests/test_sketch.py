@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the mergeable quantile sketch.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import json
+import math
+import random
+import unittest
+
+from eidanodetest import sketch
+
+
+QUANTILES = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+
+def get_exact_quantile(values, q):
+    """Sample at rank q * (n - 1) (rounded down), as the sketch."""
+    return sorted(values)[int(math.floor(q * (len(values) - 1)))]
+
+
+def make_samples(count, seed=1):
+
+    rng = random.Random(seed)
+
+    # several orders of magnitude, as request times
+    return [rng.lognormvariate(0.0, 2.0) for _ in xrange(count)]
+
+
+class QuantileSketchTestCase(unittest.TestCase):
+
+    def assert_relative_error(self, the_sketch, values, accuracy):
+
+        for q in QUANTILES:
+
+            exact = get_exact_quantile(values, q)
+            estimate = the_sketch.quantile(q)
+
+            self.assertLessEqual(
+                abs(estimate - exact), accuracy * exact * (1.0 + 1e-9),
+                "quantile {}: {} instead of {}".format(q, estimate, exact))
+
+    def test_relative_error_bound(self):
+
+        values = make_samples(5000)
+
+        for accuracy in (0.01, 0.05):
+            self.assert_relative_error(
+                sketch.from_samples(values, accuracy), values, accuracy)
+
+    def test_extremes_and_mean(self):
+
+        values = make_samples(100)
+        the_sketch = sketch.from_samples(values)
+
+        self.assertEqual(the_sketch.quantile(0.0), min(values))
+        self.assertEqual(the_sketch.quantile(1.0), max(values))
+        self.assertAlmostEqual(
+            the_sketch.mean(), sum(values) / len(values))
+
+    def test_zero_values(self):
+
+        the_sketch = sketch.from_samples([0.0] * 6 + [1.0] * 4)
+
+        self.assertEqual(the_sketch.zero, 6)
+        self.assertEqual(the_sketch.quantile(0.5), 0.0)
+        self.assertAlmostEqual(
+            the_sketch.quantile(0.9), 1.0, delta=sketch.DEFAULT_ACCURACY)
+
+    def test_empty(self):
+
+        the_sketch = sketch.QuantileSketch()
+
+        self.assertIsNone(the_sketch.quantile(0.5))
+        self.assertIsNone(the_sketch.mean())
+
+    def test_invalid(self):
+
+        self.assertRaises(ValueError, sketch.QuantileSketch, 0.0)
+        self.assertRaises(ValueError, sketch.QuantileSketch().add, -1.0)
+
+    def test_merge_equals_union(self):
+
+        first = make_samples(1000, seed=1)
+        second = [10 * x for x in make_samples(3000, seed=2)]
+
+        merged = sketch.from_samples(first).merge(
+            sketch.from_samples(second))
+        union = sketch.from_samples(first + second)
+
+        self.assertEqual(merged.bins, union.bins)
+        self.assertEqual(merged.count, union.count)
+        self.assertEqual(merged.min, union.min)
+        self.assertEqual(merged.max, union.max)
+
+        self.assert_relative_error(
+            merged, first + second, sketch.DEFAULT_ACCURACY)
+
+    def test_merge_different_accuracy(self):
+
+        self.assertRaises(
+            ValueError, sketch.QuantileSketch(0.01).merge,
+            sketch.from_samples([1.0], 0.05))
+
+    def test_merge_dicts(self):
+
+        parts = [make_samples(500, seed=seed) for seed in xrange(4)]
+
+        # JSON round trip, as in result files
+        merged = sketch.merge_dicts(
+            json.loads(json.dumps(sketch.from_samples(part).to_dict())) \
+                for part in parts)
+
+        expected = sketch.from_samples(sum(parts, [])).to_dict()
+        merged = merged.to_dict()
+
+        # sum differs in the last digits (order of additions)
+        self.assertAlmostEqual(merged.pop('sum'), expected.pop('sum'))
+        self.assertEqual(merged, expected)
+
+        self.assertIsNone(sketch.merge_dicts([]))
+
+
+if __name__ == '__main__':
+    unittest.main()
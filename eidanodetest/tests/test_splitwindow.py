@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the split-window download strategy.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import datetime
+import unittest
+
+from eidanodetest import splitwindow
+
+
+START = datetime.datetime(2016, 1, 1)
+
+
+def make_run(splits, t, failed=False, missing=0):
+
+    return dict(
+        splits=splits, time=t, bytes=1000, throughput=1000 / t,
+        failed=failed, missing=missing)
+
+
+class SplitWindowTestCase(unittest.TestCase):
+
+    def test_contiguous(self):
+
+        end = START + datetime.timedelta(seconds=10)
+        windows = splitwindow.split_window(START, end, 3)
+
+        self.assertEqual(windows, [
+            (START, START + datetime.timedelta(seconds=3)),
+            (START + datetime.timedelta(seconds=3),
+                START + datetime.timedelta(seconds=6)),
+            (START + datetime.timedelta(seconds=6), end)])
+
+    def test_single(self):
+
+        end = START + datetime.timedelta(days=1)
+
+        self.assertEqual(
+            splitwindow.split_window(START, end, 1), [(START, end)])
+
+    def test_invalid(self):
+
+        end = START + datetime.timedelta(seconds=2)
+
+        for splits in (0, 3):
+            self.assertRaises(
+                ValueError, splitwindow.split_window, START, end, splits)
+
+
+class CompareRecordsTestCase(unittest.TestCase):
+
+    def test_equal_in_other_order(self):
+
+        self.assertEqual(
+            splitwindow.compare_records(['a', 'b', 'c'], ['c', 'a', 'b']),
+            dict(equal=True, missing=0, extra=0))
+
+    def test_missing_and_extra(self):
+
+        # record b at a boundary returned twice, c lost
+        self.assertEqual(
+            splitwindow.compare_records(['a', 'b', 'c'], ['a', 'b', 'b']),
+            dict(equal=False, missing=1, extra=1))
+
+        self.assertEqual(
+            splitwindow.compare_records(['a'], []),
+            dict(equal=False, missing=1, extra=0))
+
+
+class SummaryTestCase(unittest.TestCase):
+
+    def test_summarize_runs(self):
+
+        runs = [
+            make_run(1, 10.0), make_run(1, 12.0), make_run(1, 0.1, True),
+            make_run(4, 4.0), make_run(4, 6.0, missing=2)]
+
+        summary = splitwindow.summarize_runs(runs)
+
+        self.assertEqual(summary[1]['runs'], 3)
+        self.assertEqual(summary[1]['failed'], 1)
+        self.assertEqual(summary[1]['time'], 11.0)
+        self.assertEqual(summary[1]['speedup'], 1.0)
+
+        self.assertEqual(summary[4]['time'], 5.0)
+        self.assertEqual(summary[4]['complete'], 0.5)
+        self.assertEqual(summary[4]['speedup'], 2.2)
+
+    def test_not_compared(self):
+
+        run = make_run(2, 1.0)
+        run['missing'] = None
+
+        summary = splitwindow.summarize_runs([run])
+
+        self.assertIsNone(summary[2]['complete'])
+        self.assertIsNone(summary[2]['speedup'])
+
+    def test_recommend_splits(self):
+
+        summary = {
+            1: dict(time=10.0, complete=None),
+            2: dict(time=5.4, complete=1.0),
+            4: dict(time=5.0, complete=1.0),
+            8: dict(time=3.0, complete=0.5)}
+
+        # 8 is faster but loses records, 2 is within tolerance of 4
+        self.assertEqual(splitwindow.recommend_splits(summary), 2)
+        self.assertEqual(
+            splitwindow.recommend_splits(summary, tolerance=0.05), 4)
+
+        self.assertIsNone(splitwindow.recommend_splits(
+            {1: dict(time=None, complete=None)}))
+
+
+if __name__ == '__main__':
+    unittest.main()
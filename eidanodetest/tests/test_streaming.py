@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the miniSEED record counter of streamed responses.
+
+This file is part of the EIDA webservice performance tests.
+
+"""
+
+import hashlib
+import random
+import struct
+import unittest
+
+from eidanodetest import streaming
+
+
+def make_record(exponent=9, blockette_1000=True, byte_order='>', seed=1):
+    """miniSEED record of 2^exponent bytes with random payload."""
+
+    rng = random.Random(seed)
+    record = bytearray(
+        rng.randint(0, 255) for _ in xrange(2 ** exponent))
+
+    struct.pack_into(
+        byte_order + 'H', record, streaming.MINISEED_YEAR_OFFSET, 2016)
+
+    if blockette_1000:
+        struct.pack_into(
+            byte_order + 'H', record, streaming.MINISEED_BLOCKETTE_OFFSET,
+            streaming.MINISEED_HEADER_LENGTH)
+        struct.pack_into(
+            byte_order + 'HH', record, streaming.MINISEED_HEADER_LENGTH,
+            streaming.MINISEED_RECORD_LENGTH_BLOCKETTE, 0)
+        record[streaming.MINISEED_HEADER_LENGTH + 6] = exponent
+    else:
+        struct.pack_into(
+            byte_order + 'H', record, streaming.MINISEED_BLOCKETTE_OFFSET, 0)
+
+    return bytes(record)
+
+
+def feed_chunks(data, chunk_size):
+
+    counter = streaming.MiniSeedRecordCounter()
+
+    for idx in xrange(0, len(data), chunk_size):
+        counter.feed(data[idx:idx + chunk_size])
+
+    counter.close()
+
+    return counter
+
+
+class RecordLengthTestCase(unittest.TestCase):
+
+    def test_byte_orders(self):
+
+        for byte_order in ('>', '<'):
+            self.assertEqual(
+                streaming.get_miniseed_record_length(
+                    bytearray(make_record(12, byte_order=byte_order))),
+                4096)
+
+    def test_incomplete_and_unknown(self):
+
+        record = bytearray(make_record())
+
+        self.assertIsNone(streaming.get_miniseed_record_length(record[:40]))
+        self.assertEqual(
+            streaming.get_miniseed_record_length(
+                bytearray(make_record(blockette_1000=False))), 0)
+
+
+class MiniSeedRecordCounterTestCase(unittest.TestCase):
+
+    def test_records(self):
+
+        records = [make_record(9, seed=1), make_record(12, seed=2)]
+        data = b''.join(records)
+
+        for chunk_size in (1, 100, 512, len(data)):
+
+            counter = feed_chunks(data, chunk_size)
+
+            self.assertEqual(counter.count(), 2)
+            self.assertEqual(
+                counter.digests,
+                [hashlib.sha1(x).hexdigest() for x in records])
+
+    def test_unparsed_tail(self):
+
+        tail = make_record(blockette_1000=False) + b'\x00' * 5000
+        data = make_record() + tail
+
+        for chunk_size in (7, 1000):
+
+            counter = streaming.MiniSeedRecordCounter()
+
+            for idx in xrange(0, len(data), chunk_size):
+                counter.feed(data[idx:idx + chunk_size])
+
+            # tail is digested while it arrives, not buffered
+            self.assertEqual(len(counter._buffer), 0)
+
+            counter.close()
+
+            self.assertEqual(
+                counter.digests, [
+                    hashlib.sha1(make_record()).hexdigest(),
+                    hashlib.sha1(tail).hexdigest()])
+
+    def test_truncated_record(self):
+
+        record = make_record()
+        counter = feed_chunks(record + record[:100], 64)
+
+        self.assertEqual(counter.digests, [
+            hashlib.sha1(record).hexdigest(),
+            hashlib.sha1(record[:100]).hexdigest()])
+
+
+if __name__ == '__main__':
+    unittest.main()